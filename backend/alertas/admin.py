@@ -1,3 +1,6 @@
 from django.contrib import admin
+from .models import EjecucionAlertas, ReglaAlerta
 
 # Register your models here.
+admin.site.register(EjecucionAlertas)
+admin.site.register(ReglaAlerta)
@@ -1,24 +1,44 @@
+import logging
+
 from django.apps import AppConfig
 from django.db.models.signals import post_migrate
 from django.utils import timezone
 
+logger = logging.getLogger(__name__)
+
+# Cada cuántos minutos se buscan alertas vencidas por enviar
+MINUTOS_ENTRE_BARRIDOS = 5
+
+
 class AlertasConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "alertas"
 
     def ready(self):
         from django_q.models import Schedule
+        from .signals import conectar_senales
+
+        conectar_senales()
 
         def crear_schedule(sender, **kwargs):
-            Schedule.objects.get_or_create(
-                name="Enviar alertas diarias",
+            # El envío diario se reemplazó por un barrido frecuente de las alertas vencidas
+            Schedule.objects.filter(name="Enviar alertas diarias").delete()
+            Schedule.objects.update_or_create(
+                name="Enviar alertas pendientes",
                 defaults={
-                    "func": "alertas.tasks.enviar_alertas_diarias",
-                    "schedule_type": Schedule.DAILY,
+                    "func": "alertas.tasks.enviar_alertas_pendientes",
+                    "schedule_type": Schedule.MINUTES,
+                    "minutes": MINUTOS_ENTRE_BARRIDOS,
+                    "repeats": -1,
+                },
+                create_defaults={
+                    "func": "alertas.tasks.enviar_alertas_pendientes",
+                    "schedule_type": Schedule.MINUTES,
+                    "minutes": MINUTOS_ENTRE_BARRIDOS,
                     "repeats": -1,
                     "next_run": timezone.now(),
                 },
             )
-            print(" Schedule verificado/creado")
+            logger.info("Schedule de alertas verificado/creado")
 
         post_migrate.connect(crear_schedule)
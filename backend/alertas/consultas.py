@@ -0,0 +1,30 @@
+from django.db.models import CharField, IntegerField, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from proyectos.models import Fecha
+
+
+# =========================
+# Anotaciones para consultas de alertas
+# =========================
+def fecha_limite(campo_actividad='pk'):
+    """Anotación con la última fecha de fin de los periodos activos de la actividad en campo_actividad."""
+    return Subquery(
+        Fecha.objects.filter(actividad=OuterRef(campo_actividad), estado=True).values('actividad').annotate(
+            fecha_limite=Max('fecha_fin')
+        ).values('fecha_limite')
+    )
+
+
+def proyecto_de_actividad(campo_actividad=None, campo_proyecto='id'):
+    """
+    Anotación con un campo del proyecto de la actividad en campo_actividad, sea normal
+    o de difusión. Sin campo_actividad, de la propia actividad (consultas sobre ActividadBase).
+    """
+    prefijo = f'{campo_actividad}__' if campo_actividad else ''
+    output_field = IntegerField() if campo_proyecto == 'id' else CharField()
+    return Coalesce(
+        f'{prefijo}actividad__linea_trabajo__proyecto__{campo_proyecto}',
+        f'{prefijo}actividaddifusion__proyecto__{campo_proyecto}',
+        output_field=output_field,
+    )
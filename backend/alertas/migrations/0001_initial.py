@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EjecucionAlertas',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('dia', models.DateField()),
+                ('resumen_diario', models.BooleanField(default=False)),
+                ('alertas', models.PositiveIntegerField(default=0)),
+                ('lotes', models.PositiveIntegerField(default=0)),
+                ('lotes_terminados', models.PositiveIntegerField(default=0)),
+                ('enviadas', models.PositiveIntegerField(default=0)),
+                ('fallidas', models.PositiveIntegerField(default=0)),
+                ('omitidas', models.PositiveIntegerField(default=0)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('ultima_modificacion', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:24
+
+import alertas.models
+import datetime
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alertas', '0001_initial'),
+        ('proyectos', '0007_alerta_por_enviar_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReglaAlerta',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('dias_antes', models.JSONField(default=alertas.models.dias_antes_por_defecto)),
+                ('modo', models.CharField(choices=[('COR', 'Días corridos'), ('HAB', 'Días hábiles (lunes a viernes)')], default='COR', max_length=3)),
+                ('hora_envio', models.TimeField(default=datetime.time(9, 0))),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('ultima_modificacion', models.DateTimeField(auto_now=True)),
+                ('proyecto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='regla_alerta', to='proyectos.proyecto')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:54
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('alertas', '0002_reglaalerta'),
+    ]
+
+    operations = [
+        migrations.RenameField(
+            model_name='ejecucionalertas',
+            old_name='resumen_diario',
+            new_name='resumen_por_destinatario',
+        ),
+    ]
@@ -0,0 +1,81 @@
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.core.exceptions import ValidationError
+from django.db import models
+from django.utils import timezone
+
+from proyectos.models import Proyecto
+
+# Create your models here.
+
+
+def dias_antes_por_defecto():
+    return [5]
+
+
+class ModoDias(models.TextChoices):
+    CORRIDOS = 'COR', 'Días corridos'
+    HABILES = 'HAB', 'Días hábiles (lunes a viernes)'
+
+
+# Regla con la que se generan las alertas de las actividades de un proyecto: una
+# alerta por periodo activo y por cada valor de dias_antes, antes de su fecha de fin.
+# Un proyecto sin regla usa la por defecto (5 días corridos antes, a las 9:00).
+# Las alertas se regeneran solas al cambiar la regla (ver alertas.reglas).
+class ReglaAlerta(models.Model):
+    id = models.AutoField(primary_key=True)
+    proyecto = models.OneToOneField(Proyecto, related_name='regla_alerta', on_delete=models.CASCADE)
+    dias_antes = models.JSONField(default=dias_antes_por_defecto)
+    modo = models.CharField(max_length=3, choices=ModoDias.choices, default=ModoDias.CORRIDOS)
+    hora_envio = models.TimeField(default=time(9, 0))
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    ultima_modificacion = models.DateTimeField(auto_now=True)
+
+    def clean(self):
+        if not isinstance(self.dias_antes, list) or not all(
+            isinstance(dias, int) and not isinstance(dias, bool) and dias >= 0 for dias in self.dias_antes
+        ):
+            raise ValidationError({'dias_antes': 'Debe ser una lista de números enteros no negativos.'})
+
+    def fechas_envio(self, fecha_fin):
+        """Fechas de envío (con zona horaria) de las alertas de un periodo que termina en fecha_fin."""
+        fechas = set()
+        for dias in self.dias_antes:
+            if self.modo == ModoDias.HABILES:
+                # Si fecha_fin cae en fin de semana se cuenta desde el viernes anterior
+                fecha = np.busday_offset(np.datetime64(fecha_fin, 'D'), -dias, roll='backward').item()
+            else:
+                fecha = fecha_fin - timedelta(days=dias)
+            fechas.add(timezone.make_aware(datetime.combine(fecha, self.hora_envio)))
+        return sorted(fechas)
+
+    def __str__(self):
+        return f"Regla de alertas de {self.proyecto}: {self.dias_antes} ({self.get_modo_display()})"
+
+
+# Resumen de una ejecución del barrido de alertas: el despachador reparte las alertas
+# vencidas en lotes (una tarea de django-q cada uno) y cada lote suma aquí sus
+# resultados al terminar. Los barridos sin alertas no dejan registro.
+class EjecucionAlertas(models.Model):
+    id = models.AutoField(primary_key=True)
+    dia = models.DateField()
+    resumen_por_destinatario = models.BooleanField(default=False)
+    alertas = models.PositiveIntegerField(default=0)
+    lotes = models.PositiveIntegerField(default=0)
+    lotes_terminados = models.PositiveIntegerField(default=0)
+    # Alertas marcadas como enviadas, con error de envío o sin tiempo para enviarse
+    # dentro del lote (quedan sin enviar) y ya reclamadas por otra ejecución o un
+    # intento anterior (no se tocan)
+    enviadas = models.PositiveIntegerField(default=0)
+    fallidas = models.PositiveIntegerField(default=0)
+    omitidas = models.PositiveIntegerField(default=0)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    ultima_modificacion = models.DateTimeField(auto_now=True)
+
+    @property
+    def terminada(self):
+        return self.lotes_terminados >= self.lotes
+
+    def __str__(self):
+        return f"Alertas del {self.dia}: {self.enviadas}/{self.alertas} enviadas ({self.lotes_terminados}/{self.lotes} lotes)"
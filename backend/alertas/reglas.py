@@ -0,0 +1,87 @@
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from proyectos.models import ActividadBase, Alerta, EstadoActividad, Fecha
+from vistas.snapshot import invalidar_actividades
+from .consultas import proyecto_de_actividad
+from .models import ReglaAlerta
+
+# Las actividades completadas o terminadas no tienen alertas pendientes
+ESTADOS_SIN_ALERTAS = {EstadoActividad.COMPLETADA, EstadoActividad.TERMINADA}
+
+
+# =========================
+# Regeneración de alertas
+# =========================
+def regla_del_proyecto(proyecto_id):
+    """Regla de alertas del proyecto, o la por defecto (sin guardar) si no tiene."""
+    regla = ReglaAlerta.objects.filter(proyecto_id=proyecto_id).first() if proyecto_id is not None else None
+    return regla or ReglaAlerta(proyecto_id=proyecto_id)
+
+
+def regenerar_alertas(actividad_ids):
+    """
+    Recalcula las alertas de las actividades según la regla de su proyecto, sus periodos
+    activos y su estado: crea con un bulk_create las que faltan y elimina las pendientes
+    que sobran. Las ya enviadas se conservan como historial; las que caen en el pasado
+    se crean como enviadas, para no mandar avisos atrasados. Solo toca esas actividades,
+    con un número fijo de consultas. Devuelve (creadas, eliminadas).
+    """
+    actividades = list(ActividadBase.objects.filter(id__in=actividad_ids).annotate(
+        proyecto_id=proyecto_de_actividad(),
+    ).values_list('id', 'estado', 'proyecto_id'))
+    if not actividades:
+        return 0, 0
+    ids = [actividad_id for actividad_id, _, _ in actividades]
+
+    reglas = {
+        regla.proyecto_id: regla
+        for regla in ReglaAlerta.objects.filter(proyecto_id__in={proyecto_id for _, _, proyecto_id in actividades})
+    }
+    fines = {}
+    for actividad_id, fecha_fin in Fecha.objects.filter(actividad_id__in=ids, estado=True).values_list(
+        'actividad_id', 'fecha_fin'
+    ):
+        fines.setdefault(actividad_id, set()).add(fecha_fin)
+    existentes = {}
+    for alerta_id, actividad_id, fecha_envio, enviado in Alerta.objects.filter(actividad_id__in=ids).values_list(
+        'id', 'actividad_id', 'fecha_envio', 'enviado'
+    ):
+        existentes.setdefault(actividad_id, []).append((alerta_id, fecha_envio, enviado))
+
+    ahora = timezone.now()
+    crear, eliminar = [], []
+    for actividad_id, estado, proyecto_id in actividades:
+        deseadas = set()
+        if estado not in ESTADOS_SIN_ALERTAS:
+            regla = reglas.get(proyecto_id) or ReglaAlerta(proyecto_id=proyecto_id)
+            for fecha_fin in fines.get(actividad_id, ()):
+                deseadas.update(regla.fechas_envio(fecha_fin))
+
+        actuales = set()
+        for alerta_id, fecha_envio, enviado in existentes.get(actividad_id, ()):
+            if fecha_envio in deseadas and fecha_envio not in actuales:
+                actuales.add(fecha_envio)
+            elif not enviado:
+                eliminar.append(alerta_id)
+        crear.extend(
+            Alerta(actividad_id=actividad_id, fecha_envio=fecha_envio, enviado=fecha_envio <= ahora)
+            for fecha_envio in sorted(deseadas - actuales)
+        )
+
+    if crear or eliminar:
+        with transaction.atomic():
+            Alerta.objects.bulk_create(crear)
+            if eliminar:
+                Alerta.objects.filter(id__in=eliminar).delete()
+            # bulk_create no emite señales: el snapshot se invalida a mano
+            invalidar_actividades(ids)
+    return len(crear), len(eliminar)
+
+
+def regenerar_alertas_proyecto(proyecto_id):
+    """Recalcula las alertas de todas las actividades de un proyecto (al cambiar su regla)."""
+    return regenerar_alertas(list(ActividadBase.objects.filter(
+        Q(actividad__linea_trabajo__proyecto_id=proyecto_id) | Q(actividaddifusion__proyecto_id=proyecto_id)
+    ).values_list('id', flat=True)))
@@ -0,0 +1,62 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from proyectos.models import Actividad, ActividadBase, ActividadDifusion, Fecha
+from .models import ReglaAlerta
+from .reglas import regenerar_alertas, regenerar_alertas_proyecto
+
+# Las alertas de una actividad se recalculan cuando cambian sus periodos o su estado,
+# o la regla de su proyecto. Las operaciones masivas (bulk_create, update()) no emiten
+# señales: quien las use debe llamar a regenerar_alertas (ver vistas.views._aplicar_estados).
+
+
+def _borrado_directo(origin, modelo):
+    """True si se eliminó el propio objeto y no en cascada desde otro modelo (actividad, proyecto...)."""
+    if origin is None:
+        return True
+    return issubclass(origin.model if isinstance(origin, QuerySet) else type(origin), modelo)
+
+
+def fecha_guardada(sender, instance, **kwargs):
+    regenerar_alertas([instance.actividad_id])
+
+
+def fecha_eliminada(sender, instance, origin=None, **kwargs):
+    # En un borrado en cascada (actividad, línea, proyecto) ya no hay nada que recalcular
+    if _borrado_directo(origin, Fecha):
+        regenerar_alertas([instance.actividad_id])
+
+
+def actividad_por_guardar(sender, instance, update_fields=None, **kwargs):
+    """Anota el estado guardado antes del save: las alertas solo dependen del estado."""
+    if instance._state.adding or (update_fields is not None and 'estado' not in update_fields):
+        instance._estado_anterior = instance.estado
+    else:
+        instance._estado_anterior = ActividadBase.objects.filter(pk=instance.pk).values_list('estado', flat=True).first()
+
+
+def actividad_guardada(sender, instance, created=False, **kwargs):
+    # Una actividad recién creada aún no tiene periodos; un cambio de nombre o descripción no cambia sus alertas
+    if not created and instance.estado != getattr(instance, '_estado_anterior', None):
+        regenerar_alertas([instance.pk])
+
+
+def regla_guardada(sender, instance, **kwargs):
+    regenerar_alertas_proyecto(instance.proyecto_id)
+
+
+def regla_eliminada(sender, instance, origin=None, **kwargs):
+    # El proyecto vuelve a la regla por defecto
+    if _borrado_directo(origin, ReglaAlerta):
+        regenerar_alertas_proyecto(instance.proyecto_id)
+
+
+def conectar_senales():
+    post_save.connect(fecha_guardada, sender=Fecha, dispatch_uid='alertas_save_Fecha')
+    post_delete.connect(fecha_eliminada, sender=Fecha, dispatch_uid='alertas_delete_Fecha')
+    # post_save de una subclase se emite con la subclase como sender
+    for modelo in (ActividadBase, Actividad, ActividadDifusion):
+        pre_save.connect(actividad_por_guardar, sender=modelo, dispatch_uid=f'alertas_pre_save_{modelo.__name__}')
+        post_save.connect(actividad_guardada, sender=modelo, dispatch_uid=f'alertas_save_{modelo.__name__}')
+    post_save.connect(regla_guardada, sender=ReglaAlerta, dispatch_uid='alertas_save_ReglaAlerta')
+    post_delete.connect(regla_eliminada, sender=ReglaAlerta, dispatch_uid='alertas_delete_ReglaAlerta')
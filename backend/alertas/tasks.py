@@ -1,23 +1,278 @@
+import logging
+import time
+import uuid
+from datetime import timedelta
+from smtplib import SMTPException
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F, Prefetch, Q
+from django.db.models.functions import Now
 from django.utils import timezone
-from django.core.mail import send_mail
+from django_q.tasks import async_task
 from proyectos.models import Alerta, Actividad_Encargado
+from vistas.snapshot import invalidar_actividades
+from .consultas import fecha_limite, proyecto_de_actividad
+from .models import EjecucionAlertas
 
-def enviar_alertas_diarias():
-    hoy = timezone.now().date()
-    alertas = Alerta.objects.filter(fecha_envio__date=hoy, enviado=False)
+logger = logging.getLogger(__name__)
 
-    for alerta in alertas:
-        encargados = Actividad_Encargado.objects.filter(
-            actividad=alerta.actividad, estado=True
+# Alertas por lote: cada lote es una tarea de django-q, muy por debajo del timeout de Q_CLUSTER
+ALERTAS_POR_LOTE = 50
+# Tiempo de envío de un lote: pasado este plazo no empieza otro correo y lo que falta
+# queda para el barrido siguiente. Con EMAIL_TIMEOUT, el lote termina dentro del timeout de Q_CLUSTER
+ALERTAS_SEGUNDOS_POR_LOTE = 30
+# Un reclamo más antiguo que esto se da por abandonado (el worker murió, p. ej. por el
+# timeout de Q_CLUSTER) y sus alertas vuelven a estar disponibles. Debe superar ese timeout.
+ALERTAS_PLAZO_RECLAMO = timedelta(minutes=10)
+
+
+def _sin_reclamar(ahora):
+    """Alertas que ningún lote tiene reclamadas, o cuyo reclamo ya venció."""
+    return Q(reclamo__isnull=True) | Q(reclamada_en__lt=ahora - ALERTAS_PLAZO_RECLAMO)
+
+
+def _alertas_vencidas(ahora):
+    """Alertas sin enviar y sin reclamar cuya fecha de envío ya pasó, incluidas las de días anteriores."""
+    # enviado=False es la condición del índice parcial alerta_por_enviar_idx, para que se use
+    return Alerta.objects.filter(_sin_reclamar(ahora), enviado=False, fecha_envio__lte=ahora)
+
+
+def _alertas_reclamadas(reclamo):
+    """
+    Alertas reclamadas por un lote, con su actividad, el nombre de su proyecto, su fecha
+    límite y sus encargados activos (tres consultas en total).
+    """
+    return Alerta.objects.filter(reclamo=reclamo, enviado=False).select_related('actividad').annotate(
+        proyecto_nombre=proyecto_de_actividad('actividad', 'nombre'),
+        fecha_limite=fecha_limite('actividad'),
+    ).prefetch_related(
+        Prefetch(
+            'actividad__actividad_encargados',
+            queryset=Actividad_Encargado.objects.filter(estado=True).select_related('encargado').order_by('id'),
+            to_attr='encargados_activos',
+        ),
+    ).order_by('fecha_envio', 'id')
+
+
+def _correos(alerta):
+    return [rel.encargado.correo_electronico for rel in alerta.actividad.encargados_activos]
+
+
+def _enviar(conexion, mensaje):
+    """
+    Envía por la conexión ya abierta (send_messages la reutiliza sin cerrarla); False si
+    falla, también por errores de red como un timeout del socket.
+    """
+    try:
+        conexion.send_messages([mensaje])
+    except (SMTPException, OSError) as error:
+        logger.warning("No se pudo enviar el correo a %s: %s", ', '.join(mensaje.to), error)
+        return False
+    return True
+
+
+def _guardar_envio(alertas):
+    """
+    Guarda el envío apenas sale cada correo, no al final del lote: si el worker muere
+    después, lo ya enviado no se reenvía cuando vence el reclamo.
+    """
+    Alerta.objects.bulk_update(alertas, ['enviado', 'enviada_a'])
+    # bulk_update() no emite señales: los snapshots de las actividades se invalidan a mano
+    invalidar_actividades({alerta.actividad_id for alerta in alertas if alerta.enviado})
+
+
+# =========================
+# Un correo por alerta
+# =========================
+def _enviar_por_alerta(conexion, alertas, limite):
+    """Un correo a todos los encargados de cada alerta, hasta el tiempo límite del lote."""
+    for i, alerta in enumerate(alertas):
+        if i and time.monotonic() > limite:
+            break
+        correos = _correos(alerta)
+        mensaje = EmailMessage(
+            subject=f"Alerta: {alerta.actividad.nombre}",
+            body=f"Recuerda que hoy debes realizar la actividad: {alerta.actividad.nombre}",
+            from_email=None,  # usa DEFAULT_FROM_EMAIL
+            to=correos,
         )
-        correos = [e.encargado.correo_electronico for e in encargados]
-        if correos:
-            send_mail(
-                subject=f"Alerta: {alerta.actividad.nombre}",
-                message=f"Recuerda que hoy debes realizar la actividad: {alerta.actividad.nombre}",
-                from_email=None,  # usa DEFAULT_FROM_EMAIL
-                recipient_list=correos,
-                fail_silently=False,
-            )
+        if not correos or _enviar(conexion, mensaje):
+            alerta.enviado = True
+            _guardar_envio([alerta])
+
+
+# =========================
+# Un resumen por destinatario
+# =========================
+def _linea_resumen(alerta):
+    limite = alerta.fecha_limite.strftime('%d/%m/%Y') if alerta.fecha_limite else 'no definida'
+    return f"- {alerta.actividad.nombre} ({alerta.proyecto_nombre}). Fecha límite: {limite}"
+
+
+def _enviar_resumenes(conexion, alertas, limite):
+    """
+    Agrupa las alertas por dirección de correo y envía a cada destinatario un solo
+    correo con todas sus actividades, hasta el tiempo límite del lote. El resumen
+    cubre las alertas de este barrido, no las del día: quien tenga alertas en varios
+    barridos recibe un resumen por cada uno. Cada resumen
+    enviado se anota en enviada_a de sus alertas, para no repetírselo a esa persona
+    en un reintento; una alerta queda enviada cuando llegaron los resúmenes de todos
+    sus encargados.
+    """
+    pendientes = {}
+    por_correo = {}
+    for alerta in alertas:
+        pendientes[alerta.id] = {correo.lower() for correo in _correos(alerta)} - set(alerta.enviada_a)
+        for correo in _correos(alerta):
+            if correo.lower() in pendientes[alerta.id]:
+                por_correo.setdefault(correo.lower(), (correo, {}))[1].setdefault(alerta.actividad_id, {})[alerta.id] = alerta
+
+    # Sin destinatarios pendientes no hay nada que enviar: quedan enviadas, como en el modo por alerta
+    sin_destinatarios = [alerta for alerta in alertas if not pendientes[alerta.id]]
+    for alerta in sin_destinatarios:
         alerta.enviado = True
-        alerta.save()
\ No newline at end of file
+    if sin_destinatarios:
+        _guardar_envio(sin_destinatarios)
+
+    for i, (clave, (correo, alertas_correo)) in enumerate(por_correo.items()):
+        if i and time.monotonic() > limite:
+            break
+        lineas = [_linea_resumen(next(iter(alertas_actividad.values()))) for alertas_actividad in alertas_correo.values()]
+        mensaje = EmailMessage(
+            subject=f"Alertas pendientes: {len(lineas)} actividad{'es' if len(lineas) != 1 else ''}",
+            body="Recuerda que hoy debes realizar las siguientes actividades:\n\n" + "\n".join(lineas),
+            from_email=None,  # usa DEFAULT_FROM_EMAIL
+            to=[correo],
+        )
+        if _enviar(conexion, mensaje):
+            enviadas = [alerta for alertas_actividad in alertas_correo.values() for alerta in alertas_actividad.values()]
+            for alerta in enviadas:
+                alerta.enviada_a = [*alerta.enviada_a, clave]
+                pendientes[alerta.id].discard(clave)
+                alerta.enviado = not pendientes[alerta.id]
+            _guardar_envio(enviadas)
+
+
+# =========================
+# Reparto en lotes
+# =========================
+def _lotes(alertas, por_destinatario):
+    """
+    Reparte los ids de las alertas [(id, actividad_id)] en lotes de hasta ALERTAS_POR_LOTE.
+    En modo resumen, las alertas que comparten destinatario van al mismo lote (si no,
+    esa persona recibiría un resumen por lote). Un grupo más grande que ALERTAS_POR_LOTE
+    se parte: esas personas reciben más de un resumen, pero ningún lote excede el tamaño.
+    """
+    if not por_destinatario:
+        ids = [alerta_id for alerta_id, _ in alertas]
+        return [ids[i:i + ALERTAS_POR_LOTE] for i in range(0, len(ids), ALERTAS_POR_LOTE)]
+
+    correos = {}
+    for actividad_id, correo in Actividad_Encargado.objects.filter(
+        actividad_id__in={actividad_id for _, actividad_id in alertas}, estado=True,
+    ).values_list('actividad_id', 'encargado__correo_electronico'):
+        correos.setdefault(actividad_id, set()).add(correo.lower())
+
+    # Componentes conexas de alertas y destinatarios (union-find)
+    padre = {}
+
+    def raiz(nodo):
+        padre.setdefault(nodo, nodo)
+        while padre[nodo] != nodo:
+            padre[nodo] = padre[padre[nodo]]
+            nodo = padre[nodo]
+        return nodo
+
+    for alerta_id, actividad_id in alertas:
+        for correo in correos.get(actividad_id, ()):
+            padre[raiz(('alerta', alerta_id))] = raiz(('correo', correo))
+
+    componentes = {}
+    for alerta_id, _ in alertas:
+        componentes.setdefault(raiz(('alerta', alerta_id)), []).append(alerta_id)
+
+    lotes, lote = [], []
+    for componente in componentes.values():
+        while len(componente) > ALERTAS_POR_LOTE:
+            lotes.append(componente[:ALERTAS_POR_LOTE])
+            componente = componente[ALERTAS_POR_LOTE:]
+        if lote and len(lote) + len(componente) > ALERTAS_POR_LOTE:
+            lotes.append(lote)
+            lote = []
+        lote.extend(componente)
+    if lote:
+        lotes.append(lote)
+    return lotes
+
+
+def enviar_lote(ejecucion_id, alerta_ids):
+    """
+    Tarea de un lote: reclama sus alertas con un UPDATE condicional (solo las que nadie
+    reclamó), las envía por una sola conexión SMTP marcando cada una apenas sale su
+    correo, y suma los resultados a la ejecución. Un reintento o una ejecución
+    superpuesta no puede reclamar alertas ya reclamadas: no se envían dos veces. Las
+    que fallan, o no alcanzan a enviarse en ALERTAS_SEGUNDOS_POR_LOTE, se liberan; si
+    el proceso muere a mitad del lote, el reclamo de las que faltan vence a los
+    ALERTAS_PLAZO_RECLAMO y un barrido posterior las vuelve a despachar.
+    """
+    reclamo = uuid.uuid4()
+    ahora = timezone.now()
+    reclamadas = Alerta.objects.filter(_sin_reclamar(ahora), id__in=alerta_ids, enviado=False).update(
+        reclamo=reclamo, reclamada_en=ahora,
+    )
+
+    alertas = list(_alertas_reclamadas(reclamo))
+    limite = time.monotonic() + ALERTAS_SEGUNDOS_POR_LOTE
+    if alertas:
+        conexion = get_connection(fail_silently=False)
+        try:
+            conexion.open()
+        except (SMTPException, OSError):
+            # No se envió nada: se liberan para otra ejecución
+            Alerta.objects.filter(reclamo=reclamo).update(reclamo=None, reclamada_en=None)
+            raise
+        enviar = _enviar_resumenes if settings.ALERTAS_RESUMEN_POR_DESTINATARIO else _enviar_por_alerta
+        try:
+            enviar(conexion, alertas, limite)
+        finally:
+            conexion.close()
+
+    Alerta.objects.filter(reclamo=reclamo, enviado=False).update(reclamo=None, reclamada_en=None)
+
+    enviadas = sum(alerta.enviado for alerta in alertas)
+    resultado = {
+        'enviadas': enviadas,
+        'fallidas': reclamadas - enviadas,
+        'omitidas': len(alerta_ids) - reclamadas,
+    }
+    EjecucionAlertas.objects.filter(id=ejecucion_id).update(
+        lotes_terminados=F('lotes_terminados') + 1,
+        ultima_modificacion=Now(),
+        **{campo: F(campo) + cantidad for campo, cantidad in resultado.items()},
+    )
+    return resultado
+
+
+def enviar_alertas_pendientes():
+    """
+    Barrido frecuente (ver AlertasConfig): despacha las alertas cuya fecha de envío ya
+    pasó, también las que quedaron de días anteriores o en lotes abandonados. Las reparte en lotes y encola una
+    tarea enviar_lote por lote, para que los workers de Q_CLUSTER las envíen en paralelo.
+    Un correo por alerta o, con ALERTAS_RESUMEN_POR_DESTINATARIO, un resumen por
+    destinatario de las alertas de este barrido. Los resultados se suman en un EjecucionAlertas, cuyo id
+    se devuelve (None si no había nada que enviar).
+    """
+    ahora = timezone.now()
+    alertas = list(_alertas_vencidas(ahora).order_by('fecha_envio', 'id').values_list('id', 'actividad_id'))
+    if not alertas:
+        return None
+    lotes = _lotes(alertas, settings.ALERTAS_RESUMEN_POR_DESTINATARIO)
+
+    ejecucion = EjecucionAlertas.objects.create(
+        dia=timezone.localdate(ahora), resumen_por_destinatario=settings.ALERTAS_RESUMEN_POR_DESTINATARIO,
+        alertas=len(alertas), lotes=len(lotes),
+    )
+    for lote in lotes:
+        async_task('alertas.tasks.enviar_lote', ejecucion.id, lote, group=f'alertas-{ejecucion.id}')
+    return ejecucion.id
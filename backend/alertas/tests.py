@@ -1,3 +1,401 @@
-from django.test import TestCase
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+from smtplib import SMTPRecipientsRefused
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core import mail
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from proyectos.models import *
+from vistas.lectura import actividades_alertas
+from .models import EjecucionAlertas, ModoDias, ReglaAlerta
+from .reglas import regenerar_alertas
+from .tasks import ALERTAS_PLAZO_RECLAMO, enviar_alertas_pendientes, enviar_lote
+from .views import POR_PAGINA
+
+
+def envio(dia, hora=9):
+    return datetime(2025, 3, dia, hora, tzinfo=timezone.utc)
+
+
+class ProximasAlertasTests(TestCase):
+    def setUp(self):
+        self.url = reverse('proximas_alertas')
+        self.proyecto = Proyecto.objects.create(nombre="Uno", fecha_inicio=date(2025, 3, 3))
+        self.otro = Proyecto.objects.create(nombre="Dos", fecha_inicio=date(2025, 3, 3))
+        linea = LineaTrabajo.objects.create(proyecto=self.proyecto, nombre="Línea 1")
+        self.normal = Actividad.objects.create(linea_trabajo=linea, nombre="Normal")
+        self.difusion = ActividadDifusion.objects.create(proyecto=self.otro, nombre="Difusión")
+        self.encargado = Encargado.objects.create(nombre="Persona", correo_electronico="p@example.cl")
+        Actividad_Encargado.objects.create(actividad=self.normal, encargado=self.encargado)
+
+        Fecha.objects.create(actividad=self.normal, fecha_inicio=date(2025, 3, 3), fecha_fin=date(2025, 3, 7))
+        Fecha.objects.create(actividad=self.normal, fecha_inicio=date(2025, 3, 10), fecha_fin=date(2025, 3, 14))
+        Fecha.objects.create(actividad=self.normal, fecha_inicio=date(2025, 3, 3), fecha_fin=date(2025, 4, 1), estado=False)
+
+        Alerta.objects.create(actividad=self.normal, fecha_envio=envio(4), enviado=False)
+        Alerta.objects.create(actividad=self.difusion, fecha_envio=envio(5), enviado=False)
+        Alerta.objects.create(actividad=self.normal, fecha_envio=envio(5, 8), enviado=True)
+        Alerta.objects.create(actividad=self.normal, fecha_envio=envio(12), enviado=False)
+
+    def alertas(self, **filtros):
+        return self.client.get(self.url, {'desde': '2025-03-03', 'hasta': '2025-03-09', **filtros}).context['alertas']
+
+    def test_ventana_y_filtros(self):
+        alertas = self.alertas()
+        self.assertEqual([a['proyecto_nombre'] for a in alertas], ["Uno", "Dos"])
+        self.assertEqual(alertas[0]['fecha_limite'], date(2025, 3, 14))  # solo periodos activos
+        self.assertEqual(alertas[0]['encargados'], ["Persona"])
+        self.assertIsNone(alertas[1]['fecha_limite'])
+
+        self.assertEqual([a['actividad_nombre'] for a in self.alertas(encargado=self.encargado.id)], ["Normal"])
+        self.assertEqual([a['actividad_nombre'] for a in self.alertas(proyecto=self.otro.id)], ["Difusión"])
+
+    def test_paginacion(self):
+        Alerta.objects.bulk_create(
+            [Alerta(actividad=self.difusion, fecha_envio=envio(6), enviado=False) for _ in range(POR_PAGINA)]
+        )
+        respuesta = self.client.get(self.url, {'desde': '2025-03-03', 'hasta': '2025-03-09'})
+        primera = respuesta.context['alertas']
+        self.assertEqual(len(primera), POR_PAGINA)
+
+        # Consultas constantes: alertas, encargados de la página y listas de los filtros
+        with self.assertNumQueries(4):
+            respuesta = self.client.get(self.url, {
+                'desde': '2025-03-03', 'hasta': '2025-03-09', 'despues': respuesta.context['siguiente'],
+            })
+        segunda = respuesta.context['alertas']
+        self.assertEqual(len(segunda), 2)
+        self.assertIsNone(respuesta.context['siguiente'])
+        self.assertFalse({a['id'] for a in primera} & {a['id'] for a in segunda})
+
+    def test_usa_el_indice(self):
+        from .views import alertas_pendientes
+        sql, params = alertas_pendientes(date(2025, 3, 3), date(2025, 3, 9)).query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(str(fila) for fila in cursor.fetchall())
+        self.assertIn('alerta_pendiente_envio_idx', plan)
+
+
+class EnviarAlertasPendientesTests(TestCase):
+    def setUp(self):
+        self.proyecto = Proyecto.objects.create(nombre="Uno", fecha_inicio=date(2025, 3, 3))
+        LineaTrabajo.objects.create(proyecto=self.proyecto, nombre="Línea 1")
+        self.ahora = datetime(2025, 3, 4, 10, tzinfo=timezone.utc)
+
+    def crear_actividades(self, n, encargados=2):
+        linea = self.proyecto.lineas_trabajo.get()
+        actividades = []
+        for i in range(n):
+            actividad = Actividad.objects.create(linea_trabajo=linea, nombre=f"Actividad {i}")
+            for j in range(encargados):
+                encargado, _ = Encargado.objects.get_or_create(
+                    correo_electronico=f"p{i}-{j}@example.cl", defaults={'nombre': f"Persona {i}-{j}"},
+                )
+                Actividad_Encargado.objects.create(actividad=actividad, encargado=encargado)
+            Alerta.objects.create(actividad=actividad, fecha_envio=envio(4), enviado=False)
+            actividades.append(actividad)
+        return actividades
+
+    def enviar(self):
+        """Despacha y ejecuta los lotes en el acto, como los haría un worker; devuelve la ejecución."""
+        def ejecutar(funcion, *args, **kwargs):
+            self.assertEqual(funcion, 'alertas.tasks.enviar_lote')
+            enviar_lote(*args)
+
+        with patch('alertas.tasks.timezone.now', return_value=self.ahora), \
+                patch('alertas.tasks.async_task', side_effect=ejecutar) as encolar:
+            ejecucion_id = enviar_alertas_pendientes()
+        if ejecucion_id is None:
+            self.assertFalse(encolar.called)
+            return None
+        ejecucion = EjecucionAlertas.objects.get(id=ejecucion_id)
+        self.assertEqual(encolar.call_count, ejecucion.lotes)
+        self.assertTrue(ejecucion.terminada)
+        return ejecucion
+
+    def test_envio(self):
+        actividad, sin_encargados = self.crear_actividades(1) + self.crear_actividades(1, encargados=0)
+        Alerta.objects.create(actividad=actividad, fecha_envio=envio(5), enviado=False)  # mañana
+        actividades_alertas(self.proyecto)  # snapshot vigente
+
+        self.assertEqual(self.enviar().enviadas, 2)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["p0-0@example.cl", "p0-1@example.cl"])
+        self.assertEqual(mail.outbox[0].subject, "Alerta: Actividad 0")
+        self.assertEqual(
+            sorted(Alerta.objects.values_list('fecha_envio__day', 'enviado')), [(4, True), (4, True), (5, False)]
+        )
+        # El snapshot se invalidó aunque update() no emite señales
+        self.assertEqual([a['enviado'] for a in actividades_alertas(self.proyecto)[0]['alertas']], [True, False])
+
+        # Un segundo barrido no reenvía
+        self.assertIsNone(self.enviar())
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_error_de_envio(self):
+        fallida, enviada = self.crear_actividades(2)
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                   side_effect=[SMTPRecipientsRefused({}), 1]) as envio_smtp, \
+                self.assertLogs('alertas.tasks', 'WARNING') as registro:
+            ejecucion = self.enviar()
+        self.assertEqual(len(registro.output), 1)
+        self.assertIn("No se pudo enviar el correo a p0-0@example.cl, p0-1@example.cl", registro.output[0])
+        self.assertEqual((ejecucion.enviadas, ejecucion.fallidas), (1, 1))
+        self.assertEqual(envio_smtp.call_count, 2)
+        self.assertFalse(Alerta.objects.get(actividad=fallida).enviado)
+        self.assertTrue(Alerta.objects.get(actividad=enviada).enviado)
+        # La fallida se libera para otra ejecución
+        self.assertIsNone(Alerta.objects.get(actividad=fallida).reclamo)
+
+    @override_settings(ALERTAS_RESUMEN_POR_DESTINATARIO=True)
+    def test_resumen_por_destinatario(self):
+        primera, segunda = self.crear_actividades(2)
+        # Con la regla por defecto, la alerta del 4 de marzo corresponde a este periodo
+        Fecha.objects.create(actividad=primera, fecha_inicio=date(2025, 3, 3), fecha_fin=date(2025, 3, 9))
+        # La misma persona encargada de las dos actividades
+        Actividad_Encargado.objects.create(actividad=segunda, encargado=Encargado.objects.get(nombre="Persona 0-0"))
+
+        self.assertEqual(self.enviar().enviadas, 2)
+        resumenes = {m.to[0].lower(): m for m in mail.outbox}
+        self.assertEqual(sorted(resumenes), ["p0-0@example.cl", "p0-1@example.cl", "p1-0@example.cl", "p1-1@example.cl"])
+        resumen = resumenes["p0-0@example.cl"]
+        self.assertEqual(resumen.subject, "Alertas pendientes: 2 actividades")
+        self.assertIn("- Actividad 0 (Uno). Fecha límite: 09/03/2025", resumen.body)
+        self.assertIn("- Actividad 1 (Uno). Fecha límite: no definida", resumen.body)
+
+    def test_consultas_por_correo(self):
+        # Consultas fijas por barrido, más dos por correo: marcar la alerta e invalidar su snapshot
+        self.crear_actividades(2)
+        with CaptureQueriesContext(connection) as pocas:
+            self.enviar()
+        self.crear_actividades(10)
+        with CaptureQueriesContext(connection) as muchas:
+            self.assertEqual(self.enviar().enviadas, 10)
+        self.assertEqual(len(muchas) - len(pocas), 2 * (10 - 2))
+        self.assertEqual(len(mail.outbox), 12)
+
+    def test_barrido(self):
+        actividad, = self.crear_actividades(1)
+        Alerta.objects.create(actividad=actividad, fecha_envio=envio(1), enviado=False)  # día sin cluster
+        Alerta.objects.create(actividad=actividad, fecha_envio=envio(4, 11), enviado=False)  # en una hora
+
+        self.assertEqual(self.enviar().enviadas, 2)
+        self.ahora += timedelta(hours=1)
+        self.assertEqual(self.enviar().enviadas, 1)
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_recupera_lote_abandonado(self):
+        self.crear_actividades(2)
+        # El worker muere después de reclamar el lote, a mitad del envío
+        with patch('alertas.tasks._enviar_por_alerta', side_effect=RuntimeError("worker terminado")):
+            with self.assertRaises(RuntimeError):
+                self.enviar()
+        self.assertEqual(Alerta.objects.filter(reclamo__isnull=False, enviado=False).count(), 2)
+
+        # Los barridos siguientes no lo tocan mientras el reclamo está vigente...
+        self.ahora += timedelta(minutes=5)
+        self.assertIsNone(self.enviar())
+        # ...y lo ponen al día cuando vence
+        self.ahora += ALERTAS_PLAZO_RECLAMO
+        self.assertEqual(self.enviar().enviadas, 2)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertFalse(Alerta.objects.filter(enviado=False).exists())
+
+    def test_worker_muere_a_mitad_del_lote(self):
+        primera, segunda = self.crear_actividades(2)
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                   side_effect=[1, RuntimeError("worker terminado")]):
+            with self.assertRaises(RuntimeError):
+                self.enviar()
+        # La primera quedó enviada apenas salió su correo
+        self.assertTrue(Alerta.objects.get(actividad=primera).enviado)
+        self.assertFalse(Alerta.objects.get(actividad=segunda).enviado)
+
+        # Al vencer el reclamo solo se reenvía la que no salió
+        self.ahora += ALERTAS_PLAZO_RECLAMO + timedelta(minutes=1)
+        self.assertEqual(self.enviar().enviadas, 1)
+        self.assertEqual([m.subject for m in mail.outbox], ["Alerta: Actividad 1"])
+
+    def test_error_de_red(self):
+        fallida, enviada = self.crear_actividades(2)
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                   side_effect=[TimeoutError("timed out"), 1]), \
+                self.assertLogs('alertas.tasks', 'WARNING') as registro:
+            ejecucion = self.enviar()
+        self.assertIn("timed out", registro.output[0])
+        self.assertEqual((ejecucion.enviadas, ejecucion.fallidas), (1, 1))
+        self.assertIsNone(Alerta.objects.get(actividad=fallida).reclamo)
+
+    def test_tiempo_por_lote(self):
+        self.crear_actividades(3)
+        # Sin tiempo: el lote envía un correo y deja el resto para el barrido siguiente
+        with patch('alertas.tasks.ALERTAS_SEGUNDOS_POR_LOTE', -1):
+            ejecucion = self.enviar()
+        self.assertEqual((ejecucion.enviadas, ejecucion.fallidas), (1, 2))
+        self.assertFalse(Alerta.objects.filter(reclamo__isnull=False, enviado=False).exists())
+        self.assertEqual(self.enviar().enviadas, 2)
+        self.assertEqual(len(mail.outbox), 3)
+
+    @override_settings(ALERTAS_RESUMEN_POR_DESTINATARIO=True)
+    def test_resumen_cortado_no_se_repite(self):
+        actividad, = self.crear_actividades(1)
+        with patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                   side_effect=[1, RuntimeError("worker terminado")]):
+            with self.assertRaises(RuntimeError):
+                self.enviar()
+        alerta = Alerta.objects.get(actividad=actividad)
+        self.assertEqual((alerta.enviado, alerta.enviada_a), (False, ["p0-0@example.cl"]))
+
+        # Al reintentar solo recibe el resumen quien no lo recibió
+        self.ahora += ALERTAS_PLAZO_RECLAMO + timedelta(minutes=1)
+        self.assertEqual(self.enviar().enviadas, 1)
+        self.assertEqual([m.to for m in mail.outbox], [["p0-1@example.cl"]])
+        self.assertTrue(Alerta.objects.get(actividad=actividad).enviado)
+
+    def test_usa_el_indice_parcial(self):
+        from .tasks import _alertas_vencidas
+        sql, params = _alertas_vencidas(self.ahora).query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(str(fila) for fila in cursor.fetchall())
+        self.assertIn('alerta_por_enviar_idx', plan)
+
+    def test_lotes(self):
+        self.crear_actividades(10)
+        with patch('alertas.tasks.ALERTAS_POR_LOTE', 3):
+            ejecucion = self.enviar()
+        self.assertEqual((ejecucion.lotes, ejecucion.enviadas), (4, 10))
+        self.assertEqual(len(mail.outbox), 10)
+
+    @override_settings(ALERTAS_RESUMEN_POR_DESTINATARIO=True)
+    def test_lotes_en_modo_resumen(self):
+        actividades = self.crear_actividades(6, encargados=1)
+        # Una persona encargada de la primera y la última: sus alertas van al mismo lote
+        Actividad_Encargado.objects.create(actividad=actividades[-1], encargado=Encargado.objects.get(nombre="Persona 0-0"))
+        with patch('alertas.tasks.ALERTAS_POR_LOTE', 2):
+            ejecucion = self.enviar()
+        self.assertEqual((ejecucion.lotes, ejecucion.enviadas), (3, 6))
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), [f"p{i}-0@example.cl" for i in range(6)])
+
+    @override_settings(ALERTAS_RESUMEN_POR_DESTINATARIO=True)
+    def test_lotes_en_modo_resumen_acotados(self):
+        actividades = self.crear_actividades(5, encargados=1)
+        # Una persona encargada de todas: el grupo se parte en lotes de ALERTAS_POR_LOTE
+        encargado = Encargado.objects.get(nombre="Persona 0-0")
+        for actividad in actividades[1:]:
+            Actividad_Encargado.objects.create(actividad=actividad, encargado=encargado)
+        with patch('alertas.tasks.ALERTAS_POR_LOTE', 2):
+            ejecucion = self.enviar()
+        self.assertEqual((ejecucion.lotes, ejecucion.enviadas), (3, 5))
+        self.assertEqual(sum(m.to == ["p0-0@example.cl"] for m in mail.outbox), 3)
+
+    def test_reclamo_idempotente(self):
+        alertas = [a.id for actividad in self.crear_actividades(3) for a in actividad.alertas.all()]
+        ejecucion = EjecucionAlertas.objects.create(dia=date(2025, 3, 4), alertas=3, lotes=2)
+
+        # Otra ejecución ya reclamó la primera alerta; un reintento del lote no reenvía nada
+        Alerta.objects.filter(id=alertas[0]).update(reclamo=uuid.uuid4())
+        self.assertEqual(enviar_lote(ejecucion.id, alertas), {'enviadas': 2, 'fallidas': 0, 'omitidas': 1})
+        self.assertEqual(enviar_lote(ejecucion.id, alertas), {'enviadas': 0, 'fallidas': 0, 'omitidas': 3})
+        self.assertEqual(len(mail.outbox), 2)
+
+        ejecucion.refresh_from_db()
+        self.assertEqual((ejecucion.lotes_terminados, ejecucion.enviadas, ejecucion.omitidas), (2, 2, 4))
+
+    def test_reclamo_vencido(self):
+        actividad, = self.crear_actividades(1)
+        # Un lote anterior la reclamó y su worker murió sin liberarla
+        Alerta.objects.filter(actividad=actividad).update(reclamo=uuid.uuid4(), reclamada_en=self.ahora)
+
+        self.ahora += ALERTAS_PLAZO_RECLAMO - timedelta(minutes=1)
+        self.assertIsNone(self.enviar())
+        self.ahora += timedelta(minutes=2)
+        self.assertEqual(self.enviar().enviadas, 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertTrue(Alerta.objects.get(actividad=actividad).enviado)
+
+
+class ReglaAlertaTests(TestCase):
+    def setUp(self):
+        self.proyecto = Proyecto.objects.create(nombre="Uno", fecha_inicio=date(2030, 1, 7))
+        self.linea = LineaTrabajo.objects.create(proyecto=self.proyecto, nombre="Línea 1")
+        self.actividad = Actividad.objects.create(linea_trabajo=self.linea, nombre="Actividad")
+        self.otra = Actividad.objects.create(linea_trabajo=self.linea, nombre="Otra")
+
+    def envios(self, actividad):
+        return [(a.fecha_envio.date(), a.enviado) for a in actividad.alertas.order_by('fecha_envio')]
+
+    def test_fechas_envio(self):
+        # 2030-01-11 es viernes
+        regla = ReglaAlerta(dias_antes=[0, 3, 3], hora_envio=time(8, 30))
+        self.assertEqual(regla.fechas_envio(date(2030, 1, 11)), [
+            datetime(2030, 1, 8, 8, 30, tzinfo=timezone.utc),
+            datetime(2030, 1, 11, 8, 30, tzinfo=timezone.utc),
+        ])
+
+        regla.modo = ModoDias.HABILES
+        self.assertEqual([f.date() for f in regla.fechas_envio(date(2030, 1, 11))], [date(2030, 1, 8), date(2030, 1, 11)])
+        # Un domingo se cuenta desde el viernes anterior
+        self.assertEqual([f.date() for f in regla.fechas_envio(date(2030, 1, 13))], [date(2030, 1, 8), date(2030, 1, 11)])
+
+    def test_dias_antes_invalidos(self):
+        for dias_antes in ([-1], [1.5], [True], 3):
+            with self.assertRaises(ValidationError):
+                ReglaAlerta(proyecto=self.proyecto, dias_antes=dias_antes).full_clean()
+
+    def test_fecha_regenera_solo_su_actividad(self):
+        fecha = Fecha.objects.create(actividad=self.actividad, fecha_inicio=date(2030, 1, 7), fecha_fin=date(2030, 1, 11))
+        Fecha.objects.create(actividad=self.otra, fecha_inicio=date(2030, 1, 7), fecha_fin=date(2030, 1, 18))
+        self.assertEqual(self.envios(self.actividad), [(date(2030, 1, 6), False)])
+
+        fecha.fecha_fin = date(2030, 1, 25)
+        fecha.save()
+        self.assertEqual(self.envios(self.actividad), [(date(2030, 1, 20), False)])
+        self.assertEqual(self.envios(self.otra), [(date(2030, 1, 13), False)])
+
+        fecha.delete()
+        self.assertEqual(self.envios(self.actividad), [])
+
+    def test_conserva_enviadas_y_no_crea_atrasadas(self):
+        Alerta.objects.create(actividad=self.actividad, fecha_envio=datetime(2030, 1, 1, 9, tzinfo=timezone.utc), enviado=True)
+        Fecha.objects.create(actividad=self.actividad, fecha_inicio=date(2020, 1, 6), fecha_fin=date(2020, 1, 10))
+        self.assertEqual(self.envios(self.actividad), [(date(2020, 1, 5), True), (date(2030, 1, 1), True)])
+
+    def test_completada_sin_alertas_pendientes(self):
+        Fecha.objects.create(actividad=self.actividad, fecha_inicio=date(2030, 1, 7), fecha_fin=date(2030, 1, 11))
+        self.actividad.estado = EstadoActividad.COMPLETADA
+        self.actividad.save()
+        self.assertEqual(self.envios(self.actividad), [])
+
+        Actividad.objects.filter(id=self.actividad.id).update(estado=EstadoActividad.EN_PROGRESO)
+        self.assertEqual(regenerar_alertas([self.actividad.id]), (1, 0))
+        self.assertEqual(regenerar_alertas([self.actividad.id]), (0, 0))
+
+    def test_solo_el_estado_regenera(self):
+        Fecha.objects.create(actividad=self.actividad, fecha_inicio=date(2030, 1, 7), fecha_fin=date(2030, 1, 11))
+        with patch('alertas.signals.regenerar_alertas') as regenerar:
+            self.actividad.nombre = "Actividad renombrada"
+            self.actividad.save()
+            self.actividad.estado = EstadoActividad.EN_PROGRESO
+            self.actividad.save(update_fields=['nombre'])  # el estado no se guarda
+            self.assertFalse(regenerar.called)
+
+            self.actividad.save()
+            regenerar.assert_called_once_with([self.actividad.id])
+
+    def test_cambio_de_regla_regenera_el_proyecto(self):
+        Fecha.objects.create(actividad=self.actividad, fecha_inicio=date(2030, 1, 7), fecha_fin=date(2030, 1, 11))
+        Fecha.objects.create(actividad=self.otra, fecha_inicio=date(2030, 1, 7), fecha_fin=date(2030, 1, 18))
+
+        regla = ReglaAlerta.objects.create(proyecto=self.proyecto, dias_antes=[1, 3], modo=ModoDias.HABILES)
+        self.assertEqual(self.envios(self.actividad), [(date(2030, 1, 8), False), (date(2030, 1, 10), False)])
+        self.assertEqual(self.envios(self.otra), [(date(2030, 1, 15), False), (date(2030, 1, 17), False)])
+
+        regla.delete()
+        self.assertEqual(self.envios(self.actividad), [(date(2030, 1, 6), False)])
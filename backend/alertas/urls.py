@@ -5,4 +5,5 @@ from . import views
 urlpatterns = [
     path('listado/<int:proyecto_id>/', views.listado_alertas,
     name='listado_alertas'), 
+    path('proximas/', views.proximas_alertas, name='proximas_alertas'),
 ]
\ No newline at end of file
@@ -1,38 +1,131 @@
+from datetime import date, datetime, time, timedelta
+
+from django.db.models import Exists, F, OuterRef, Q, Value
 from django.shortcuts import render, get_object_or_404
-from proyectos.models import Proyecto, Actividad, ActividadDifusion
-from django.db.models import Prefetch
+from django.utils import timezone
+from django.views.decorators.http import condition
+from proyectos.models import Actividad_Encargado, Alerta, Encargado, Proyecto
+from vistas.condicional import etag_proyecto, ultima_modificacion_proyecto
+from vistas.lectura import actividades_alertas
+from .consultas import fecha_limite, proyecto_de_actividad
 
 
 # Create your views here.
 
+# Alertas por página en próximas alertas
+POR_PAGINA = 50
+
 
+@condition(etag_func=etag_proyecto, last_modified_func=ultima_modificacion_proyecto)
 def listado_alertas(request, proyecto_id):
     proyecto = get_object_or_404(Proyecto, id=proyecto_id)
 
-    actividades_normales = Actividad.objects.filter(
-        linea_trabajo__proyecto=proyecto,
-    ).prefetch_related(
-        Prefetch('actividad_encargados__encargado'),
-        'alertas',
-        'fechas'
-    ).distinct()
+    # Actividades con encargados, fecha límite y alertas desde el snapshot del proyecto
+    actividades = actividades_alertas(proyecto)
+
+    return render(request, "alertas/listado_alertas.html", {
+        "proyecto": proyecto,
+        "actividades": actividades
+    })
+
 
-    actividades_difusion = ActividadDifusion.objects.filter(
-        proyecto=proyecto,
-    ).prefetch_related(
-        Prefetch('actividad_encargados__encargado'),
-        'alertas',
-        'fechas'
-    ).distinct()
+# =========================
+# Próximas alertas (todos los proyectos)
+# =========================
+def _fecha(valor, defecto):
+    try:
+        return date.fromisoformat(valor)
+    except (TypeError, ValueError):
+        return defecto
 
 
-    actividades = list(actividades_normales) + list(actividades_difusion)
+def _entero(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
 
-    for actividad in actividades:
-        fecha_activa = actividad.fechas.filter(estado=True).order_by('-fecha_fin').first()
-        actividad.fecha_limite = fecha_activa.fecha_fin if fecha_activa else None
 
-    return render(request, "alertas/listado_alertas.html", {
-        "proyecto": proyecto,
-        "actividades": actividades
-    })
\ No newline at end of file
+def _cursor(valor):
+    """Cursor 'fecha_envio ISO_id' de la última alerta de la página anterior, o None."""
+    fecha_envio, _, alerta_id = (valor or '').rpartition('_')
+    try:
+        return datetime.fromisoformat(fecha_envio), int(alerta_id)
+    except ValueError:
+        return None
+
+
+def alertas_pendientes(desde, hasta, encargado_id=None, proyecto_id=None, despues=None):
+    """
+    Alertas sin enviar entre desde y hasta (fechas, ambas incluidas) de todos los
+    proyectos, en orden de envío, con su actividad, proyecto y fecha límite. Se recorren
+    con el índice alerta_pendiente_envio_idx; despues es el cursor (fecha_envio, id)
+    de la última alerta de la página anterior.
+    """
+    inicio = timezone.make_aware(datetime.combine(desde, time.min))
+    fin = timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min))
+    # enviado=Value(False) se compara con '= false'; enviado=False genera 'NOT enviado', que no usa el índice
+    alertas = Alerta.objects.filter(enviado=Value(False), fecha_envio__gte=inicio, fecha_envio__lt=fin)
+
+    if encargado_id is not None:
+        alertas = alertas.filter(Exists(Actividad_Encargado.objects.filter(
+            actividad=OuterRef('actividad'), encargado_id=encargado_id, estado=True,
+        )))
+    if proyecto_id is not None:
+        alertas = alertas.filter(
+            Q(actividad__actividad__linea_trabajo__proyecto_id=proyecto_id)
+            | Q(actividad__actividaddifusion__proyecto_id=proyecto_id)
+        )
+    if despues is not None:
+        fecha_envio, alerta_id = despues
+        alertas = alertas.filter(Q(fecha_envio__gt=fecha_envio) | Q(fecha_envio=fecha_envio, id__gt=alerta_id))
+
+    return alertas.annotate(
+        actividad_nombre=F('actividad__nombre'),
+        proyecto_id=proyecto_de_actividad('actividad'),
+        proyecto_nombre=proyecto_de_actividad('actividad', 'nombre'),
+        fecha_limite=fecha_limite('actividad'),
+    ).order_by('fecha_envio', 'id').values(
+        'id', 'fecha_envio', 'actividad_id', 'actividad_nombre', 'proyecto_id', 'proyecto_nombre', 'fecha_limite',
+    )
+
+
+def proximas_alertas(request):
+    """Alertas pendientes de todos los proyectos; por defecto, las de esta semana (lunes a domingo)."""
+    hoy = timezone.localdate()
+    lunes = hoy - timedelta(days=hoy.weekday())
+    desde = _fecha(request.GET.get('desde'), lunes)
+    hasta = _fecha(request.GET.get('hasta'), lunes + timedelta(days=6))
+    encargado_id = _entero(request.GET.get('encargado'))
+    proyecto_id = _entero(request.GET.get('proyecto'))
+
+    alertas = list(alertas_pendientes(
+        desde, hasta, encargado_id, proyecto_id, _cursor(request.GET.get('despues')),
+    )[:POR_PAGINA + 1])
+    siguiente = None
+    if len(alertas) > POR_PAGINA:
+        alertas = alertas[:POR_PAGINA]
+        siguiente = f"{alertas[-1]['fecha_envio'].isoformat()}_{alertas[-1]['id']}"
+
+    # Encargados de las actividades de la página, en una consulta
+    encargados = {}
+    for actividad_id, nombre in Actividad_Encargado.objects.filter(
+        actividad_id__in={alerta['actividad_id'] for alerta in alertas}, estado=True,
+    ).order_by('id').values_list('actividad_id', 'encargado__nombre'):
+        encargados.setdefault(actividad_id, []).append(nombre)
+    for alerta in alertas:
+        alerta['encargados'] = encargados.get(alerta['actividad_id'], [])
+
+    filtros = request.GET.copy()
+    filtros.pop('despues', None)
+    return render(request, "alertas/proximas_alertas.html", {
+        "alertas": alertas,
+        "desde": desde,
+        "hasta": hasta,
+        "encargado_id": encargado_id,
+        "proyecto_id": proyecto_id,
+        "encargados": Encargado.objects.filter(estado=True).order_by('nombre').values('id', 'nombre'),
+        "proyectos": Proyecto.objects.order_by('nombre').values('id', 'nombre'),
+        "filtros": filtros.urlencode(),
+        "siguiente": siguiente,
+    })
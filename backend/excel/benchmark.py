@@ -0,0 +1,128 @@
+import json
+import os
+import time
+import tracemalloc
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .generador_gantt import generar_gantt
+from .import_gantt import (
+    importar_gantt, informacion_proyecto, leer_gantt, previsualizar_gantt, separar_tablas_excel,
+)
+
+# =========================
+# Escenarios
+# =========================
+# Parámetros de generar_gantt para cada tamaño de archivo
+ESCENARIOS = {
+    'pequeno': {'lineas': 3, 'actividades_por_linea': 10, 'filas_difusion': 5, 'semanas': 44},
+    'mediano': {'lineas': 10, 'actividades_por_linea': 50, 'filas_difusion': 30, 'semanas': 52},
+    'grande': {'lineas': 20, 'actividades_por_linea': 200, 'filas_difusion': 100, 'semanas': 104},
+}
+
+FASES = ['separar_tablas_excel', 'informacion_proyecto', 'previsualizar_gantt', 'leer_gantt', 'importar_gantt']
+
+
+# =========================
+# Medición
+# =========================
+def medir(funcion, repeticiones=1):
+    """
+    Ejecuta funcion y devuelve (resultado, medicion) con:
+    - segundos: el mejor tiempo de pared entre las repeticiones,
+    - consultas: consultas SQL de la primera ejecución,
+    - memoria_pico_kb: pico de memoria Python (tracemalloc) en una ejecución aparte,
+      para que el costo de tracemalloc no afecte el tiempo.
+    """
+    tiempos = []
+    consultas = None
+    resultado = None
+    for _ in range(max(1, repeticiones)):
+        with CaptureQueriesContext(connection) as ctx:
+            inicio = time.perf_counter()
+            resultado = funcion()
+            tiempos.append(time.perf_counter() - inicio)
+        if consultas is None:
+            consultas = len(ctx.captured_queries)
+
+    tracemalloc.start()
+    try:
+        funcion()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return resultado, {
+        'segundos': round(min(tiempos), 4),
+        'consultas': consultas,
+        'memoria_pico_kb': round(pico / 1024, 1),
+    }
+
+
+def ejecutar_benchmark(ruta, repeticiones=1):
+    """
+    Mide cada fase de la importación sobre el archivo en ruta.
+    Devuelve {fase: medicion}. La fase importar_gantt escribe en la base de datos
+    activa: debe correr sobre una base de prueba.
+    """
+    resultados = {}
+
+    tablas, resultados['separar_tablas_excel'] = medir(lambda: separar_tablas_excel(ruta), repeticiones)
+    _, resultados['informacion_proyecto'] = medir(lambda: informacion_proyecto(*tablas), repeticiones)
+    _, resultados['previsualizar_gantt'] = medir(lambda: previsualizar_gantt(ruta), repeticiones)
+    _, resultados['leer_gantt'] = medir(lambda: list(leer_gantt(ruta)), repeticiones)
+
+    def importar():
+        with open(ruta, 'rb') as archivo:
+            return importar_gantt(os.path.basename(ruta), archivo)
+    _, resultados['importar_gantt'] = medir(importar, repeticiones)
+
+    return resultados
+
+
+def ejecutar_escenarios(nombres, directorio, repeticiones=1, semilla=0):
+    """Genera el archivo de cada escenario en directorio y lo mide. Devuelve {escenario: {fase: medicion}}."""
+    resultados = {}
+    for nombre in nombres:
+        ruta = os.path.join(directorio, f"gantt_{nombre}.xlsx")
+        generar_gantt(ruta, semilla=semilla, **ESCENARIOS[nombre])
+        resultados[nombre] = ejecutar_benchmark(ruta, repeticiones)
+    return resultados
+
+
+# =========================
+# Línea base
+# =========================
+def guardar_linea_base(resultados, ruta):
+    with open(ruta, 'w', encoding='utf-8') as destino:
+        json.dump(resultados, destino, indent=2, ensure_ascii=False)
+
+
+def cargar_linea_base(ruta):
+    with open(ruta, encoding='utf-8') as origen:
+        return json.load(origen)
+
+
+def comparar_resultados(resultados, linea_base, tolerancia=0.2):
+    """
+    Compara contra una línea base guardada. Devuelve la lista de regresiones:
+    tiempo o memoria más de un `tolerancia` por sobre la base, o más consultas SQL
+    (las consultas no dependen de la máquina, se comparan exactas).
+    """
+    regresiones = []
+    for escenario, fases in resultados.items():
+        for fase, medicion in fases.items():
+            base = linea_base.get(escenario, {}).get(fase)
+            if not base:
+                continue
+            for metrica in ('segundos', 'memoria_pico_kb'):
+                if base[metrica] and medicion[metrica] > base[metrica] * (1 + tolerancia):
+                    regresiones.append(
+                        f"{escenario}/{fase}: {metrica} {base[metrica]} -> {medicion[metrica]}"
+                    )
+            if medicion['consultas'] > base['consultas']:
+                regresiones.append(
+                    f"{escenario}/{fase}: consultas {base['consultas']} -> {medicion['consultas']}"
+                )
+    return regresiones
@@ -0,0 +1,131 @@
+import random
+from datetime import date, timedelta
+
+import openpyxl
+
+# =========================
+# Layout de plantilla.xlsx
+# =========================
+MESES = [
+    'Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
+    'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre',
+]
+ENCABEZADO_NORMALES = ['Linea de trabajo', None, 'N°', 'Actividad', 'Responsable(s)', 'Producto Asociado']
+ENCABEZADO_DIFUSION = [
+    'N°', 'Actividad de Difusión', None, 'Responsable de la Actividad de Difusión',
+    'Producto(s) Asociado(s)', 'Línea(s) de Trabajo Asociada(s)',
+]
+PRIMERA_COLUMNA_FECHA = len(ENCABEZADO_NORMALES) + 1
+
+
+# =========================
+# Funciones auxiliares
+# =========================
+def _primer_lunes_de_marzo(anio):
+    inicio = date(anio, 3, 1)
+    return inicio + timedelta(days=(7 - inicio.weekday()) % 7)
+
+
+def _responsables(rng, cantidad, total_personas):
+    """Texto de responsables con el formato de la plantilla: 'nombre : correo ; nombre : correo'."""
+    elegidos = rng.sample(range(total_personas), min(cantidad, total_personas))
+    return ' ; '.join(f"Persona {i} : persona{i}@example.cl" for i in elegidos)
+
+
+def _marcar_bloques(ws, fila, rng, semanas, bloques_por_fila, semanas_por_bloque):
+    """Marca con 'X' hasta bloques_por_fila tramos contiguos de semanas en la fila."""
+    for _ in range(rng.randint(1, bloques_por_fila)):
+        largo = rng.randint(1, semanas_por_bloque)
+        inicio = rng.randrange(0, max(1, semanas - largo + 1))
+        for semana in range(inicio, min(semanas, inicio + largo)):
+            ws.cell(fila, PRIMERA_COLUMNA_FECHA + semana, 'X')
+
+
+# =========================
+# Generador
+# =========================
+def generar_gantt(
+    destino,
+    lineas=5,
+    actividades_por_linea=10,
+    filas_difusion=5,
+    semanas=44,
+    responsables_por_fila=2,
+    bloques_por_fila=2,
+    semanas_por_bloque=4,
+    personas=30,
+    productos=6,
+    inicio=None,
+    semilla=0,
+):
+    """
+    Escribe en destino (ruta o archivo) un Excel Gantt sintético con el mismo layout
+    que plantilla.xlsx: fila de meses, fila de encabezado con los días de cada semana,
+    actividades normales, fila "Difusión" y su tabla.
+    Con la misma semilla genera siempre el mismo archivo.
+    """
+    rng = random.Random(semilla)
+    inicio = inicio or _primer_lunes_de_marzo(date.today().year)
+
+    libro = openpyxl.Workbook()
+    ws = libro.active
+    ws.title = f"Gantt {inicio.year}"
+
+    # Encabezados: meses (celdas combinadas) y días de cada semana
+    for col, valor in enumerate(ENCABEZADO_NORMALES, start=1):
+        if valor is not None:
+            ws.cell(2, col, valor)
+    mes_actual = None
+    col_mes = None
+    for semana in range(semanas):
+        dia = inicio + timedelta(weeks=semana)
+        col = PRIMERA_COLUMNA_FECHA + semana
+        ws.cell(2, col, dia.day)
+        if dia.month != mes_actual:
+            if col_mes is not None and col - 1 > col_mes:
+                ws.merge_cells(start_row=1, start_column=col_mes, end_row=1, end_column=col - 1)
+            ws.cell(1, col, MESES[dia.month - 1])
+            mes_actual, col_mes = dia.month, col
+    ultima_col = PRIMERA_COLUMNA_FECHA + semanas - 1
+    if col_mes is not None and ultima_col > col_mes:
+        ws.merge_cells(start_row=1, start_column=col_mes, end_row=1, end_column=ultima_col)
+
+    # Actividades normales: la línea solo se escribe en su primera fila
+    fila = 3
+    n_act = 1
+    for linea in range(lineas):
+        for actividad in range(actividades_por_linea):
+            if actividad == 0:
+                ws.cell(fila, 1, f"Linea de trabajo {linea + 1}")
+            ws.cell(fila, 3, n_act)
+            ws.cell(fila, 4, f"Actividad {linea + 1}.{actividad + 1}")
+            ws.cell(fila, 5, _responsables(rng, responsables_por_fila, personas))
+            ws.cell(fila, 6, f"Producto Asociado {rng.randint(1, productos)}")
+            _marcar_bloques(ws, fila, rng, semanas, bloques_por_fila, semanas_por_bloque)
+            fila += 1
+            n_act += 1
+
+    # Sección de difusión
+    fila += 1
+    ws.cell(fila, 1, 'Difusión')
+    fila += 1
+    for col, valor in enumerate(ENCABEZADO_DIFUSION, start=1):
+        if valor is not None:
+            ws.cell(fila, col, valor)
+    fila += 1
+    for i in range(filas_difusion):
+        ws.cell(fila, 1, i + 1)
+        ws.cell(fila, 2, f"Actividad difusión {i + 1}")
+        ws.cell(fila, 4, _responsables(rng, responsables_por_fila, personas))
+        ws.cell(fila, 5, ' ; '.join(
+            f"Producto Asociado {p}" for p in rng.sample(range(1, productos + 1), min(2, productos))
+        ))
+        if lineas:
+            ws.cell(fila, 6, ' ; '.join(
+                f"Linea de trabajo {l}" for l in rng.sample(range(1, lineas + 1), min(2, lineas))
+            ))
+        _marcar_bloques(ws, fila, rng, semanas, bloques_por_fila, semanas_por_bloque)
+        fila += 1
+
+    libro.save(destino)
+    return destino
@@ -1,15 +1,20 @@
 import os
 import django
+import numpy as np
+import openpyxl
 import pandas as pd
 import unicodedata
-from datetime import datetime, date, timedelta, time
+from datetime import datetime, date
+from typing import NamedTuple
 from django.db import transaction
+from django.utils import timezone
 
 # Configurar Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'gespro.settings')
 django.setup()
 
 from proyectos.models import *
+from .lote_importacion import LoteImportacion
 
 # =========================
 # Excepciones
@@ -38,6 +43,29 @@ def normalize_str(s):
     s = s.encode('ASCII', 'ignore').decode('ASCII')
     return s.lower().strip()
 
+def parsear_responsables(responsables):
+    """
+    Separa la celda de responsables ("nombre : correo ; nombre : correo")
+    en una lista de tuplas (nombre, correo).
+    """
+    resultado = []
+    if not pd.notna(responsables):
+        return resultado
+    for r in str(responsables).split(';'):
+        r = r.strip()
+        if not r:
+            continue
+
+        partes = r.split(':')
+        if len(partes) == 2:
+            nombre = partes[0].strip()
+            correo = partes[1].strip()
+        else:
+            nombre = r
+            correo = ""
+        resultado.append((nombre, correo))
+    return resultado
+
 def obtener_fechas_reales(date_cols, anio_inicial=None):
     """
     Convierte columnas de fecha en objetos date, corrigiendo año si hay retroceso de mes.
@@ -123,34 +151,96 @@ def validar_columnas_difusion(df):
             raise FormatoInvalidoError(f"No se encontró la columna obligatoria: {col}")
     return True
 
+def detectar_bloques_matriz(valores):
+    """
+    Detecta los bloques de celdas marcadas de una matriz de fechas (array 2D) en una pasada.
+    Devuelve un dict {posición de fila: [(índice_col_inicio, índice_col_fin), ...]}.
+    """
+    if valores.size == 0:
+        return {}
+
+    # Celda marcada: no nula y con texto distinto de vacío
+    texto = np.char.strip(valores.astype(str))
+    mascara = pd.notna(valores) & (texto != '')
+
+    # Run-length: los bordes de cada bloque aparecen al diferenciar la máscara rellenada con False
+    borde = np.zeros((mascara.shape[0], 1), dtype=np.int8)
+    cambios = np.diff(np.hstack([borde, mascara.astype(np.int8), borde]), axis=1)
+    filas, inicios = np.nonzero(cambios == 1)
+    _, fines = np.nonzero(cambios == -1)
+
+    bloques = {}
+    for fila, inicio, fin in zip(filas.tolist(), inicios.tolist(), (fines - 1).tolist()):
+        bloques.setdefault(fila, []).append((inicio, fin))
+    return bloques
 
-def detectar_bloques(fila, date_cols):
-    bloques = []
-    bloque_activo = None
-    fin_col = None
-
-    for col in date_cols:
-        valor = fila.get(col)
-        if pd.notna(valor) and str(valor).strip():  # hay valor
-            if bloque_activo is None:
-                bloque_activo = col
-            fin_col = col
-        else:
-            if bloque_activo is not None:
-                bloques.append((bloque_activo, fin_col))
-                bloque_activo = None
-                fin_col = None
-
-    if bloque_activo is not None:
-        bloques.append((bloque_activo, fin_col))
 
-    return bloques
+def detectar_bloques(df_fechas, date_cols):
+    """
+    Detecta los bloques de celdas marcadas de toda la matriz de fechas del DataFrame.
+    Devuelve un dict {posición de fila: [(col_inicio, col_fin), ...]}.
+    """
+    bloques = detectar_bloques_matriz(df_fechas[date_cols].to_numpy(dtype=object))
+    return {
+        fila: [(date_cols[inicio], date_cols[fin]) for inicio, fin in bloques_fila]
+        for fila, bloques_fila in bloques.items()
+    }
 
 # =========================
-# Función principal: Actividades normales
+# Filas tipadas
 # =========================
-def crear_proyecto_con_actividades_normales(nombre_proyecto, df_normales):
-    """Crea Proyecto y actividades normales, actualizando fecha inicio y fin del proyecto."""
+class FilaNormal(NamedTuple):
+    """Fila de la tabla de actividades normales, con sus bloques ya convertidos a fechas."""
+    linea: object           # línea de trabajo vigente (se arrastra desde filas anteriores)
+    n_act: object
+    actividad: object
+    responsables: object
+    producto: object
+    bloques: list           # [(fecha_inicio, fecha_fin), ...]
+
+
+class FilaDifusion(NamedTuple):
+    """Fila de la tabla de difusión, con sus bloques ya convertidos a fechas."""
+    n_act: object
+    actividad: object
+    responsables: object
+    productos: object       # texto "producto ; producto"
+    lineas: object          # texto "línea ; línea"
+    bloques: list
+
+
+def _valor(v):
+    """Convierte NaN/celda vacía en None."""
+    if v is None:
+        return None
+    try:
+        return None if pd.isna(v) else v
+    except (TypeError, ValueError):
+        return v
+
+
+def _entero(v):
+    v = _valor(v)
+    if v is None:
+        return None
+    try:
+        return int(float(v))
+    except (TypeError, ValueError):
+        return None
+
+
+def _separar_lista(valor):
+    """Separa un texto "a ; b ; c" en sus elementos no vacíos."""
+    if valor is None:
+        return []
+    return [v.strip() for v in str(valor).split(';') if v.strip()]
+
+
+def filas_desde_tablas(df_normales, df_difusion):
+    """
+    Convierte los DataFrames de separar_tablas_excel en filas tipadas
+    (FilaNormal y luego FilaDifusion).
+    """
     info_cols = validar_columnas_normales(df_normales)
     date_cols = [c for c in df_normales.columns if c not in info_cols]
     fechas_reales = obtener_fechas_reales(date_cols)
@@ -158,245 +248,374 @@ def crear_proyecto_con_actividades_normales(nombre_proyecto, df_normales):
         raise FormatoInvalidoError("No se encontraron columnas de fechas válidas en el archivo.")
     date_cols = [c for c in date_cols if c in fechas_reales]
 
-    proyecto = Proyecto.objects.create(
-        nombre=nombre_proyecto,
-        fecha_inicio=datetime.now().date(),
-        fecha_fin=None
-    )
-
-    primera_fecha = None
-    ultima_fecha = None
-    ultima_linea = None
+    def columna(df, col):
+        return df[col].tolist() if col in df.columns else [None] * len(df)
 
-    for idx, row in df_normales.iterrows():
-        # Línea de trabajo
-        linea = row.get(('Unnamed: 0_level_0', 'Linea de trabajo'))
-        n_act = row.get(('Unnamed: 2_level_0', 'N°'))
-        producto_nombre = row.get(('Unnamed: 5_level_0', 'Producto Asociado'))
-        actividad_nombre = row.get(('Unnamed: 3_level_0', 'Actividad'))
-        responsables = row.get(('Unnamed: 4_level_0', 'Responsable(s)'))
+    def a_fechas(bloques):
+        return [(fechas_reales[inicio], fechas_reales[fin]) for inicio, fin in bloques]
 
-        if pd.notna(linea):
+    # Actividades normales
+    bloques_por_fila = detectar_bloques(df_normales, date_cols)
+    ultima_linea = None
+    columnas = zip(
+        columna(df_normales, ('Unnamed: 0_level_0', 'Linea de trabajo')),
+        columna(df_normales, ('Unnamed: 2_level_0', 'N°')),
+        columna(df_normales, ('Unnamed: 3_level_0', 'Actividad')),
+        columna(df_normales, ('Unnamed: 4_level_0', 'Responsable(s)')),
+        columna(df_normales, ('Unnamed: 5_level_0', 'Producto Asociado')),
+    )
+    for idx, (linea, n_act, actividad, responsables, producto) in enumerate(columnas):
+        linea = _valor(linea)
+        if linea is not None:
             ultima_linea = linea
-        if not ultima_linea:
-            continue
+        yield FilaNormal(
+            linea=ultima_linea,
+            n_act=_entero(n_act),
+            actividad=_valor(actividad),
+            responsables=_valor(responsables),
+            producto=_valor(producto),
+            bloques=a_fechas(bloques_por_fila.get(idx, [])),
+        )
 
-        linea_obj, _ = LineaTrabajo.objects.get_or_create(
-            proyecto=proyecto,
-            nombre=ultima_linea
+    # Actividades de difusión: mismas columnas de fechas que las normales
+    validar_columnas_difusion(df_difusion)
+    df_fechas_difusion = df_difusion.iloc[:, -len(date_cols):].copy()
+    df_fechas_difusion.columns = date_cols
+    bloques_por_fila = detectar_bloques(df_fechas_difusion, date_cols)
+    columnas = zip(
+        columna(df_difusion, 'N°'),
+        columna(df_difusion, 'Actividad de Difusión'),
+        columna(df_difusion, 'Responsable de la Actividad de Difusión'),
+        columna(df_difusion, 'Producto(s) Asociado(s)'),
+        columna(df_difusion, 'Línea(s) de Trabajo Asociada(s)'),
+    )
+    for idx, (n_act, actividad, responsables, productos, lineas) in enumerate(columnas):
+        yield FilaDifusion(
+            n_act=_entero(n_act),
+            actividad=_valor(actividad),
+            responsables=_valor(responsables),
+            productos=_valor(productos),
+            lineas=_valor(lineas),
+            bloques=a_fechas(bloques_por_fila.get(idx, [])),
         )
 
-        # Producto asociado
-        producto_obj = None
-        if pd.notna(producto_nombre):
-            producto_obj = ProductoAsociado.objects.filter(nombre__iexact=producto_nombre, proyecto=proyecto).first()
-            if not producto_obj:
-                producto_obj = ProductoAsociado.objects.create(nombre=producto_nombre, extension='', proyecto=proyecto)
+# =========================
+# Lectura en streaming (openpyxl read-only)
+# =========================
+COLUMNAS_NORMALES = {
+    'linea de trabajo': 'linea',
+    'n': 'n_act',
+    'actividad': 'actividad',
+    'responsable(s)': 'responsables',
+    'producto asociado': 'producto',
+}
 
-        # Actividad
-        if pd.isna(actividad_nombre):
-            continue
+COLUMNAS_DIFUSION = {
+    'n': 'n_act',
+    'actividad de difusion': 'actividad',
+    'responsable de la actividad de difusion': 'responsables',
+    'producto(s) asociado(s)': 'productos',
+    'linea(s) de trabajo asociada(s)': 'lineas',
+}
 
-        bloques = detectar_bloques(row, date_cols)
-        if not bloques:
-            continue
+COLUMNAS_DIFUSION_OBLIGATORIAS = [
+    ('actividad', 'Actividad de Difusión'),
+    ('responsables', 'Responsable de la Actividad de Difusión'),
+    ('productos', 'Producto(s) Asociado(s)'),
+    ('lineas', 'Línea(s) de Trabajo Asociada(s)'),
+]
 
-        actividad_obj = Actividad.objects.create(
-            linea_trabajo=linea_obj,
-            producto_asociado=producto_obj,
-            nombre=actividad_nombre,
-            n_act=n_act if pd.notna(n_act) else None
-        )
+# Filas que se procesan juntas al detectar bloques; acota la memoria usada
+TAMANO_TROZO = 500
 
-        # Fechas de la actividad
-        for inicio_col, fin_col in bloques:
-            fecha_inicio = fechas_reales.get(inicio_col)
-            fecha_fin = fechas_reales.get(fin_col)
-            if fecha_inicio and fecha_fin:
-                Fecha.objects.create(actividad=actividad_obj, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin)
-
-                # Alertas
-                for dias_antes in [5]:
-                    fecha_envio = datetime.combine(fecha_fin - timedelta(days=dias_antes), time(hour=9, minute=0))
-
-                    enviado = fecha_envio <= datetime.now()
-
-                    Alerta.objects.create(
-                        actividad=actividad_obj,
-                        fecha_envio=fecha_envio,
-                        enviado=enviado
-                    )
-
-                if primera_fecha is None or fecha_inicio < primera_fecha:
-                    primera_fecha = fecha_inicio
-                if ultima_fecha is None or fecha_fin > ultima_fecha:
-                    ultima_fecha = fecha_fin
-
-        # Encargados
-        if pd.notna(responsables):
-            for r in str(responsables).split(';'):
-                r = r.strip()
-                if not r:
-                    continue
-
-                partes = r.split(':')
-                if len(partes) == 2:
-                    nombre = partes[0].strip()
-                    correo = partes[1].strip()
-                else:
-                    nombre = r
-                    correo = ""
-
-                encargado_obj = Encargado.objects.filter(correo_electronico__iexact=correo).first() if correo else None
-                if not encargado_obj:
-                    encargado_obj = Encargado.objects.filter(nombre__iexact=nombre).first()
-                if not encargado_obj:
-                    encargado_obj = Encargado.objects.create(nombre=nombre, correo_electronico=correo)
-
-                Actividad_Encargado.objects.get_or_create(
-                    actividad=actividad_obj,
-                    encargado=encargado_obj
-                )
 
-    # Actualizar fechas del proyecto
-    proyecto.fecha_inicio = primera_fecha or datetime.now().date()
-    proyecto.fecha_fin = ultima_fecha or proyecto.fecha_inicio
-    proyecto.save()
+def _posiciones_columnas(encabezado, nombres):
+    """Mapea cada campo conocido a la primera columna del encabezado con ese nombre."""
+    posiciones = {}
+    for pos, valor in enumerate(encabezado):
+        campo = nombres.get(normalize_str(valor))
+        if campo and campo not in posiciones:
+            posiciones[campo] = pos
+    return posiciones
 
-    return proyecto, date_cols, fechas_reales
 
-
-# =========================
-# Función de difusión
-# =========================
-def crear_actividades_difusion(proyecto, df_difusion, date_cols, fechas_reales):
+def _columnas_fecha(fila_meses, encabezado, posiciones_info):
     """
-    Crea actividades de difusión reutilizando date_cols y fechas_reales de actividades normales.
+    Devuelve [(posición, fecha), ...] para las columnas de fecha del encabezado.
+    El mes se toma de la fila superior (celdas combinadas: se arrastra hacia la derecha).
     """
+    columnas = []
+    mes = None
+    for pos, dia in enumerate(encabezado):
+        if fila_meses and pos < len(fila_meses) and fila_meses[pos] is not None:
+            mes = fila_meses[pos]
+        if pos in posiciones_info:
+            continue
+        columnas.append((str(mes).strip() if mes is not None else '', dia, pos))
 
-    COL_N_ACT = 'N°'
-    COL_ACTIVIDAD = 'Actividad de Difusión'
-    COL_RESPONSABLE = 'Responsable de la Actividad de Difusión'
-    COL_PRODUCTO = 'Producto(s) Asociado(s)'
-    COL_LINEA = 'Línea(s) de Trabajo Asociada(s)'
+    fechas_reales = obtener_fechas_reales(columnas)
+    return [(col[2], fecha) for col, fecha in fechas_reales.items()]
 
 
-    # Mapear columnas de fechas de normales a difusión
-    n_fechas = len(date_cols)
-    df_fechas_difusion = df_difusion.iloc[:, -n_fechas:].copy()
-    df_fechas_difusion.columns = date_cols
+def _procesar_trozo(trozo, posiciones, columnas_fecha, construir):
+    """Detecta los bloques de un trozo de filas crudas y construye las filas tipadas."""
+    indices = [pos for pos, _ in columnas_fecha]
+    fechas = [fecha for _, fecha in columnas_fecha]
+    ancho = max(indices) + 1
+    matriz = np.array(
+        [(tuple(v[:ancho]) + (None,) * (ancho - len(v)))[:ancho] for v in trozo],
+        dtype=object,
+    ).reshape(len(trozo), ancho)
+    bloques = detectar_bloques_matriz(matriz[:, indices])
 
-    for idx, row in df_difusion.iterrows():
-        actividad_nombre = row.get(COL_ACTIVIDAD)
-        if pd.isna(actividad_nombre) or not str(actividad_nombre).strip():
-            continue
+    for idx, valores in enumerate(trozo):
+        campos = {
+            campo: (valores[pos] if pos < len(valores) else None)
+            for campo, pos in posiciones.items()
+        }
+        campos['bloques'] = [(fechas[i], fechas[f]) for i, f in bloques.get(idx, [])]
+        yield construir(campos)
 
-        actividad_obj = ActividadDifusion.objects.create(
-            nombre=str(actividad_nombre).strip(),
-            proyecto=proyecto,
-            n_act=row.get(COL_N_ACT) if pd.notna(row.get(COL_N_ACT)) else None
-        )
 
-        # Productos asociados
-        productos_str = row.get(COL_PRODUCTO, '')
-        productos = [p.strip() for p in str(productos_str).split(';') if p.strip()]
-        for p_nombre in productos:
-            producto_obj = ProductoAsociado.objects.filter(nombre__iexact=p_nombre, proyecto=proyecto).first()
-            if not producto_obj:
-                producto_obj = ProductoAsociado.objects.create(nombre=p_nombre, extension='', proyecto=proyecto)
-            ActividadDifusion_Producto.objects.get_or_create(
-                actividad=actividad_obj,
-                producto_asociado=producto_obj
-            )
+def _fila_vacia(valores):
+    return all(v is None or (isinstance(v, str) and not v.strip()) for v in valores)
+
 
-        # Líneas de trabajo asociadas
-        lineas_str = row.get(COL_LINEA, '')
-        lineas = [l.strip() for l in str(lineas_str).split(';') if l.strip()]
-        for l_nombre in lineas:
-            linea_obj, _ = LineaTrabajo.objects.get_or_create(
-                proyecto=proyecto,
-                nombre=l_nombre
+def leer_gantt(archivo):
+    """
+    Lee un Excel Gantt fila a fila con openpyxl en modo read-only y produce
+    filas tipadas (FilaNormal y luego FilaDifusion). Detecta sobre la marcha
+    las filas de encabezado y la sección "Difusión"; la memoria usada no
+    depende del tamaño de la hoja.
+    """
+    nombre = getattr(archivo, 'name', str(archivo))
+    if str(nombre).lower().endswith('.xls'):
+        # openpyxl no lee .xls: se usa el lector de pandas
+        yield from filas_desde_tablas(*separar_tablas_excel(archivo))
+        return
+
+    libro = openpyxl.load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        filas = libro.worksheets[0].iter_rows(values_only=True)
+
+        # Encabezado de actividades normales: la fila con "Actividad", precedida por la de meses
+        fila_meses = None
+        encabezado = None
+        for valores in filas:
+            if 'actividad' in {normalize_str(v) for v in valores}:
+                encabezado = valores
+                break
+            fila_meses = valores
+        if encabezado is None:
+            raise FormatoInvalidoError("No se encontraron columnas válidas para actividades normales.")
+
+        posiciones = _posiciones_columnas(encabezado, COLUMNAS_NORMALES)
+        columnas_fecha = _columnas_fecha(fila_meses, encabezado, set(posiciones.values()))
+        if not columnas_fecha:
+            raise FormatoInvalidoError("No se encontraron columnas de fechas válidas en el archivo.")
+
+        # Actividades normales hasta la fila "Difusión"
+        ultima_linea = None
+
+        def construir_normal(campos):
+            nonlocal ultima_linea
+            if campos.get('linea') is not None:
+                ultima_linea = campos['linea']
+            return FilaNormal(
+                linea=ultima_linea,
+                n_act=_entero(campos.get('n_act')),
+                actividad=campos.get('actividad'),
+                responsables=campos.get('responsables'),
+                producto=campos.get('producto'),
+                bloques=campos['bloques'],
             )
-            ActividadDifusion_Linea.objects.get_or_create(
-                actividad=actividad_obj,
-                linea_trabajo=linea_obj
+
+        trozo = []
+        encontrada_difusion = False
+        for valores in filas:
+            if valores and normalize_str(valores[0]) == 'difusion':
+                encontrada_difusion = True
+                break
+            if _fila_vacia(valores):
+                continue
+            trozo.append(valores)
+            if len(trozo) >= TAMANO_TROZO:
+                yield from _procesar_trozo(trozo, posiciones, columnas_fecha, construir_normal)
+                trozo = []
+        if trozo:
+            yield from _procesar_trozo(trozo, posiciones, columnas_fecha, construir_normal)
+
+        if not encontrada_difusion:
+            raise FormatoInvalidoError("No se encontró la sección Difusión en el Excel.")
+
+        # Encabezado y filas de difusión (puede haber filas en blanco antes del encabezado)
+        encabezado = next((valores for valores in filas if not _fila_vacia(valores)), None) or ()
+        posiciones = _posiciones_columnas(encabezado, COLUMNAS_DIFUSION)
+        for campo, columna in COLUMNAS_DIFUSION_OBLIGATORIAS:
+            if campo not in posiciones:
+                raise FormatoInvalidoError(f"No se encontró la columna obligatoria: {columna}")
+
+        def construir_difusion(campos):
+            return FilaDifusion(
+                n_act=_entero(campos.get('n_act')),
+                actividad=campos.get('actividad'),
+                responsables=campos.get('responsables'),
+                productos=campos.get('productos'),
+                lineas=campos.get('lineas'),
+                bloques=campos['bloques'],
             )
-        # Fechas de la actividad
-        bloques = detectar_bloques(df_fechas_difusion.loc[idx], date_cols)
-        for inicio_col, fin_col in bloques:
-            fecha_inicio = fechas_reales.get(inicio_col)
-            fecha_fin = fechas_reales.get(fin_col)
-            if fecha_inicio and fecha_fin:
-                Fecha.objects.create(
-                    actividad=actividad_obj,
-                    fecha_inicio=fecha_inicio,
-                    fecha_fin=fecha_fin
-                )
-                
-                # Alertas
-                for dias_antes in [5]:
-                    fecha_envio = datetime.combine(fecha_fin - timedelta(days=dias_antes), time(hour=9, minute=0))
-
-                    enviado = fecha_envio <= datetime.now()
-
-                    Alerta.objects.create(
-                        actividad=actividad_obj,
-                        fecha_envio=fecha_envio,
-                        enviado=enviado
-                    )
-
-
-                if fecha_inicio is not None:
-                    if proyecto.fecha_inicio is None or fecha_inicio < proyecto.fecha_inicio:
-                        proyecto.fecha_inicio = fecha_inicio
-                if fecha_fin is not None:
-                    if proyecto.fecha_fin is None or fecha_fin > proyecto.fecha_fin:
-                        proyecto.fecha_fin = fecha_fin
-
-        # Encargados
-        responsables = row.get(COL_RESPONSABLE, '')
-        if pd.notna(responsables):
-            for r in str(responsables).split(';'):
-                r = r.strip()
-                if not r:
-                    continue
-
-                partes = r.split(':')
-                if len(partes) == 2:
-                    nombre = partes[0].strip()
-                    correo = partes[1].strip()
-                else:
-                    nombre = r
-                    correo = ""
-
-                encargado_obj = Encargado.objects.filter(correo_electronico__iexact=correo).first() if correo else None
-                if not encargado_obj:
-                    encargado_obj = Encargado.objects.filter(nombre__iexact=nombre).first()
-                if not encargado_obj:
-                    encargado_obj = Encargado.objects.create(nombre=nombre, correo_electronico=correo)
-
-                Actividad_Encargado.objects.get_or_create(
-                    actividad=actividad_obj,  # ahora apunta a ActividadBase
-                    encargado=encargado_obj
-                )
-    proyecto.save()
+
+        trozo = []
+        for valores in filas:
+            if _fila_vacia(valores):
+                continue
+            trozo.append(valores)
+            if len(trozo) >= TAMANO_TROZO:
+                yield from _procesar_trozo(trozo, posiciones, columnas_fecha, construir_difusion)
+                trozo = []
+        if trozo:
+            yield from _procesar_trozo(trozo, posiciones, columnas_fecha, construir_difusion)
+    finally:
+        libro.close()
+
+# =========================
+# Creación de actividades a partir de filas tipadas
+# =========================
+def agregar_fechas_y_alertas(lote, actividad_obj, bloques):
+    for fecha_inicio, fecha_fin in bloques:
+        lote.agregar_fecha(actividad_obj, fecha_inicio, fecha_fin)
+
+        # Alertas según la regla del proyecto (ver alertas.models.ReglaAlerta)
+        for fecha_envio in lote.regla_alerta.fechas_envio(fecha_fin):
+            enviado = fecha_envio <= timezone.now()
+
+            lote.agregar_alerta(actividad_obj, fecha_envio, enviado)
+
+
+def crear_actividad_normal(lote, fila):
+    """Agrega al lote la línea, el producto, la actividad, fechas y encargados de una FilaNormal."""
+    if not fila.linea:
+        return None
+
+    linea_obj = lote.linea(fila.linea)
+
+    # Producto asociado
+    producto_obj = None
+    if fila.producto is not None:
+        producto_obj = lote.producto(fila.producto)
+
+    # Actividad
+    if fila.actividad is None or not fila.bloques:
+        return None
+
+    actividad_obj = lote.agregar_actividad(Actividad(
+        linea_trabajo=linea_obj,
+        producto_asociado=producto_obj,
+        nombre=fila.actividad,
+        n_act=fila.n_act
+    ))
+
+    agregar_fechas_y_alertas(lote, actividad_obj, fila.bloques)
+
+    # Encargados
+    for nombre, correo in parsear_responsables(fila.responsables):
+        encargado_obj = lote.encargado(nombre, correo)
+        lote.asignar_encargado(actividad_obj, encargado_obj)
+
+    return actividad_obj
+
+
+def crear_actividad_difusion(lote, fila):
+    """Agrega al lote la actividad de difusión de una FilaDifusion con sus productos, líneas, fechas y encargados."""
+    if fila.actividad is None or not str(fila.actividad).strip():
+        return None
+
+    actividad_obj = lote.agregar_actividad(ActividadDifusion(
+        nombre=str(fila.actividad).strip(),
+        proyecto=lote.proyecto,
+        n_act=fila.n_act
+    ))
+
+    # Productos asociados
+    for p_nombre in _separar_lista(fila.productos):
+        producto_obj = lote.producto(p_nombre)
+        lote.asociar_producto_difusion(actividad_obj, producto_obj)
+
+    # Líneas de trabajo asociadas
+    for l_nombre in _separar_lista(fila.lineas):
+        linea_obj = lote.linea(l_nombre)
+        lote.asociar_linea_difusion(actividad_obj, linea_obj)
+
+    agregar_fechas_y_alertas(lote, actividad_obj, fila.bloques)
+
+    # Encargados
+    for nombre, correo in parsear_responsables(fila.responsables):
+        encargado_obj = lote.encargado(nombre, correo)
+        lote.asignar_encargado(actividad_obj, encargado_obj)
+
+    return actividad_obj
 
 
 # =========================
 # Función general de importación
 # =========================
+FASE_LECTURA = 'Leyendo filas'
+FASE_ESCRITURA = 'Guardando en la base de datos'
+
+# Cada cuántas filas se informa el progreso
+PROGRESO_CADA = 100
+
+def importar_filas(nombre_proyecto, filas, progreso=None):
+    """
+    Crea el Proyecto y todas sus actividades a partir de filas tipadas
+    (de leer_gantt o filas_desde_tablas), escribiéndolas en bloque.
+
+    Las filas se leen y se resuelven fuera de la transacción; la base de datos
+    solo queda bloqueada durante la escritura del lote.
+    progreso: callable opcional progreso(fase, filas_procesadas).
+    """
+    proyecto = Proyecto(
+        nombre=nombre_proyecto,
+        fecha_inicio=datetime.now().date(),
+        fecha_fin=None
+    )
+    lote = LoteImportacion(proyecto)
+
+    procesadas = 0
+    for fila in filas:
+        if isinstance(fila, FilaDifusion):
+            crear_actividad_difusion(lote, fila)
+        else:
+            crear_actividad_normal(lote, fila)
+        procesadas += 1
+        if progreso and procesadas % PROGRESO_CADA == 0:
+            progreso(FASE_LECTURA, procesadas)
+
+    # Actualizar fechas del proyecto
+    if lote.fechas:
+        proyecto.fecha_inicio = min(f.fecha_inicio for f in lote.fechas)
+        proyecto.fecha_fin = max(f.fecha_fin for f in lote.fechas)
+    else:
+        proyecto.fecha_fin = proyecto.fecha_inicio
+
+    if progreso:
+        progreso(FASE_ESCRITURA, procesadas)
+
+    with transaction.atomic():
+        proyecto.save()
+        lote.guardar()
+
+    return proyecto
+
 def importar_gantt(nombre_proyecto, archivo_excel):
     if not archivo_excel.name.endswith(('.xls', '.xlsx')):
         raise FormatoInvalidoError("El archivo debe ser Excel (.xls o .xlsx)")
 
-    df_normales, df_difusion = separar_tablas_excel(archivo_excel)
-
-    with transaction.atomic():
+    return importar_filas(nombre_proyecto, leer_gantt(archivo_excel))
 
-        validar_columnas_normales(df_normales)
-        proyecto, date_cols, fechas_reales = crear_proyecto_con_actividades_normales(nombre_proyecto, df_normales)      
-        validar_columnas_difusion(df_difusion)   
-        crear_actividades_difusion(proyecto, df_difusion, date_cols, fechas_reales)
+def importar_tablas(nombre_proyecto, df_normales, df_difusion):
+    """Importa un proyecto a partir de las tablas ya separadas por separar_tablas_excel."""
+    return importar_filas(nombre_proyecto, filas_desde_tablas(df_normales, df_difusion))
 
 def informacion_proyecto(df_normales, df_difusion):
     """Devuelve un resumen de la información del proyecto a importar."""
@@ -411,4 +630,106 @@ def informacion_proyecto(df_normales, df_difusion):
     info['Líneas de trabajo de difusión'] = df_difusion['Línea(s) de Trabajo Asociada(s)'].nunique()
 
 
-    return info
\ No newline at end of file
+    return info
+
+def previsualizar_gantt(archivo):
+    """
+    Resumen para el modal de verificación (mismo diccionario que informacion_filas)
+    leyendo solo las columnas de información y el marcador "Difusión" (iter_rows con
+    max_col): la grilla de fechas no se entrega ni se convierte en bloques. Valida el mismo formato
+    que leer_gantt; el parseo completo queda para la importación.
+    """
+    nombre = getattr(archivo, 'name', str(archivo))
+    if str(nombre).lower().endswith('.xls'):
+        # openpyxl no lee .xls: se usa el parseo completo
+        return informacion_filas(leer_gantt(archivo))
+
+    libro = openpyxl.load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        hoja = libro.worksheets[0]
+
+        # Encabezado: se lee completo solo hasta encontrar la fila con "Actividad"
+        fila_meses = None
+        encabezado = None
+        for n_fila, valores in enumerate(hoja.iter_rows(values_only=True), start=1):
+            if 'actividad' in {normalize_str(v) for v in valores}:
+                encabezado = valores
+                break
+            fila_meses = valores
+        if encabezado is None:
+            raise FormatoInvalidoError("No se encontraron columnas válidas para actividades normales.")
+
+        posiciones = _posiciones_columnas(encabezado, COLUMNAS_NORMALES)
+        columnas_fecha = _columnas_fecha(fila_meses, encabezado, set(posiciones.values()))
+        if not columnas_fecha:
+            raise FormatoInvalidoError("No se encontraron columnas de fechas válidas en el archivo.")
+
+        # El resto de la hoja se lee solo hasta donde empieza la grilla de fechas
+        ancho_info = max(min(pos for pos, _ in columnas_fecha), 1)
+        filas = hoja.iter_rows(min_row=n_fila + 1, max_col=ancho_info, values_only=True)
+
+        def valor(valores, campo):
+            pos = posiciones.get(campo)
+            return valores[pos] if pos is not None and pos < len(valores) else None
+
+        actividades = 0
+        lineas = set()
+        encontrada_difusion = False
+        for valores in filas:
+            if valores and normalize_str(valores[0]) == 'difusion':
+                encontrada_difusion = True
+                break
+            if valor(valores, 'actividad') is not None:
+                actividades += 1
+            if valor(valores, 'linea') is not None:
+                lineas.add(valor(valores, 'linea'))
+        if not encontrada_difusion:
+            raise FormatoInvalidoError("No se encontró la sección Difusión en el Excel.")
+
+        encabezado = next((valores for valores in filas if not _fila_vacia(valores)), None) or ()
+        posiciones = _posiciones_columnas(encabezado, COLUMNAS_DIFUSION)
+        for campo, columna in COLUMNAS_DIFUSION_OBLIGATORIAS:
+            if campo not in posiciones:
+                raise FormatoInvalidoError(f"No se encontró la columna obligatoria: {columna}")
+
+        actividades_difusion = 0
+        lineas_difusion = set()
+        for valores in filas:
+            if valor(valores, 'actividad') is not None:
+                actividades_difusion += 1
+            if valor(valores, 'lineas') is not None:
+                lineas_difusion.add(valor(valores, 'lineas'))
+    finally:
+        libro.close()
+
+    info = {}
+    info['Actividades'] = actividades
+    info['Líneas de trabajo'] = len(lineas)
+    info['Actividades de difusión'] = actividades_difusion
+    info['Líneas de trabajo de difusión'] = len(lineas_difusion)
+    return info
+
+def informacion_filas(filas):
+    """Devuelve el mismo resumen que informacion_proyecto a partir de filas tipadas."""
+    actividades = 0
+    lineas = set()
+    actividades_difusion = 0
+    lineas_difusion = set()
+    for fila in filas:
+        if isinstance(fila, FilaDifusion):
+            if fila.actividad is not None:
+                actividades_difusion += 1
+            if fila.lineas is not None:
+                lineas_difusion.add(fila.lineas)
+        else:
+            if fila.actividad is not None:
+                actividades += 1
+            if fila.linea is not None:
+                lineas.add(fila.linea)
+
+    info = {}
+    info['Actividades'] = actividades
+    info['Líneas de trabajo'] = len(lineas)
+    info['Actividades de difusión'] = actividades_difusion
+    info['Líneas de trabajo de difusión'] = len(lineas_difusion)
+    return info
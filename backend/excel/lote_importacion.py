@@ -0,0 +1,286 @@
+from django.db import connections, router
+from django.db.models import Q, Value
+from django.db.models.functions import Lower
+from proyectos.models import *
+from alertas.reglas import regla_del_proyecto
+
+
+# =========================
+# Inserción masiva con herencia multi-tabla
+# =========================
+def bulk_create_herencia(objs):
+    """
+    bulk_create para modelos hijos de ActividadBase (herencia multi-tabla).
+    Inserta primero las filas padre con un bulk_create y luego las filas hijas
+    con un executemany por modelo, reutilizando los ids devueltos por la base de datos.
+    """
+    if not objs:
+        return objs
+
+    using = router.db_for_write(ActividadBase)
+    conexion = connections[using]
+    campos_padre = [
+        f for f in ActividadBase._meta.concrete_fields if not f.primary_key
+    ]
+
+    # Claves foráneas asignadas como objeto antes de que ese objeto se guardara;
+    # se revisan antes de escribir nada
+    por_modelo = {}
+    for obj in objs:
+        for f in type(obj)._meta.local_concrete_fields:
+            if f.is_relation and not f.primary_key and getattr(obj, f.attname) is None:
+                relacionado = getattr(obj, f.name)
+                if relacionado is not None:
+                    if relacionado.pk is None:
+                        raise ValueError(f"{type(obj).__name__}.{f.name} apunta a un objeto sin guardar.")
+                    setattr(obj, f.attname, relacionado.pk)
+        por_modelo.setdefault(type(obj), []).append(obj)
+
+    padres = [
+        ActividadBase(**{f.attname: getattr(obj, f.attname) for f in campos_padre})
+        for obj in objs
+    ]
+    ActividadBase.objects.using(using).bulk_create(padres)
+
+    for obj, padre in zip(objs, padres):
+        for f in campos_padre:
+            setattr(obj, f.attname, getattr(padre, f.attname))
+        obj.id = padre.id
+
+    for modelo, hijos in por_modelo.items():
+        ptr = modelo._meta.parents[ActividadBase]
+        campos = modelo._meta.local_concrete_fields
+        for hijo in hijos:
+            setattr(hijo, ptr.attname, hijo.id)
+
+        # Filas hijas con un INSERT preparado para todo el lote (API pública del cursor)
+        tabla = conexion.ops.quote_name(modelo._meta.db_table)
+        columnas = ', '.join(conexion.ops.quote_name(f.column) for f in campos)
+        marcadores = ', '.join(['%s'] * len(campos))
+        filas = [
+            [f.get_db_prep_save(f.pre_save(hijo, True), conexion) for f in campos]
+            for hijo in hijos
+        ]
+        with conexion.cursor() as cursor:
+            cursor.executemany(f"INSERT INTO {tabla} ({columnas}) VALUES ({marcadores})", filas)
+
+        for hijo in hijos:
+            hijo._state.adding = False
+            hijo._state.db = using
+
+    return objs
+
+
+# =========================
+# Índice de encargados
+# =========================
+class IndiceEncargados:
+    """
+    Índice en memoria de los encargados existentes, por correo y por nombre
+    normalizados con normalize_str. Se carga con una sola consulta.
+    """
+
+    def __init__(self):
+        # Import local: import_gantt importa este módulo
+        from .import_gantt import normalize_str
+        self.normalizar = normalize_str
+
+        self.por_correo = {}
+        self.por_nombre = {}
+        for encargado_obj in Encargado.objects.order_by('id'):
+            self.agregar(encargado_obj)
+
+    def agregar(self, encargado_obj):
+        """Registra un encargado; ante claves repetidas se conserva el primero."""
+        correo = self.normalizar(encargado_obj.correo_electronico)
+        if correo:
+            self.por_correo.setdefault(correo, encargado_obj)
+        self.por_nombre.setdefault(self.normalizar(encargado_obj.nombre), encargado_obj)
+
+    def buscar(self, nombre, correo):
+        """Devuelve el encargado con ese correo o, si no hay, con ese nombre."""
+        encargado_obj = None
+        if correo:
+            encargado_obj = self.por_correo.get(self.normalizar(correo))
+        if not encargado_obj:
+            encargado_obj = self.por_nombre.get(self.normalizar(nombre))
+        return encargado_obj
+
+
+# =========================
+# Lote de importación
+# =========================
+class LoteImportacion:
+    """
+    Acumula en memoria todo lo que genera una importación de Gantt
+    (líneas, productos, actividades, fechas, alertas y encargados)
+    y lo escribe con un número fijo de bulk_create por tabla.
+    """
+
+    def __init__(self, proyecto):
+        self.proyecto = proyecto
+
+        # Objetos ya existentes del proyecto (una consulta por tabla).
+        # Un proyecto aún sin guardar no tiene nada que precargar.
+        self.lineas = {}
+        self.productos = {}
+        if proyecto.pk is not None:
+            self.lineas = {l.nombre: l for l in proyecto.lineas_trabajo.all()}
+            for p in proyecto.productos_asociados.order_by('id'):
+                self.productos.setdefault(p.nombre.lower(), p)
+
+        # Regla con la que se generan las alertas (una consulta; la por defecto si no tiene)
+        self.regla_alerta = regla_del_proyecto(proyecto.pk)
+
+        # Índice de encargados, se carga con el primer responsable
+        self.indice_encargados = None
+
+        self.nuevas_lineas = []
+        self.nuevos_productos = []
+        self.nuevos_encargados = []
+        self.actividades = []
+        self.fechas = []
+        self.alertas = []
+        self.asignaciones = []
+        self.difusion_productos = []
+        self.difusion_lineas = []
+
+        self._asignaciones_vistas = set()
+        self._difusion_productos_vistos = set()
+        self._difusion_lineas_vistas = set()
+
+    # -------------------------
+    # Resolución en memoria
+    # -------------------------
+    def linea(self, nombre):
+        """Equivalente en memoria de LineaTrabajo.objects.get_or_create(proyecto, nombre)."""
+        linea_obj = self.lineas.get(nombre)
+        if linea_obj is None:
+            linea_obj = LineaTrabajo(proyecto=self.proyecto, nombre=nombre)
+            self.lineas[nombre] = linea_obj
+            self.nuevas_lineas.append(linea_obj)
+        return linea_obj
+
+    def producto(self, nombre):
+        """Busca un producto del proyecto por nombre (sin distinguir mayúsculas) o lo crea."""
+        clave = str(nombre).lower()
+        producto_obj = self.productos.get(clave)
+        if producto_obj is None:
+            producto_obj = ProductoAsociado(nombre=nombre, extension='', proyecto=self.proyecto)
+            self.productos[clave] = producto_obj
+            self.nuevos_productos.append(producto_obj)
+        return producto_obj
+
+    def encargado(self, nombre, correo):
+        """
+        Busca un encargado por correo y luego por nombre (sin distinguir mayúsculas
+        ni acentos) en el índice precargado; si no existe, lo crea en el lote.
+        """
+        if self.indice_encargados is None:
+            self.indice_encargados = IndiceEncargados()
+
+        encargado_obj = self.indice_encargados.buscar(nombre, correo)
+        if not encargado_obj:
+            encargado_obj = Encargado(nombre=nombre, correo_electronico=correo)
+            self.nuevos_encargados.append(encargado_obj)
+            self.indice_encargados.agregar(encargado_obj)
+        return encargado_obj
+
+    # -------------------------
+    # Registro de filas
+    # -------------------------
+    def agregar_actividad(self, actividad_obj):
+        self.actividades.append(actividad_obj)
+        return actividad_obj
+
+    def agregar_fecha(self, actividad_obj, fecha_inicio, fecha_fin):
+        self.fechas.append(Fecha(actividad=actividad_obj, fecha_inicio=fecha_inicio, fecha_fin=fecha_fin))
+
+    def agregar_alerta(self, actividad_obj, fecha_envio, enviado):
+        self.alertas.append(Alerta(actividad=actividad_obj, fecha_envio=fecha_envio, enviado=enviado))
+
+    def asignar_encargado(self, actividad_obj, encargado_obj):
+        """Equivalente en memoria de Actividad_Encargado.objects.get_or_create."""
+        clave = (id(actividad_obj), id(encargado_obj))
+        if clave in self._asignaciones_vistas:
+            return
+        self._asignaciones_vistas.add(clave)
+        self.asignaciones.append(Actividad_Encargado(actividad=actividad_obj, encargado=encargado_obj))
+
+    def asociar_producto_difusion(self, actividad_obj, producto_obj):
+        clave = (id(actividad_obj), id(producto_obj))
+        if clave in self._difusion_productos_vistos:
+            return
+        self._difusion_productos_vistos.add(clave)
+        self.difusion_productos.append(
+            ActividadDifusion_Producto(actividad=actividad_obj, producto_asociado=producto_obj)
+        )
+
+    def asociar_linea_difusion(self, actividad_obj, linea_obj):
+        clave = (id(actividad_obj), id(linea_obj))
+        if clave in self._difusion_lineas_vistas:
+            return
+        self._difusion_lineas_vistas.add(clave)
+        self.difusion_lineas.append(
+            ActividadDifusion_Linea(actividad=actividad_obj, linea_trabajo=linea_obj)
+        )
+
+    # -------------------------
+    # Escritura
+    # -------------------------
+    def guardar(self):
+        """
+        Escribe el lote completo. El número de consultas depende del número
+        de tablas, no del número de filas del Excel.
+        Debe llamarse dentro de transaction.atomic().
+        """
+        LineaTrabajo.objects.bulk_create(self.nuevas_lineas)
+        ProductoAsociado.objects.bulk_create(self.nuevos_productos)
+        self._guardar_encargados()
+
+        bulk_create_herencia(self.actividades)
+
+        Fecha.objects.bulk_create(self.fechas)
+        Alerta.objects.bulk_create(self.alertas)
+        Actividad_Encargado.objects.bulk_create(self.asignaciones)
+        ActividadDifusion_Producto.objects.bulk_create(self.difusion_productos)
+        ActividadDifusion_Linea.objects.bulk_create(self.difusion_lineas)
+
+    def _guardar_encargados(self):
+        """
+        Inserta los encargados nuevos. Los que otra importación creó mientras tanto
+        chocan con las restricciones únicas de Encargado y se ignoran; luego se releen
+        los ids (una consulta), así las asignaciones apuntan al encargado que quedó.
+        """
+        if not self.nuevos_encargados:
+            return
+        Encargado.objects.bulk_create(self.nuevos_encargados, ignore_conflicts=True)
+
+        # Lower del lado de la base de datos, igual que en las restricciones
+        correos = [Lower(Value(e.correo_electronico)) for e in self.nuevos_encargados if e.correo_electronico]
+        nombres = [Lower(Value(e.nombre)) for e in self.nuevos_encargados if not e.correo_electronico]
+        guardados = Encargado.objects.annotate(
+            correo_lower=Lower('correo_electronico'), nombre_lower=Lower('nombre'),
+        ).filter(
+            Q(correo_lower__in=correos) | Q(correo_electronico='', nombre_lower__in=nombres)
+        ).order_by('id')
+
+        por_clave = {}
+        for guardado in guardados:
+            clave = self._clave_encargado(guardado)
+            # Ante variantes de la misma clave se prefiere la escrita igual
+            por_clave.setdefault(clave, {}).setdefault(
+                (guardado.nombre, guardado.correo_electronico), guardado.pk
+            )
+        for encargado_obj in self.nuevos_encargados:
+            variantes = por_clave[self._clave_encargado(encargado_obj)]
+            encargado_obj.pk = variantes.get(
+                (encargado_obj.nombre, encargado_obj.correo_electronico), next(iter(variantes.values()))
+            )
+            encargado_obj._state.adding = False
+
+    def _clave_encargado(self, encargado_obj):
+        normalizar = self.indice_encargados.normalizar
+        if encargado_obj.correo_electronico:
+            return ('correo', normalizar(encargado_obj.correo_electronico))
+        return ('nombre', normalizar(encargado_obj.nombre))
@@ -0,0 +1,68 @@
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from excel.benchmark import (
+    ESCENARIOS, FASES, cargar_linea_base, comparar_resultados, ejecutar_escenarios, guardar_linea_base,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera Gantt sintéticos y mide cada fase de la importación (tiempo, memoria pico "
+        "y consultas SQL). Corre sobre una base de datos de prueba temporal."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--escenario', action='append', choices=sorted(ESCENARIOS),
+            help="Escenario a medir; se puede repetir (por defecto, pequeno y mediano).",
+        )
+        parser.add_argument('--repeticiones', type=int, default=3, help="Ejecuciones por fase; se usa la mejor.")
+        parser.add_argument('--semilla', type=int, default=0)
+        parser.add_argument('--guardar', metavar='ARCHIVO', help="Guarda los resultados como línea base (JSON).")
+        parser.add_argument('--comparar', metavar='ARCHIVO', help="Compara contra una línea base guardada.")
+        parser.add_argument(
+            '--tolerancia', type=float, default=0.2,
+            help="Aumento relativo de tiempo o memoria que se considera regresión (por defecto 0.2).",
+        )
+
+    def handle(self, *args, **options):
+        escenarios = options['escenario'] or ['pequeno', 'mediano']
+
+        # importar_gantt escribe: nunca sobre la base de datos real
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with tempfile.TemporaryDirectory() as directorio:
+                resultados = ejecutar_escenarios(
+                    escenarios, directorio, options['repeticiones'], options['semilla']
+                )
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+
+        for escenario, fases in resultados.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{escenario} {ESCENARIOS[escenario]}"))
+            self.stdout.write(f"  {'fase':<22}{'segundos':>10}{'memoria (KB)':>15}{'consultas':>11}")
+            for fase in FASES:
+                m = fases[fase]
+                self.stdout.write(
+                    f"  {fase:<22}{m['segundos']:>10.4f}{m['memoria_pico_kb']:>15.1f}{m['consultas']:>11}"
+                )
+
+        if options['guardar']:
+            guardar_linea_base(resultados, options['guardar'])
+            self.stdout.write(self.style.SUCCESS(f"Línea base guardada en {options['guardar']}"))
+
+        if options['comparar']:
+            try:
+                linea_base = cargar_linea_base(options['comparar'])
+            except (OSError, ValueError) as e:
+                raise CommandError(f"No se pudo leer la línea base: {e}")
+            regresiones = comparar_resultados(resultados, linea_base, options['tolerancia'])
+            if regresiones:
+                for regresion in regresiones:
+                    self.stdout.write(self.style.ERROR(f"  Regresión: {regresion}"))
+                raise CommandError(f"{len(regresiones)} regresión(es) respecto a la línea base.")
+            self.stdout.write(self.style.SUCCESS("Sin regresiones respecto a la línea base."))
@@ -0,0 +1,121 @@
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from excel.import_gantt import importar_filas, leer_gantt
+
+
+EXTENSIONES = ('.xlsx', '.xls')
+
+
+def buscar_archivos(rutas):
+    """Expande directorios y patrones glob en la lista ordenada de archivos Excel."""
+    archivos = []
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            candidatos = [os.path.join(ruta, nombre) for nombre in os.listdir(ruta)]
+        else:
+            candidatos = glob.glob(ruta)
+        archivos.extend(
+            c for c in candidatos
+            if os.path.isfile(c) and c.lower().endswith(EXTENSIONES) and not os.path.basename(c).startswith('~$')
+        )
+    return sorted(set(archivos))
+
+
+def parsear_archivo(ruta):
+    """
+    Trabajo de cada proceso: lee el Gantt y devuelve (ruta, filas, segundos, error).
+    No toca la base de datos; las filas tipadas vuelven al proceso principal.
+    """
+    inicio = time.perf_counter()
+    try:
+        filas = list(leer_gantt(ruta))
+    except Exception as e:
+        return ruta, None, time.perf_counter() - inicio, str(e)
+    return ruta, filas, time.perf_counter() - inicio, None
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa en lote los Gantt de uno o más directorios o patrones glob. "
+        "La lectura se reparte en procesos y la escritura la hace un solo proceso "
+        "(SQLite admite un único escritor). El nombre del proyecto es el nombre del archivo."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('rutas', nargs='+', help="Directorios o patrones glob (ej. 'gantts/*.xlsx').")
+        parser.add_argument(
+            '--procesos', type=int, default=os.cpu_count(),
+            help="Procesos de lectura (por defecto, todos los núcleos).",
+        )
+        parser.add_argument(
+            '--simular', action='store_true',
+            help="Solo lee los archivos y muestra los tiempos, sin guardar proyectos.",
+        )
+
+    def handle(self, *args, **options):
+        archivos = buscar_archivos(options['rutas'])
+        if not archivos:
+            raise CommandError("No se encontraron archivos Excel en las rutas indicadas.")
+
+        procesos = max(1, min(options['procesos'] or 1, len(archivos)))
+        self.stdout.write(f"Importando {len(archivos)} archivo(s) con {procesos} proceso(s) de lectura")
+
+        # Los procesos hijos no deben heredar conexiones abiertas a la base de datos
+        connections.close_all()
+
+        inicio_total = time.perf_counter()
+        importados = 0
+        errores = 0
+        total_filas = 0
+        tiempo_lectura = 0.0
+        tiempo_escritura = 0.0
+
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            pendientes = [pool.submit(parsear_archivo, ruta) for ruta in archivos]
+
+            # Escritor único: guarda cada archivo a medida que termina su lectura
+            for futuro in as_completed(pendientes):
+                ruta, filas, segundos_lectura, error = futuro.result()
+                nombre_archivo = os.path.basename(ruta)
+                tiempo_lectura += segundos_lectura
+
+                if error:
+                    errores += 1
+                    self.stdout.write(self.style.ERROR(
+                        f"  {nombre_archivo}: error de lectura ({segundos_lectura:.2f}s): {error}"
+                    ))
+                    continue
+
+                inicio = time.perf_counter()
+                if not options['simular']:
+                    try:
+                        nombre_proyecto = os.path.splitext(nombre_archivo)[0][:100]
+                        importar_filas(nombre_proyecto, filas)
+                    except Exception as e:
+                        errores += 1
+                        self.stdout.write(self.style.ERROR(f"  {nombre_archivo}: error al guardar: {e}"))
+                        continue
+                segundos_escritura = time.perf_counter() - inicio
+                tiempo_escritura += segundos_escritura
+
+                importados += 1
+                total_filas += len(filas)
+                self.stdout.write(
+                    f"  {nombre_archivo}: {len(filas)} filas, "
+                    f"lectura {segundos_lectura:.2f}s, escritura {segundos_escritura:.2f}s"
+                )
+
+        total = time.perf_counter() - inicio_total
+        # Al simular no se guarda nada: los archivos solo se validaron
+        resultado = 'validado(s)' if options['simular'] else 'importado(s)'
+        resumen = (
+            f"{importados} {resultado}, {errores} con error, {total_filas} filas en {total:.2f}s "
+            f"(lectura acumulada {tiempo_lectura:.2f}s, escritura {tiempo_escritura:.2f}s)"
+        )
+        self.stdout.write(self.style.SUCCESS(resumen) if not errores else self.style.WARNING(resumen))
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:45
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('proyectos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportacionGantt',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('nombre_proyecto', models.CharField(max_length=100)),
+                ('clave_archivo', models.CharField(max_length=64)),
+                ('estado', models.CharField(choices=[('PEN', 'Pendiente'), ('PRO', 'Procesando'), ('COM', 'Completada'), ('ERR', 'Error')], default='PEN', max_length=3)),
+                ('fase', models.CharField(blank=True, max_length=50)),
+                ('filas_procesadas', models.IntegerField(default=0)),
+                ('filas_totales', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('ultima_modificacion', models.DateTimeField(auto_now=True)),
+                ('proyecto', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='importaciones', to='proyectos.proyecto')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('excel', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importaciongantt',
+            name='reimportacion',
+            field=models.BooleanField(default=False),
+        ),
+    ]
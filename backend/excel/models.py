@@ -0,0 +1,47 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+from proyectos.models import Proyecto
+
+# Create your models here.
+class EstadoImportacion(models.TextChoices):
+    PENDIENTE = 'PEN', 'Pendiente'
+    PROCESANDO = 'PRO', 'Procesando'
+    COMPLETADA = 'COM', 'Completada'
+    ERROR = 'ERR', 'Error'
+
+
+def limite_interrupcion():
+    """Las importaciones en proceso sin avances desde antes de este momento se dan por interrumpidas."""
+    return timezone.now() - timedelta(seconds=settings.EXCEL_IMPORT_TIMEOUT)
+
+
+# Importación de un Gantt ejecutada en segundo plano por django-q
+class ImportacionGantt(models.Model):
+    id = models.AutoField(primary_key=True)
+    nombre_proyecto = models.CharField(max_length=100)
+    clave_archivo = models.CharField(max_length=64)
+    estado = models.CharField(
+        max_length=3,
+        choices=EstadoImportacion.choices,
+        default=EstadoImportacion.PENDIENTE
+    )
+    fase = models.CharField(max_length=50, blank=True)
+    filas_procesadas = models.IntegerField(default=0)
+    filas_totales = models.IntegerField(default=0)
+    error = models.TextField(blank=True)
+    proyecto = models.ForeignKey(Proyecto, related_name='importaciones', on_delete=models.SET_NULL, null=True, blank=True)
+    # Si es True, el Gantt se aplica como diferencia sobre 'proyecto' en vez de crear uno nuevo
+    reimportacion = models.BooleanField(default=False)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    ultima_modificacion = models.DateTimeField(auto_now=True)
+
+    @property
+    def interrumpida(self):
+        """En proceso sin avances por más de EXCEL_IMPORT_TIMEOUT: el worker murió sin terminarla."""
+        return self.estado == EstadoImportacion.PROCESANDO and self.ultima_modificacion < limite_interrupcion()
+
+    def __str__(self):
+        return f"Importación de {self.nombre_proyecto} ({self.get_estado_display()})"
@@ -0,0 +1,301 @@
+from django.db import transaction
+
+from proyectos.models import *
+from .import_gantt import (
+    FilaDifusion, FASE_LECTURA, FASE_ESCRITURA, PROGRESO_CADA,
+    crear_actividad_difusion, crear_actividad_normal, leer_gantt,
+)
+from .lote_importacion import LoteImportacion
+from vistas.snapshot import invalidar_proyectos
+from alertas.reglas import ESTADOS_SIN_ALERTAS
+
+
+# =========================
+# Funciones auxiliares
+# =========================
+def clave_actividad(actividad):
+    """Clave con la que se emparejan actividades entre importaciones: (tipo, línea, n_act, nombre)."""
+    nombre = str(actividad.nombre).strip()
+    if isinstance(actividad, ActividadDifusion):
+        return ('difusion', '', actividad.n_act, nombre)
+    return ('normal', str(actividad.linea_trabajo.nombre), actividad.n_act, nombre)
+
+
+def _agrupar(objs, atributo='actividad'):
+    """Agrupa objetos del lote por la actividad (en memoria) a la que apuntan."""
+    grupos = {}
+    for obj in objs:
+        grupos.setdefault(id(getattr(obj, atributo)), []).append(obj)
+    return grupos
+
+
+class CambiosReimportacion:
+    """Resumen de lo que cambió en una reimportación."""
+
+    def __init__(self):
+        self.actividades_nuevas = 0
+        self.actividades_eliminadas = 0
+        self.actividades_modificadas = 0
+        self.fechas_nuevas = 0
+        self.fechas_eliminadas = 0
+        self.alertas_nuevas = 0
+        self.alertas_eliminadas = 0
+        self.asignaciones_nuevas = 0
+        self.asignaciones_eliminadas = 0
+
+    def hay_cambios(self):
+        return any(vars(self).values())
+
+    def __str__(self):
+        return ', '.join(f"{k}: {v}" for k, v in vars(self).items())
+
+
+# =========================
+# Reimportación incremental
+# =========================
+def reimportar_filas(proyecto, filas, progreso=None):
+    """
+    Actualiza un Proyecto existente con un Gantt nuevo escribiendo solo la diferencia.
+
+    Las actividades se emparejan por (línea, n_act, nombre). De las emparejadas se
+    conservan el estado y el historial de alertas enviadas; solo se agregan o
+    desactivan los rangos de Fecha, alertas pendientes, encargados y vínculos de
+    difusión que cambiaron. Un rango desactivado que vuelve se reactiva, no se duplica. Las actividades que ya no aparecen se eliminan.
+    Las filas sin cambios no generan escrituras.
+    """
+    cambios = CambiosReimportacion()
+
+    # Estado deseado: el mismo lote que usaría una importación nueva, sobre el proyecto existente
+    lote = LoteImportacion(proyecto)
+    procesadas = 0
+    for fila in filas:
+        if isinstance(fila, FilaDifusion):
+            crear_actividad_difusion(lote, fila)
+        else:
+            crear_actividad_normal(lote, fila)
+        procesadas += 1
+        if progreso and procesadas % PROGRESO_CADA == 0:
+            progreso(FASE_LECTURA, procesadas)
+
+    # Estado actual del proyecto (una consulta por tabla)
+    existentes = {}
+    actuales = list(
+        Actividad.objects.filter(linea_trabajo__proyecto=proyecto).select_related('linea_trabajo').order_by('id')
+    ) + list(
+        ActividadDifusion.objects.filter(proyecto=proyecto).order_by('id')
+    )
+    for actividad in actuales:
+        existentes.setdefault(clave_actividad(actividad), actividad)
+    ids_actuales = [a.id for a in actuales]
+
+    # Rangos activos y desactivados (de reimportaciones anteriores), por actividad
+    fechas_actuales = {}
+    fechas_inactivas = {}
+    for fecha in Fecha.objects.filter(actividad_id__in=ids_actuales).order_by('id'):
+        destino = fechas_actuales if fecha.estado else fechas_inactivas
+        destino.setdefault(fecha.actividad_id, {})[(fecha.fecha_inicio, fecha.fecha_fin)] = fecha.id
+
+    alertas_actuales = {}
+    for alerta in Alerta.objects.filter(actividad_id__in=ids_actuales):
+        alertas_actuales.setdefault(alerta.actividad_id, []).append(alerta)
+
+    asignaciones_actuales = {}
+    for rel in Actividad_Encargado.objects.filter(actividad_id__in=ids_actuales):
+        asignaciones_actuales.setdefault(rel.actividad_id, {})[rel.encargado_id] = rel
+
+    lineas_difusion_actuales = {}
+    for rel in ActividadDifusion_Linea.objects.filter(actividad_id__in=ids_actuales):
+        lineas_difusion_actuales.setdefault(rel.actividad_id, {})[rel.linea_trabajo_id] = rel
+
+    productos_difusion_actuales = {}
+    for rel in ActividadDifusion_Producto.objects.filter(actividad_id__in=ids_actuales):
+        productos_difusion_actuales.setdefault(rel.actividad_id, {})[rel.producto_asociado_id] = rel
+
+    # Diferencia entre el lote deseado y lo existente
+    fechas_por_actividad = _agrupar(lote.fechas)
+    alertas_por_actividad = _agrupar(lote.alertas)
+    asignaciones_por_actividad = _agrupar(lote.asignaciones)
+    lineas_por_actividad = _agrupar(lote.difusion_lineas)
+    productos_por_actividad = _agrupar(lote.difusion_productos)
+
+    nuevas = []
+    emparejadas = set()
+    fechas = []
+    alertas = []
+    asignaciones = []
+    difusion_lineas = []
+    difusion_productos = []
+    fechas_desactivar = []
+    fechas_activar = []
+    alertas_eliminar = []
+    rels_desactivar = {Actividad_Encargado: [], ActividadDifusion_Linea: [], ActividadDifusion_Producto: []}
+    rels_activar = {Actividad_Encargado: [], ActividadDifusion_Linea: [], ActividadDifusion_Producto: []}
+    actividades_producto = []
+
+    def diferencia_relaciones(modelo, actual, deseadas, actuales, campo, destino):
+        """
+        Agrega a destino las relaciones que faltan, y desactiva las que sobran o
+        reactiva las que vuelven. Devuelve (agregadas, desactivadas + reactivadas).
+        """
+        agregadas = 0
+        cambiadas = 0
+        deseados_ids = set()
+        for rel in deseadas:
+            rel.actividad = actual
+            objetivo = getattr(rel, campo)
+            if objetivo.pk is not None and objetivo.pk in actuales:
+                deseados_ids.add(objetivo.pk)
+                if not actuales[objetivo.pk].estado:
+                    rels_activar[modelo].append(actuales[objetivo.pk].pk)
+                    cambiadas += 1
+            else:
+                destino.append(rel)
+                agregadas += 1
+        for objetivo_id, rel in actuales.items():
+            if objetivo_id not in deseados_ids and rel.estado:
+                rels_desactivar[modelo].append(rel.pk)
+                cambiadas += 1
+        return agregadas, cambiadas
+
+    for deseada in lote.actividades:
+        clave = clave_actividad(deseada)
+        actual = existentes.get(clave)
+        if actual is None or actual.id in emparejadas:
+            # Actividad nueva: entra completa
+            nuevas.append(deseada)
+            fechas.extend(fechas_por_actividad.get(id(deseada), []))
+            alertas.extend(alertas_por_actividad.get(id(deseada), []))
+            asignaciones.extend(asignaciones_por_actividad.get(id(deseada), []))
+            difusion_lineas.extend(lineas_por_actividad.get(id(deseada), []))
+            difusion_productos.extend(productos_por_actividad.get(id(deseada), []))
+            cambios.actividades_nuevas += 1
+            continue
+
+        emparejadas.add(actual.id)
+        modificada = False
+
+        # Producto asociado (solo actividades normales)
+        if isinstance(actual, Actividad):
+            producto = deseada.producto_asociado
+            producto_nuevo = producto is not None and producto.pk is None
+            producto_id = producto.pk if producto is not None else None
+            if producto_nuevo or producto_id != actual.producto_asociado_id:
+                actual.producto_asociado = producto
+                actividades_producto.append(actual)
+                modificada = True
+
+        # Rangos de fechas
+        rangos_actuales = fechas_actuales.get(actual.id, {})
+        rangos_inactivos = fechas_inactivas.get(actual.id, {})
+        rangos_deseados = set()
+        for fecha in fechas_por_actividad.get(id(deseada), []):
+            rango = (fecha.fecha_inicio, fecha.fecha_fin)
+            rangos_deseados.add(rango)
+            if rango in rangos_actuales:
+                continue
+            if rango in rangos_inactivos:
+                fechas_activar.append(rangos_inactivos[rango])
+            else:
+                fecha.actividad = actual
+                fechas.append(fecha)
+            cambios.fechas_nuevas += 1
+            modificada = True
+        for rango, fecha_id in rangos_actuales.items():
+            if rango not in rangos_deseados:
+                fechas_desactivar.append(fecha_id)
+                cambios.fechas_eliminadas += 1
+                modificada = True
+
+        # Alertas: se agregan las que faltan y se eliminan las pendientes que sobran;
+        # las ya enviadas se conservan como historial. Las completadas o terminadas no tienen pendientes
+        envios_actuales = {}
+        for alerta in alertas_actuales.get(actual.id, []):
+            envios_actuales.setdefault(alerta.fecha_envio, []).append(alerta)
+        envios_deseados = set()
+        alertas_deseadas = alertas_por_actividad.get(id(deseada), [])
+        if actual.estado in ESTADOS_SIN_ALERTAS:
+            alertas_deseadas = []
+        for alerta in alertas_deseadas:
+            envios_deseados.add(alerta.fecha_envio)
+            if alerta.fecha_envio not in envios_actuales:
+                alerta.actividad = actual
+                alertas.append(alerta)
+                cambios.alertas_nuevas += 1
+        for envio, alertas_envio in envios_actuales.items():
+            if envio not in envios_deseados:
+                pendientes = [a.id for a in alertas_envio if not a.enviado]
+                alertas_eliminar.extend(pendientes)
+                cambios.alertas_eliminadas += len(pendientes)
+
+        # Encargados y vínculos de difusión
+        for deseadas, actuales_rel, campo, destino, modelo in (
+            (asignaciones_por_actividad.get(id(deseada), []), asignaciones_actuales.get(actual.id, {}),
+             'encargado', asignaciones, Actividad_Encargado),
+            (lineas_por_actividad.get(id(deseada), []), lineas_difusion_actuales.get(actual.id, {}),
+             'linea_trabajo', difusion_lineas, ActividadDifusion_Linea),
+            (productos_por_actividad.get(id(deseada), []), productos_difusion_actuales.get(actual.id, {}),
+             'producto_asociado', difusion_productos, ActividadDifusion_Producto),
+        ):
+            agregadas, cambiadas = diferencia_relaciones(modelo, actual, deseadas, actuales_rel, campo, destino)
+            if modelo is Actividad_Encargado:
+                cambios.asignaciones_nuevas += agregadas
+            if agregadas or cambiadas:
+                modificada = True
+        if modificada:
+            cambios.actividades_modificadas += 1
+
+    cambios.asignaciones_eliminadas = len(rels_desactivar[Actividad_Encargado])
+
+    eliminadas = [a.id for a in actuales if a.id not in emparejadas]
+    cambios.actividades_eliminadas = len(eliminadas)
+
+    # Fechas del proyecto según el Gantt nuevo
+    fecha_inicio = min((f.fecha_inicio for f in lote.fechas), default=proyecto.fecha_inicio)
+    fecha_fin = max((f.fecha_fin for f in lote.fechas), default=fecha_inicio)
+
+    if progreso:
+        progreso(FASE_ESCRITURA, procesadas)
+
+    # Escritura de la diferencia: un bulk por tabla y solo si hay algo que escribir
+    lote.actividades = nuevas
+    lote.fechas = fechas
+    lote.alertas = alertas
+    lote.asignaciones = asignaciones
+    lote.difusion_lineas = difusion_lineas
+    lote.difusion_productos = difusion_productos
+
+    with transaction.atomic():
+        lote.guardar()
+
+        if actividades_producto:
+            Actividad.objects.bulk_update(actividades_producto, ['producto_asociado'])
+        if fechas_desactivar:
+            Fecha.objects.filter(id__in=fechas_desactivar).update(estado=False)
+        if fechas_activar:
+            Fecha.objects.filter(id__in=fechas_activar).update(estado=True)
+        if alertas_eliminar:
+            Alerta.objects.filter(id__in=alertas_eliminar).delete()
+        for modelo, ids in rels_desactivar.items():
+            if ids:
+                modelo.objects.filter(id__in=ids).update(estado=False)
+        for modelo, ids in rels_activar.items():
+            if ids:
+                modelo.objects.filter(id__in=ids).update(estado=True)
+        if eliminadas:
+            ActividadBase.objects.filter(id__in=eliminadas).delete()
+
+        if (fecha_inicio, fecha_fin) != (proyecto.fecha_inicio, proyecto.fecha_fin) or cambios.hay_cambios():
+            proyecto.fecha_inicio = fecha_inicio
+            proyecto.fecha_fin = fecha_fin
+            proyecto.save()
+
+        # Los bulk y update() no emiten señales: el snapshot de las vistas se invalida a mano
+        if cambios.hay_cambios():
+            invalidar_proyectos([proyecto.id])
+
+    return cambios
+
+
+def reimportar_gantt(proyecto, archivo_excel):
+    """Reimporta un Excel Gantt sobre un proyecto existente (ver reimportar_filas)."""
+    return reimportar_filas(proyecto, leer_gantt(archivo_excel))
@@ -0,0 +1,214 @@
+import hashlib
+import os
+import pickle
+import re
+import struct
+import tempfile
+import time
+
+from django.conf import settings
+
+from .import_gantt import leer_gantt
+
+# =========================
+# Configuración
+# =========================
+STAGING_DIR = getattr(settings, 'EXCEL_STAGING_DIR', os.path.join(settings.BASE_DIR, 'staging'))
+STAGING_TTL = getattr(settings, 'EXCEL_STAGING_TTL', 60 * 60)  # segundos
+STAGING_MAX_BYTES = getattr(settings, 'EXCEL_STAGING_MAX_BYTES', 200 * 1024 * 1024)
+
+_CLAVE_VALIDA = re.compile(r'^[0-9a-f]{64}$')
+
+# Cabecera del archivo de filas: cuántas filas tiene (se completa al terminar el parseo)
+_CABECERA = struct.Struct('<Q')
+
+
+# =========================
+# Funciones auxiliares
+# =========================
+def _ruta(clave, extension='.filas.pkl'):
+    if not clave or not _CLAVE_VALIDA.match(clave):
+        raise FileNotFoundError("Clave de archivo temporal inválida.")
+    return os.path.join(STAGING_DIR, f"{clave}{extension}")
+
+
+def _directorio_privado():
+    """
+    Crea el directorio de staging con permisos 0700 y verifica que sea solo de la
+    aplicación: los pickles que guarda se cargan sin más validación, así que nadie
+    más debe poder escribir en él. Lanza PermissionError si no lo es.
+    """
+    os.makedirs(STAGING_DIR, mode=0o700, exist_ok=True)
+    if os.name != 'posix':
+        return
+    info = os.stat(STAGING_DIR)
+    if info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(
+            f"El directorio de staging {STAGING_DIR} debe pertenecer a la aplicación y tener permisos 0700."
+        )
+
+
+def _escribir_atomico(ruta, escribir):
+    """Escribe con un archivo temporal + os.replace para que nunca se lea un archivo a medias."""
+    _directorio_privado()
+    fd, ruta_tmp = tempfile.mkstemp(dir=STAGING_DIR, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as destino:
+        escribir(destino)
+    os.replace(ruta_tmp, ruta)
+
+
+def _vigente(ruta):
+    """True si la entrada existe y no venció; las vencidas se eliminan."""
+    try:
+        if time.time() - os.path.getmtime(ruta) <= STAGING_TTL:
+            return True
+    except OSError:
+        return False
+    _eliminar(ruta)
+    return False
+
+
+def calcular_clave(archivo):
+    """Hash SHA-256 del contenido del archivo subido."""
+    h = hashlib.sha256()
+    for chunk in archivo.chunks():
+        h.update(chunk)
+    archivo.seek(0)
+    return h.hexdigest()
+
+
+def limpiar_staging():
+    """
+    Elimina las entradas vencidas (TTL) y, si el directorio supera el tamaño
+    máximo, las menos usadas recientemente hasta volver bajo el límite.
+    """
+    if not os.path.isdir(STAGING_DIR):
+        return
+
+    ahora = time.time()
+    entradas = []
+    for nombre in os.listdir(STAGING_DIR):
+        ruta = os.path.join(STAGING_DIR, nombre)
+        try:
+            info = os.stat(ruta)
+        except FileNotFoundError:
+            continue
+        if ahora - info.st_mtime > STAGING_TTL:
+            _eliminar(ruta)
+        else:
+            entradas.append((info.st_mtime, info.st_size, ruta))
+
+    total = sum(tamano for _, tamano, _ in entradas)
+    for _, tamano, ruta in sorted(entradas):
+        if total <= STAGING_MAX_BYTES:
+            break
+        _eliminar(ruta)
+        total -= tamano
+
+
+def _eliminar(ruta):
+    try:
+        os.remove(ruta)
+    except FileNotFoundError:
+        pass
+
+
+# =========================
+# API del staging
+# =========================
+def guardar_en_staging(archivo):
+    """
+    Guarda el Excel subido tal cual, direccionado por el hash del contenido, y
+    devuelve la clave. No lo parsea: eso ocurre en la importación (cargar_de_staging).
+    """
+    _directorio_privado()
+    clave = calcular_clave(archivo)
+    extension = '.xls' if archivo.name.lower().endswith('.xls') else '.xlsx'
+    ruta = _ruta(clave, extension)
+
+    if _vigente(ruta):
+        os.utime(ruta)
+    else:
+        def escribir(destino):
+            for chunk in archivo.chunks():
+                destino.write(chunk)
+        _escribir_atomico(ruta, escribir)
+        archivo.seek(0)
+
+    limpiar_staging()
+    return clave
+
+
+def ruta_en_staging(clave):
+    """
+    Ruta del Excel guardado bajo la clave.
+    Lanza FileNotFoundError si la entrada no existe o ya venció.
+    """
+    for extension in ('.xlsx', '.xls'):
+        ruta = _ruta(clave, extension)
+        if _vigente(ruta):
+            return ruta
+    raise FileNotFoundError(_ruta(clave, '.xlsx'))
+
+
+def cargar_de_staging(clave):
+    """
+    Devuelve (total, filas): un iterador de las filas tipadas del Excel guardado bajo
+    la clave y cuántas son, o None si aún no se sabe. Las filas se entregan de a una,
+    sin cargarlas todas en memoria. La primera vez se parsean en streaming (leer_gantt)
+    y se guardan junto al archivo a medida que se leen, así un mismo contenido se
+    parsea una sola vez. Lanza FileNotFoundError si la entrada no existe o ya venció.
+    """
+    ruta_filas = _ruta(clave)
+    _directorio_privado()
+    if _vigente(ruta_filas):
+        try:
+            origen = open(ruta_filas, 'rb')
+        except OSError:
+            pass
+        else:
+            try:
+                total, = _CABECERA.unpack(origen.read(_CABECERA.size))
+            except struct.error:
+                origen.close()
+                _eliminar(ruta_filas)
+            else:
+                # Marca la entrada como usada recientemente
+                os.utime(ruta_filas)
+                return total, _leer_filas(origen, total, ruta_filas)
+
+    ruta = ruta_en_staging(clave)
+    os.utime(ruta)
+    return None, _parsear_y_guardar(ruta, ruta_filas)
+
+
+def _leer_filas(origen, total, ruta_filas):
+    with origen:
+        try:
+            for _ in range(total):
+                yield pickle.load(origen)
+        except (EOFError, pickle.UnpicklingError):
+            # Archivo de filas dañado: la próxima vez se vuelve a parsear el Excel
+            _eliminar(ruta_filas)
+            raise
+
+
+def _parsear_y_guardar(ruta, ruta_filas):
+    """Entrega las filas de leer_gantt a medida que las escribe, una por una, en el archivo de filas."""
+    fd, ruta_tmp = tempfile.mkstemp(dir=STAGING_DIR, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as destino:
+            destino.write(_CABECERA.pack(0))
+            total = 0
+            for fila in leer_gantt(ruta):
+                pickle.dump(fila, destino, protocol=pickle.HIGHEST_PROTOCOL)
+                total += 1
+                yield fila
+            destino.seek(0)
+            destino.write(_CABECERA.pack(total))
+        # Solo un parseo completo queda guardado
+        os.replace(ruta_tmp, ruta_filas)
+    except BaseException:
+        _eliminar(ruta_tmp)
+        raise
+    limpiar_staging()
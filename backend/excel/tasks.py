@@ -0,0 +1,72 @@
+from django.db.models import Q
+from django.utils import timezone
+from .import_gantt import importar_filas, FormatoInvalidoError
+from .models import ImportacionGantt, EstadoImportacion, limite_interrupcion
+from .reimportacion import reimportar_filas
+from .staging import cargar_de_staging
+
+
+def _actualizar(importacion_id, **campos):
+    # update() no pasa por save(): ultima_modificacion se actualiza a mano
+    ImportacionGantt.objects.filter(id=importacion_id).update(ultima_modificacion=timezone.now(), **campos)
+
+
+def importar_proyecto_tarea(importacion_id):
+    """
+    Tarea django-q: importa el Gantt guardado en staging y registra el avance
+    en ImportacionGantt para que la página de importación lo consulte.
+    """
+    # Tomar la importación solo si sigue pendiente (un reintento del cluster no la repite)
+    # o si quedó interrumpida: la escritura es atómica, un worker muerto no dejó nada a medias
+    tomada = ImportacionGantt.objects.filter(
+        Q(estado=EstadoImportacion.PENDIENTE)
+        | Q(estado=EstadoImportacion.PROCESANDO, ultima_modificacion__lt=limite_interrupcion()),
+        id=importacion_id,
+    ).update(
+        estado=EstadoImportacion.PROCESANDO, fase='Cargando archivo', filas_procesadas=0,
+        ultima_modificacion=timezone.now(),
+    )
+    if not tomada:
+        return
+
+    importacion = ImportacionGantt.objects.get(id=importacion_id)
+
+    procesadas = 0
+
+    def progreso(fase, filas_procesadas):
+        nonlocal procesadas
+        procesadas = filas_procesadas
+        _actualizar(importacion_id, fase=fase, filas_procesadas=filas_procesadas)
+
+    try:
+        # Las filas llegan en streaming; el total solo se conoce si el archivo ya se había parseado
+        total, filas = cargar_de_staging(importacion.clave_archivo)
+        if total is not None:
+            _actualizar(importacion_id, filas_totales=total)
+        if importacion.reimportacion:
+            proyecto = importacion.proyecto
+            if proyecto is None:
+                raise ValueError("El proyecto a actualizar ya no existe.")
+            reimportar_filas(proyecto, filas, progreso=progreso)
+        else:
+            proyecto = importar_filas(importacion.nombre_proyecto, filas, progreso=progreso)
+    except FileNotFoundError:
+        error = "No se encontró el archivo temporal. Intenta subir el archivo nuevamente."
+    except FormatoInvalidoError as e:
+        error = f"Error de formato: {str(e)}"
+    except ValueError as e:
+        error = f"Error en los datos: {str(e)}"
+    except Exception as e:
+        error = f"Error al importar el proyecto: {str(e)}"
+    else:
+        _actualizar(
+            importacion_id,
+            estado=EstadoImportacion.COMPLETADA,
+            fase='Completada',
+            filas_procesadas=procesadas,
+            filas_totales=procesadas,
+            proyecto=proyecto,
+        )
+        return proyecto.id
+
+    _actualizar(importacion_id, estado=EstadoImportacion.ERROR, fase='Error', error=error)
@@ -1,3 +1,616 @@
+import io
+import os
+import pickle
+import tempfile
+import time
+from datetime import date, timedelta
+from unittest.mock import patch
+
+import openpyxl
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models.functions import Lower
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from alertas.reglas import regenerar_alertas_proyecto
+from proyectos.models import *
+from vistas.models import SnapshotProyecto
+from .benchmark import FASES, comparar_resultados, ejecutar_benchmark
+from .generador_gantt import ENCABEZADO_DIFUSION, ENCABEZADO_NORMALES, generar_gantt
+from .import_gantt import (
+    FilaDifusion, FilaNormal, filas_desde_tablas, importar_filas, importar_gantt, informacion_filas,
+    informacion_proyecto, leer_gantt, previsualizar_gantt, separar_tablas_excel,
+)
+from .lote_importacion import IndiceEncargados, LoteImportacion, bulk_create_herencia
+from .models import EstadoImportacion, ImportacionGantt
+from .reimportacion import reimportar_filas
+from .staging import cargar_de_staging, guardar_en_staging, ruta_en_staging
+from .tasks import importar_proyecto_tarea
+
+
+class GeneradorGanttTests(TestCase):
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.ruta = os.path.join(self.directorio.name, 'gantt.xlsx')
+        generar_gantt(
+            self.ruta, lineas=3, actividades_por_linea=4, filas_difusion=2,
+            semanas=60, responsables_por_fila=2,
+        )
+
+    def tearDown(self):
+        self.directorio.cleanup()
+
+    def test_layout_legible_por_ambos_lectores(self):
+        filas = list(leer_gantt(self.ruta))
+        normales = [f for f in filas if isinstance(f, FilaNormal) and f.actividad]
+        difusion = [f for f in filas if isinstance(f, FilaDifusion)]
+        self.assertEqual(len(normales), 12)
+        self.assertEqual(len(difusion), 2)
+        self.assertEqual({f.linea for f in normales}, {f"Linea de trabajo {i}" for i in (1, 2, 3)})
+        self.assertTrue(all(f.bloques for f in normales + difusion))
+
+        df_normales, df_difusion = separar_tablas_excel(self.ruta)
+        info = informacion_proyecto(df_normales, df_difusion)
+        self.assertEqual(info['Líneas de trabajo'], 3)
+        self.assertEqual(info['Actividades de difusión'], 2)
+
+    def test_vista_previa_igual_al_parseo_completo(self):
+        self.assertEqual(previsualizar_gantt(self.ruta), informacion_filas(leer_gantt(self.ruta)))
+
+    def test_misma_semilla_mismo_contenido(self):
+        otra = os.path.join(self.directorio.name, 'otra.xlsx')
+        generar_gantt(
+            otra, lineas=3, actividades_por_linea=4, filas_difusion=2,
+            semanas=60, responsables_por_fila=2,
+        )
+        self.assertEqual(list(leer_gantt(self.ruta)), list(leer_gantt(otra)))
+
+    def test_importacion(self):
+        with open(self.ruta, 'rb') as archivo:
+            proyecto = importar_gantt('Sintético', archivo)
+        self.assertEqual(Actividad.objects.filter(linea_trabajo__proyecto=proyecto).count(), 12)
+        self.assertEqual(ActividadDifusion.objects.filter(proyecto=proyecto).count(), 2)
+        self.assertEqual(Actividad_Encargado.objects.count(), 28)
+        # Las alertas importadas son las que genera la regla del proyecto
+        self.assertTrue(Alerta.objects.exists())
+        self.assertEqual(regenerar_alertas_proyecto(proyecto.id), (0, 0))
+
+
+class LeerGanttTests(TestCase):
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.anio = date.today().year
+
+    def tearDown(self):
+        self.directorio.cleanup()
+
+    def libro(self, normales, difusion, en_blanco=0):
+        """
+        Gantt de cuatro semanas (3, 10, 17 y 24 de marzo y 7 de abril) con los meses en
+        celdas combinadas. Las filas llevan una 'X' en las semanas indicadas.
+        """
+        libro = openpyxl.Workbook()
+        hoja = libro.active
+        primera = len(ENCABEZADO_NORMALES) + 1
+        hoja.cell(1, primera, 'Marzo')
+        hoja.merge_cells(start_row=1, start_column=primera, end_row=1, end_column=primera + 3)
+        hoja.cell(1, primera + 4, 'Abril')
+        for col, valor in enumerate(ENCABEZADO_NORMALES, start=1):
+            hoja.cell(2, col, valor)
+        for i, dia in enumerate((3, 10, 17, 24, 7)):
+            hoja.cell(2, primera + i, dia)
+
+        fila = 3
+
+        def escribir(valores, semanas):
+            nonlocal fila
+            for col, valor in enumerate(valores, start=1):
+                hoja.cell(fila, col, valor)
+            for semana in semanas:
+                hoja.cell(fila, primera + semana, 'X')
+            fila += 1 + en_blanco
+
+        for valores, semanas in normales:
+            escribir(valores, semanas)
+        hoja.cell(fila, 1, 'Difusión')
+        fila += 1 + en_blanco
+        escribir(ENCABEZADO_DIFUSION, ())
+        for valores, semanas in difusion:
+            escribir(valores, semanas)
+
+        ruta = os.path.join(self.directorio.name, 'gantt.xlsx')
+        libro.save(ruta)
+        return ruta
+
+    def test_meses_combinados(self):
+        ruta = self.libro([(['Línea 1', None, 1, 'Diseño', None, None], [2, 3, 4])], [])
+        fila, = leer_gantt(ruta)
+        # Las columnas del 10 al 24 están dentro de la celda combinada de marzo
+        self.assertEqual(fila.bloques, [(date(self.anio, 3, 17), date(self.anio, 4, 7))])
+
+    def test_filas_en_blanco_entre_secciones(self):
+        normales = [
+            (['Línea 1', None, 1, 'Diseño', None, None], [0]),
+            ([None, None, 2, 'Desarrollo', None, None], [1, 2]),
+        ]
+        difusion = [([1, 'Seminario', None, 'Ana : ana@example.cl', 'Informe', 'Línea 1'], [])]
+        filas = list(leer_gantt(self.libro(normales, difusion, en_blanco=2)))
+        self.assertEqual([type(f) for f in filas], [FilaNormal, FilaNormal, FilaDifusion])
+        self.assertEqual([f.linea for f in filas[:2]], ['Línea 1', 'Línea 1'])
+        self.assertEqual(filas[1].bloques, [(date(self.anio, 3, 10), date(self.anio, 3, 17))])
+        self.assertEqual(filas[2].actividad, 'Seminario')
+        self.assertEqual(previsualizar_gantt(self.libro(normales, difusion, en_blanco=2))['Actividades de difusión'], 1)
+
+    def test_orden_entre_trozos(self):
+        normales = [([f'Línea {n // 3}', None, n, f'Actividad {n}', None, None], [n % 5]) for n in range(11)]
+        difusion = [([n, f'Difusión {n}', None, None, None, None], [n % 5]) for n in range(7)]
+        ruta = self.libro(normales, difusion)
+
+        completo = list(leer_gantt(ruta))
+        with patch('excel.import_gantt.TAMANO_TROZO', 3):
+            self.assertEqual(list(leer_gantt(ruta)), completo)
+        self.assertEqual([f.n_act for f in completo], list(range(11)) + list(range(7)))
+
+    def test_xls_usa_pandas(self):
+        ruta = os.path.join(self.directorio.name, 'gantt.xlsx')
+        generar_gantt(ruta, lineas=2, actividades_por_linea=2, filas_difusion=1, semanas=8)
+        # openpyxl no lee .xls: se usa separar_tablas_excel (aquí, sobre el mismo libro)
+        with patch('excel.import_gantt.separar_tablas_excel', return_value=separar_tablas_excel(ruta)) as separar, \
+                patch('excel.import_gantt.openpyxl.load_workbook') as cargar:
+            filas = list(leer_gantt('gantt.xls'))
+        separar.assert_called_once_with('gantt.xls')
+        self.assertFalse(cargar.called)
+        self.assertEqual(filas, list(filas_desde_tablas(*separar_tablas_excel(ruta))))
+        self.assertEqual(len([f for f in filas if f.actividad is not None]), 5)
+
+
+class BenchmarkTests(TestCase):
+    def test_mide_todas_las_fases(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'gantt.xlsx')
+            generar_gantt(ruta, lineas=2, actividades_por_linea=3, filas_difusion=1, semanas=10)
+            resultados = ejecutar_benchmark(ruta)
+
+        self.assertEqual(list(resultados), FASES)
+        for medicion in resultados.values():
+            self.assertGreaterEqual(medicion['segundos'], 0)
+            self.assertGreater(medicion['memoria_pico_kb'], 0)
+        self.assertEqual(resultados['leer_gantt']['consultas'], 0)
+        self.assertGreater(resultados['importar_gantt']['consultas'], 0)
+
+    def test_comparar_resultados(self):
+        base = {'pequeno': {'leer_gantt': {'segundos': 1.0, 'memoria_pico_kb': 100.0, 'consultas': 10}}}
+        igual = {'pequeno': {'leer_gantt': {'segundos': 1.1, 'memoria_pico_kb': 100.0, 'consultas': 10}}}
+        peor = {'pequeno': {'leer_gantt': {'segundos': 2.0, 'memoria_pico_kb': 100.0, 'consultas': 11}}}
+        self.assertEqual(comparar_resultados(igual, base), [])
+        self.assertEqual(len(comparar_resultados(peor, base)), 2)
+
+
+class StagingTests(TestCase):
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.staging = os.path.join(self.directorio.name, 'staging')
+        staging = patch('excel.staging.STAGING_DIR', self.staging)
+        staging.start()
+        self.addCleanup(staging.stop)
+
+        self.ruta = os.path.join(self.directorio.name, 'gantt.xlsx')
+        generar_gantt(self.ruta, lineas=2, actividades_por_linea=2, filas_difusion=1, semanas=8)
+        with open(self.ruta, 'rb') as archivo:
+            self.contenido = archivo.read()
+
+    def tearDown(self):
+        self.directorio.cleanup()
+
+    def guardar(self, contenido=None):
+        return guardar_en_staging(SimpleUploadedFile('gantt.xlsx', contenido or self.contenido))
+
+    def envejecer(self, ruta, segundos):
+        antes = time.time() - segundos
+        os.utime(ruta, (antes, antes))
+
+    def test_misma_clave_para_el_mismo_contenido(self):
+        clave = self.guardar()
+        self.assertEqual(self.guardar(), clave)
+        self.assertNotEqual(self.guardar(self.contenido + b'\0'), clave)
+        self.assertEqual(len(os.listdir(self.staging)), 2)
+
+    def test_directorio_privado(self):
+        self.guardar()
+        self.assertEqual(os.stat(self.staging).st_mode & 0o777, 0o700)
+
+        # Un directorio que otros pueden escribir no se usa
+        os.chmod(self.staging, 0o777)
+        with self.assertRaises(PermissionError):
+            self.guardar()
+        with self.assertRaises(PermissionError):
+            cargar_de_staging('0' * 64)
+
+    def test_vencimiento(self):
+        clave = self.guardar()
+        ruta = ruta_en_staging(clave)
+        self.envejecer(ruta, 2 * 60 * 60)
+        with patch('excel.staging.STAGING_TTL', 60 * 60):
+            with self.assertRaises(FileNotFoundError):
+                ruta_en_staging(clave)
+        self.assertFalse(os.path.exists(ruta))
+
+        with self.assertRaises(FileNotFoundError):
+            cargar_de_staging('no-es-una-clave')
+
+    def test_tamano_maximo(self):
+        claves = [self.guardar(self.contenido + bytes([i])) for i in range(3)]
+        for i, clave in enumerate(claves):
+            self.envejecer(ruta_en_staging(clave), 30 - i)
+
+        # Cabe lo que ocupan dos: se elimina la menos usada recientemente
+        with patch('excel.staging.STAGING_MAX_BYTES', 2 * len(self.contenido) + 2):
+            cuarta = self.guardar(self.contenido + b'\3')
+        with self.assertRaises(FileNotFoundError):
+            ruta_en_staging(claves[0])
+        with self.assertRaises(FileNotFoundError):
+            ruta_en_staging(claves[1])
+        for clave in (claves[2], cuarta):
+            ruta_en_staging(clave)
+
+    def test_filas_dañadas_o_faltantes(self):
+        clave = self.guardar()
+        filas = list(cargar_de_staging(clave)[1])
+        ruta_filas = os.path.join(self.staging, f'{clave}.filas.pkl')
+
+        # Sin el archivo de filas se vuelve a parsear el Excel
+        os.remove(ruta_filas)
+        total, otra_vez = cargar_de_staging(clave)
+        self.assertIsNone(total)
+        self.assertEqual(list(otra_vez), filas)
+
+        # Cabecera incompleta: también se vuelve a parsear
+        with open(ruta_filas, 'wb') as archivo:
+            archivo.write(b'\1')
+        total, otra_vez = cargar_de_staging(clave)
+        self.assertIsNone(total)
+        self.assertEqual(list(otra_vez), filas)
+
+        # Filas dañadas: la lectura falla y se descartan, la siguiente parsea de nuevo
+        with open(ruta_filas, 'r+b') as archivo:
+            archivo.truncate(os.path.getsize(ruta_filas) // 2)
+        total, dañadas = cargar_de_staging(clave)
+        self.assertEqual(total, len(filas))
+        with self.assertRaises((EOFError, pickle.UnpicklingError)):
+            list(dañadas)
+        self.assertFalse(os.path.exists(ruta_filas))
+        self.assertEqual(list(cargar_de_staging(clave)[1]), filas)
+
+
+class ImportacionTareaTests(TestCase):
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        staging = patch('excel.staging.STAGING_DIR', os.path.join(self.directorio.name, 'staging'))
+        staging.start()
+        self.addCleanup(staging.stop)
+
+        ruta = os.path.join(self.directorio.name, 'gantt.xlsx')
+        generar_gantt(ruta, lineas=2, actividades_por_linea=3, filas_difusion=1, semanas=10)
+        with open(ruta, 'rb') as archivo:
+            self.clave = guardar_en_staging(SimpleUploadedFile('gantt.xlsx', archivo.read()))
+        self.importacion = ImportacionGantt.objects.create(nombre_proyecto='Sintético', clave_archivo=self.clave)
+
+    def tearDown(self):
+        self.directorio.cleanup()
+
+    def estado(self):
+        return self.client.get(reverse('estado_importacion', args=[self.importacion.id])).json()
+
+    def test_encola_con_timeout(self):
+        with patch('excel.views.async_task') as encolar:
+            respuesta = self.client.post(reverse('importar_proyecto'), {'nombre_proyecto': 'Otro', 'archivo': self.clave})
+        importacion = ImportacionGantt.objects.latest('id')
+        self.assertRedirects(respuesta, reverse('progreso_importacion', args=[importacion.id]))
+        encolar.assert_called_once_with(
+            'excel.tasks.importar_proyecto_tarea', importacion.id, timeout=settings.EXCEL_IMPORT_TIMEOUT,
+        )
+        self.assertEqual(self.client.get(reverse('estado_importacion', args=[importacion.id])).json()['estado'], 'PEN')
+
+    def test_importa_y_reporta_avance(self):
+        proyecto_id = importar_proyecto_tarea(self.importacion.id)
+        self.assertEqual(ActividadDifusion.objects.filter(proyecto_id=proyecto_id).count(), 1)
+
+        datos = self.estado()
+        self.assertEqual((datos['estado'], datos['fase'], datos['error']), ('COM', 'Completada', ''))
+        self.assertEqual(datos['filas_procesadas'], datos['filas_totales'])
+        self.assertEqual(datos['url_proyecto'], reverse('vista_gantt', args=[proyecto_id]))
+
+        # Un reintento del cluster no la repite
+        self.assertIsNone(importar_proyecto_tarea(self.importacion.id))
+        self.assertEqual(Proyecto.objects.count(), 1)
+
+    def test_no_toma_una_en_proceso(self):
+        ImportacionGantt.objects.filter(id=self.importacion.id).update(estado=EstadoImportacion.PROCESANDO)
+        self.assertIsNone(importar_proyecto_tarea(self.importacion.id))
+        self.assertFalse(Proyecto.objects.exists())
+        self.assertEqual(self.estado()['estado'], 'PRO')
+
+    def test_interrumpida(self):
+        # El worker murió (p. ej. por el timeout) sin terminarla
+        ImportacionGantt.objects.filter(id=self.importacion.id).update(
+            estado=EstadoImportacion.PROCESANDO,
+            ultima_modificacion=timezone.now() - timedelta(seconds=settings.EXCEL_IMPORT_TIMEOUT + 1),
+        )
+        datos = self.estado()
+        self.assertEqual(datos['estado'], 'ERR')
+        self.assertIn('interrumpió', datos['error'])
+
+        # Un reintento la vuelve a tomar
+        self.assertIsNotNone(importar_proyecto_tarea(self.importacion.id))
+        self.assertEqual(self.estado()['estado'], 'COM')
+
+    def test_fase_de_escritura(self):
+        # La fase se guarda antes de la transacción de escritura: mientras dura, la página
+        # muestra que se está guardando y el plazo de interrupción cuenta desde ahí
+        guardar = LoteImportacion.guardar
+        durante = []
+
+        def guardar_y_consultar(lote):
+            durante.append(self.estado())
+            return guardar(lote)
+
+        with patch.object(LoteImportacion, 'guardar', guardar_y_consultar):
+            importar_proyecto_tarea(self.importacion.id)
+        self.assertEqual([(d['estado'], d['fase']) for d in durante], [('PRO', 'Guardando en la base de datos')])
+
+    def test_reentrega_despues_del_timeout(self):
+        # El broker no debe reentregar una importación que sigue en curso
+        self.assertGreater(settings.Q_CLUSTER['retry'], settings.EXCEL_IMPORT_TIMEOUT)
+        self.assertGreater(settings.Q_CLUSTER['retry'], settings.Q_CLUSTER['timeout'])
+
+    def test_filas_en_streaming(self):
+        # La primera vez se parsea a medida que se consume; el total aún no se conoce
+        total, filas = cargar_de_staging(self.clave)
+        self.assertIsNone(total)
+        primera = next(filas)
+        completas = [primera] + list(filas)
+
+        total, filas = cargar_de_staging(self.clave)
+        self.assertEqual(total, len(completas))
+        self.assertEqual(list(filas), completas)
+
+    def test_parseo_a_medias_no_queda_guardado(self):
+        _, filas = cargar_de_staging(self.clave)
+        next(filas)
+        filas.close()
+        self.assertIsNone(cargar_de_staging(self.clave)[0])
+
+    def test_archivo_vencido(self):
+        ImportacionGantt.objects.filter(id=self.importacion.id).update(clave_archivo='0' * 64)
+        self.assertIsNone(importar_proyecto_tarea(self.importacion.id))
+        datos = self.estado()
+        self.assertEqual(datos['estado'], 'ERR')
+        self.assertIn('No se encontró el archivo temporal', datos['error'])
+
+
+class LoteImportacionTests(TestCase):
+    def filas(self, n):
+        bloques = [(date(2030, 1, 7), date(2030, 1, 11)), (date(2030, 2, 4), date(2030, 2, 8))]
+        return [
+            FilaNormal(f'Línea {i % 3}', i, f'Actividad {i}', f'Persona {i} : p{i}@example.cl ; Ana : ana@example.cl',
+                       f'Producto {i % 2}', bloques)
+            for i in range(n)
+        ] + [
+            FilaDifusion(i, f'Difusión {i}', f'Persona {i} : p{i}@example.cl', 'Producto 0 ; Otro', 'Línea 0 ; Nueva', bloques)
+            for i in range(n)
+        ]
+
+    def test_bulk_create_herencia(self):
+        proyecto = Proyecto.objects.create(nombre="Uno", fecha_inicio=date(2030, 1, 7))
+        # La línea y el producto se asignan antes de guardarse, como en el lote
+        linea = LineaTrabajo(proyecto=proyecto, nombre="Línea 1")
+        producto = ProductoAsociado(proyecto=proyecto, nombre="Informe")
+        normal = Actividad(linea_trabajo=linea, producto_asociado=producto, nombre="Normal", n_act=1)
+        difusion = ActividadDifusion(proyecto=proyecto, nombre="Difusión", n_act=1)
+        linea.save()
+        producto.save()
+
+        with self.assertNumQueries(3):
+            bulk_create_herencia([normal, difusion])
+        self.assertFalse(normal._state.adding)
+
+        guardada = Actividad.objects.get(id=normal.id)
+        self.assertEqual((guardada.nombre, guardada.linea_trabajo_id, guardada.producto_asociado_id),
+                         ("Normal", linea.id, producto.id))
+        self.assertEqual(ActividadDifusion.objects.get(id=difusion.id).proyecto_id, proyecto.id)
+        self.assertEqual(ActividadBase.objects.count(), 2)
+
+        # Una clave foránea a un objeto sin guardar se detecta antes de escribir
+        with self.assertRaises(ValueError):
+            bulk_create_herencia([Actividad(linea_trabajo=LineaTrabajo(proyecto=proyecto, nombre="Sin guardar"), nombre="X")])
+        self.assertEqual(ActividadBase.objects.count(), 2)
+
+    def test_consultas_constantes(self):
+        # Índice de encargados, savepoint, proyecto y su snapshot, un INSERT por tabla (dos
+        # para la herencia de cada tipo de actividad), relectura de encargados y fin del
+        # savepoint. Más filas de las que caben en un lote de SQLite agregarían un INSERT por lote.
+        for n in (2, 30):
+            with self.assertNumQueries(17):
+                proyecto = importar_filas(f'Proyecto {n}', self.filas(n))
+            self.assertEqual(Actividad.objects.filter(linea_trabajo__proyecto=proyecto).count(), n)
+            self.assertEqual(Alerta.objects.filter(actividad__actividad__linea_trabajo__proyecto=proyecto).count(), 2 * n)
+
+    def test_indice_de_encargados(self):
+        por_correo = Encargado.objects.create(nombre='José Pérez', correo_electronico='Jose.Perez@example.cl')
+        por_nombre = Encargado.objects.create(nombre='María Soto', correo_electronico='')
+        Encargado.objects.bulk_create(
+            Encargado(nombre=f'Persona {i}', correo_electronico=f'p{i}@example.cl') for i in range(50)
+        )
+        with self.assertNumQueries(1):
+            indice = IndiceEncargados()
+        with self.assertNumQueries(0):
+            self.assertEqual(indice.buscar('Otro nombre', 'jose.perez@EXAMPLE.cl'), por_correo)
+            self.assertEqual(indice.buscar('MARIA SOTO', 'nuevo@example.cl'), por_nombre)
+            self.assertIsNone(indice.buscar('Nadie', ''))
+
+    def test_indices_lower(self):
+        for consulta, indice in (
+            (Encargado.objects.annotate(c=Lower('correo_electronico')).filter(c='p@example.cl'), 'encargado_correo_lower_idx'),
+            (Encargado.objects.annotate(n=Lower('nombre')).filter(n='persona'), 'encargado_nombre_lower_idx'),
+        ):
+            sql, params = consulta.query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                plan = ' '.join(str(fila) for fila in cursor.fetchall())
+            self.assertIn(indice, plan)
+
+    def test_encargados_creados_por_otra_importacion(self):
+        proyecto = Proyecto(nombre='Uno', fecha_inicio=date(2030, 1, 7))
+        lote = LoteImportacion(proyecto)
+        ana = lote.encargado('Ana', 'ana@example.cl')
+        beto = lote.encargado('Beto', '')
+        carla = lote.encargado('Carla', 'carla@example.cl')
+
+        # Otra importación crea a las mismas personas antes de que este lote se guarde
+        ana_existente = Encargado.objects.create(nombre='Ana María', correo_electronico='ANA@example.cl')
+        beto_existente = Encargado.objects.create(nombre='BETO', correo_electronico='')
+        with transaction.atomic():
+            proyecto.save()
+            lote.guardar()
+
+        self.assertEqual((ana.pk, beto.pk), (ana_existente.pk, beto_existente.pk))
+        self.assertEqual(Encargado.objects.get(pk=carla.pk).nombre, 'Carla')
+        self.assertEqual(Encargado.objects.count(), 3)
+
+
+class ReimportacionTests(TestCase):
+    def setUp(self):
+        self.filas = [
+            FilaNormal('Línea 1', 1, 'Diseño', 'Ana : ana@example.cl', 'Informe', [(date(2030, 1, 7), date(2030, 1, 11))]),
+            FilaNormal('Línea 1', 2, 'Desarrollo', 'Ana : ana@example.cl', None, [(date(2030, 1, 14), date(2030, 1, 25))]),
+            FilaDifusion(1, 'Seminario', 'Beto : beto@example.cl', 'Informe', 'Línea 1', [(date(2030, 2, 4), date(2030, 2, 8))]),
+        ]
+        self.proyecto = importar_filas('Uno', self.filas)
+        SnapshotProyecto.objects.get_or_create(proyecto=self.proyecto)
+        self.diseno = Actividad.objects.get(nombre='Diseño')
+
+    def version(self):
+        return SnapshotProyecto.objects.get(proyecto=self.proyecto).version
+
+    def reimportar(self, filas):
+        version = self.version()
+        with CaptureQueriesContext(connection) as consultas:
+            cambios = reimportar_filas(self.proyecto, filas)
+        escrituras = [q['sql'] for q in consultas if q['sql'].split()[0] in ('INSERT', 'UPDATE', 'DELETE')]
+        return cambios, escrituras, self.version() - version
+
+    def test_sin_cambios_no_escribe(self):
+        cambios, escrituras, versiones = self.reimportar(self.filas)
+        self.assertFalse(cambios.hay_cambios())
+        self.assertEqual(escrituras, [])
+        self.assertEqual(versiones, 0)
+
+    def test_cambio_de_periodo(self):
+        filas = [self.filas[0]._replace(bloques=[(date(2030, 1, 7), date(2030, 1, 18))])] + self.filas[1:]
+        cambios, escrituras, versiones = self.reimportar(filas)
+        self.assertEqual((cambios.fechas_nuevas, cambios.fechas_eliminadas, cambios.actividades_modificadas), (1, 1, 1))
+        self.assertEqual(
+            list(self.diseno.fechas.filter(estado=True).values_list('fecha_inicio', 'fecha_fin')),
+            [(date(2030, 1, 7), date(2030, 1, 18))],
+        )
+        self.assertTrue(self.diseno.fechas.filter(estado=False, fecha_fin=date(2030, 1, 11)).exists())
+        self.assertEqual([a.fecha_envio.date() for a in self.diseno.alertas.all()], [date(2030, 1, 13)])
+        self.assertGreater(versiones, 0)
+
+    def test_actividad_eliminada(self):
+        cambios, _, versiones = self.reimportar([self.filas[0], self.filas[2]])
+        self.assertEqual(cambios.actividades_eliminadas, 1)
+        self.assertFalse(ActividadBase.objects.filter(nombre='Desarrollo').exists())
+        self.assertTrue(ActividadBase.objects.filter(id=self.diseno.id).exists())
+        self.assertGreater(versiones, 0)
+
+    def test_conserva_el_estado(self):
+        Actividad.objects.filter(id=self.diseno.id).update(estado=EstadoActividad.EN_PROGRESO)
+        filas = [self.filas[0]._replace(bloques=[(date(2030, 1, 7), date(2030, 1, 18))])] + self.filas[1:]
+        self.reimportar(filas)
+        self.diseno.refresh_from_db()
+        self.assertEqual(self.diseno.estado, EstadoActividad.EN_PROGRESO)
+
+    def test_no_duplica_alertas_enviadas(self):
+        enviada = self.diseno.alertas.get()
+        Alerta.objects.filter(id=enviada.id).update(enviado=True)
+
+        cambios, escrituras, versiones = self.reimportar(self.filas)
+        self.assertEqual((escrituras, versiones), ([], 0))
+        self.assertEqual(list(self.diseno.alertas.values_list('id', 'enviado')), [(enviada.id, True)])
+
+        # Con otro periodo la enviada queda como historial y solo se agrega la nueva
+        filas = [self.filas[0]._replace(bloques=[(date(2030, 1, 7), date(2030, 1, 18))])] + self.filas[1:]
+        self.reimportar(filas)
+        self.assertEqual(
+            [(a.fecha_envio.date(), a.enviado) for a in self.diseno.alertas.order_by('fecha_envio')],
+            [(date(2030, 1, 6), True), (date(2030, 1, 13), False)],
+        )
+
+    def test_solo_alertas_invalida_el_snapshot(self):
+        # Falta una alerta pendiente (p. ej. eliminada a mano): la reimportación la repone
+        self.diseno.alertas.all().delete()
+        cambios, _, versiones = self.reimportar(self.filas)
+        self.assertEqual((cambios.alertas_nuevas, cambios.alertas_eliminadas, cambios.actividades_modificadas), (1, 0, 0))
+        self.assertTrue(cambios.hay_cambios())
+        self.assertGreater(versiones, 0)
+        self.assertEqual([a.fecha_envio.date() for a in self.diseno.alertas.all()], [date(2030, 1, 6)])
+
+        filas = [self.filas[0]._replace(bloques=[(date(2030, 1, 7), date(2030, 1, 18))])] + self.filas[1:]
+        cambios, _, _ = self.reimportar(filas)
+        self.assertEqual((cambios.alertas_nuevas, cambios.alertas_eliminadas), (1, 1))
+
+    def test_rango_que_vuelve_se_reactiva(self):
+        original = self.diseno.fechas.get()
+        otro = [self.filas[0]._replace(bloques=[(date(2030, 1, 7), date(2030, 1, 18))])] + self.filas[1:]
+        self.reimportar(otro)
+        cambios, _, _ = self.reimportar(self.filas)
+        self.assertEqual((cambios.fechas_nuevas, cambios.fechas_eliminadas), (1, 1))
+        self.assertEqual(list(self.diseno.fechas.filter(estado=True).values_list('id', flat=True)), [original.id])
+
+        # Ir y volver varias veces no agrega filas
+        for filas in (otro, self.filas, otro):
+            self.reimportar(filas)
+        self.assertEqual(self.diseno.fechas.count(), 2)
+        self.assertEqual(
+            list(self.diseno.fechas.filter(estado=True).values_list('fecha_fin', flat=True)), [date(2030, 1, 18)],
+        )
+
+
+
+class ImportarGanttsTests(TestCase):
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        for nombre, semilla in (('uno', 0), ('dos', 1)):
+            generar_gantt(
+                os.path.join(self.directorio.name, f'{nombre}.xlsx'),
+                lineas=2, actividades_por_linea=2, filas_difusion=1, semanas=8, semilla=semilla,
+            )
+        with open(os.path.join(self.directorio.name, 'roto.xlsx'), 'w') as archivo:
+            archivo.write('no es un excel')
+
+    def tearDown(self):
+        self.directorio.cleanup()
+
+    def importar(self, *opciones):
+        salida = io.StringIO()
+        call_command('importar_gantts', self.directorio.name, '--procesos', '1', *opciones, stdout=salida)
+        return salida.getvalue()
+
+    def test_simular_no_guarda(self):
+        salida = self.importar('--simular')
+        self.assertIn('2 validado(s), 1 con error', salida)
+        self.assertNotIn('importado', salida)
+        self.assertFalse(Proyecto.objects.exists())
 
-# Create your tests here.
+    def test_importa_cada_archivo(self):
+        salida = self.importar()
+        self.assertIn('2 importado(s), 1 con error', salida)
+        self.assertIn('roto.xlsx: error de lectura', salida)
+        self.assertEqual(sorted(Proyecto.objects.values_list('nombre', flat=True)), ['dos', 'uno'])
+        self.assertEqual(Actividad.objects.filter(linea_trabajo__proyecto__nombre='uno').count(), 4)
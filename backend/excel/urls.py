@@ -5,5 +5,7 @@ from . import views
 urlpatterns = [
     path('importar_proyecto/', views.importar_proyecto, name='importar_proyecto'),
     path('descargar_plantilla/', views.descargar_plantilla, name='descargar_plantilla'),
-    path('verificar_proyecto/', views.verificar_proyecto, name='verificar_proyecto')
+    path('verificar_proyecto/', views.verificar_proyecto, name='verificar_proyecto'),
+    path('importacion/<int:importacion_id>/', views.progreso_importacion, name='progreso_importacion'),
+    path('importacion/<int:importacion_id>/estado/', views.estado_importacion, name='estado_importacion'),
 ]   
\ No newline at end of file
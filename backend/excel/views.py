@@ -1,11 +1,15 @@
-from django.shortcuts import render, redirect
+from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from proyectos.models import *
 from .forms import UploadExcelForm
+from .models import ImportacionGantt, EstadoImportacion
 import os
-from django.http import FileResponse, Http404
+from django.http import FileResponse, Http404, JsonResponse
 from django.conf import settings
 from django.contrib import messages
-from .import_gantt import importar_gantt, informacion_proyecto, separar_tablas_excel, FormatoInvalidoError
+from django_q.tasks import async_task
+from .import_gantt import previsualizar_gantt, FormatoInvalidoError
+from .staging import guardar_en_staging, ruta_en_staging
 
 
 # Create your views here.
@@ -33,14 +37,23 @@ def validar_datos_formulario(nombre_proyecto, archivo):
         if not (nombre_archivo.endswith('.xlsx') or nombre_archivo.endswith('.xls')):
             errores.append(f"El archivo debe ser Excel (.xlsx o .xls)")
         
-        # Validar tamaño (máximo 10MB)
-        max_size = 10 * 1024 * 1024  # 10MB
+        # Validar tamaño (la lectura es en streaming, el límite es configurable)
+        max_size = settings.EXCEL_MAX_UPLOAD_BYTES
         if archivo.size > max_size:
-            errores.append(f"El archivo es demasiado grande. Tamaño máximo: 10MB")
+            errores.append(f"El archivo es demasiado grande. Tamaño máximo: {max_size // (1024 * 1024)}MB")
     
     return errores
 
+def obtener_proyecto_destino(request):
+    """Proyecto existente a actualizar (reimportación), indicado por 'proyecto_id' en GET o POST."""
+    proyecto_id = request.POST.get('proyecto_id') or request.GET.get('proyecto')
+    if not proyecto_id:
+        return None
+    return get_object_or_404(Proyecto, id=proyecto_id)
+
 def verificar_proyecto(request):
+    proyecto_destino = obtener_proyecto_destino(request)
+
     if request.method == 'POST':
         form = UploadExcelForm(request.POST, request.FILES)
         if form.is_valid():
@@ -53,23 +66,22 @@ def verificar_proyecto(request):
                 if errores_validacion:
                     for error in errores_validacion:
                         messages.error(request, error)
-                    return render(request, 'excel/importar_proyecto.html', {'form': form})
+                    return render(request, 'excel/importar_proyecto.html', {'form': form, 'proyecto_destino': proyecto_destino})
             
             try:
-                ruta_tmp = f"/tmp/{archivo.name}"
-                with open(ruta_tmp, 'wb+') as destino:
-                    for chunk in archivo.chunks():
-                        destino.write(chunk)
-                
-                df_normales, df_difusion = separar_tablas_excel(archivo)
-                info_proyecto = informacion_proyecto(df_normales, df_difusion)
+                # Vista previa rápida (solo columnas de información); el parseo completo
+                # se hace en la importación a partir del archivo guardado en staging
+                info_proyecto = previsualizar_gantt(archivo)
+                archivo.seek(0)
+                clave = guardar_en_staging(archivo)
                 info_proyecto['Nombre_del_Proyecto'] = nombre_proyecto
                 
                 return render(request, 'excel/importar_proyecto.html', {
                     'info_proyecto': info_proyecto, 
                     'form': form, 
-                    'archivo': ruta_tmp, 
-                    'mostrar_modal': True
+                    'archivo': clave, 
+                    'mostrar_modal': True,
+                    'proyecto_destino': proyecto_destino,
                 })
                 
             except FormatoInvalidoError as e:
@@ -89,39 +101,77 @@ def verificar_proyecto(request):
                     for error in errors:
                         messages.error(request, f"Error en {field}: {error}")
     else:
-        form = UploadExcelForm()
+        initial = {'nombre_proyecto': proyecto_destino.nombre} if proyecto_destino else None
+        form = UploadExcelForm(initial=initial)
 
-    return render(request, 'excel/importar_proyecto.html', {'form': form})
+    return render(request, 'excel/importar_proyecto.html', {'form': form, 'proyecto_destino': proyecto_destino})
 
 def importar_proyecto(request):
     if request.method == 'POST':
         nombre_proyecto = request.POST.get('nombre_proyecto')
-        ruta_tmp = request.POST.get('archivo')
+        clave = request.POST.get('archivo')
         
         if not nombre_proyecto:
             messages.error(request, "No se proporcionó el nombre del proyecto.")
             return redirect('verificar_proyecto')
         
-        if not ruta_tmp:
+        if not clave:
             messages.error(request, "No se proporcionó la ruta del archivo.")
             return redirect('verificar_proyecto')
-            
+
         try:
-            with open(ruta_tmp, 'rb') as archivo:
-                importar_gantt(nombre_proyecto, archivo)
-                # No mostrar mensaje de éxito como solicitaste
-                return redirect('proyectos')  # Redirigir a la lista de proyectos
-                
+            # El archivo quedó guardado en verificar_proyecto
+            ruta_en_staging(clave)
         except FileNotFoundError:
             messages.error(request, "No se encontró el archivo temporal. Intenta subir el archivo nuevamente.")
-        except FormatoInvalidoError as e:
-            messages.error(request, f"Error de formato: {str(e)}")
-        except ValueError as e:
-            messages.error(request, f"Error en los datos: {str(e)}")
-        except Exception as e:
-            messages.error(request, f"Error al importar el proyecto: {str(e)}")
-            
-        return redirect('verificar_proyecto')
+            return redirect('verificar_proyecto')
+
+        # Con proyecto_id el Gantt se aplica como diferencia sobre ese proyecto
+        proyecto_destino = obtener_proyecto_destino(request)
+
+        # La importación se ejecuta en segundo plano (django-q); la página consulta su avance
+        importacion = ImportacionGantt.objects.create(
+            nombre_proyecto=nombre_proyecto,
+            clave_archivo=clave,
+            fase='En cola',
+            proyecto=proyecto_destino,
+            reimportacion=proyecto_destino is not None,
+        )
+        async_task('excel.tasks.importar_proyecto_tarea', importacion.id, timeout=settings.EXCEL_IMPORT_TIMEOUT)
+        return redirect('progreso_importacion', importacion_id=importacion.id)
+
+    return redirect('verificar_proyecto')
+
+
+def progreso_importacion(request, importacion_id):
+    importacion = get_object_or_404(ImportacionGantt, id=importacion_id)
+    return render(request, 'excel/importar_proyecto.html', {
+        'form': UploadExcelForm(),
+        'importacion': importacion,
+    })
+
+
+def estado_importacion(request, importacion_id):
+    """Estado de una importación en JSON, consultado periódicamente por la página de importación."""
+    importacion = get_object_or_404(ImportacionGantt, id=importacion_id)
+    datos = {
+        'estado': importacion.estado,
+        'fase': importacion.fase,
+        'filas_procesadas': importacion.filas_procesadas,
+        'filas_totales': importacion.filas_totales,
+        'error': importacion.error,
+        'url_proyecto': None,
+    }
+    if importacion.interrumpida:
+        # Sin esto la página consultaría para siempre una importación que ya no avanza
+        datos.update(
+            estado=EstadoImportacion.ERROR,
+            fase='Error',
+            error="La importación se interrumpió por exceder el tiempo máximo. Intenta subir el archivo nuevamente.",
+        )
+    elif importacion.estado == EstadoImportacion.COMPLETADA and importacion.proyecto_id:
+        datos['url_proyecto'] = reverse('vista_gantt', args=[importacion.proyecto_id])
+    return JsonResponse(datos)
  
 
 def descargar_plantilla(request):
@@ -48,6 +48,7 @@ INSTALLED_APPS = [
     'proyectos',
     'alertas.apps.AlertasConfig',
     'vistas',
+    'excel',
 ]
 
 MIDDLEWARE = [
@@ -121,6 +122,27 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Cachés
+# 'gantt' guarda los datos del gantt ya serializados (vistas.gantt). LocMemCache
+# descarta las entradas menos usadas al llegar a MAX_ENTRIES (1/CULL_FREQUENCY de
+# ellas por vez).
+# Con varios procesos de servidor puede cambiarse por FileBasedCache para compartirla.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'gantt': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'gantt',
+        'TIMEOUT': 7 * 24 * 60 * 60,  # la clave cambia con cada versión del proyecto
+        'OPTIONS': {
+            'MAX_ENTRIES': 200,
+            'CULL_FREQUENCY': 4,
+        },
+    },
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -155,24 +177,44 @@ if DEBUG:
     ]
 
 
+load_dotenv()
+
+EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
+EMAIL_HOST = os.getenv("SMTP_SERVER")
+EMAIL_PORT = 587
+EMAIL_USE_TLS = True
+EMAIL_HOST_USER = os.getenv("EMAIL")
+EMAIL_HOST_PASSWORD = os.getenv("PASSWORD_APP")
+# Segundos de espera del servidor SMTP: un envío colgado falla en vez de agotar el timeout de Q_CLUSTER
+EMAIL_TIMEOUT = 10
+DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+
+# Tiempo máximo (segundos) de la tarea de importación, en vez del timeout de Q_CLUSTER.
+# Una importación en proceso sin avances por más que esto se da por interrumpida.
+EXCEL_IMPORT_TIMEOUT = 10 * 60
+
 Q_CLUSTER = {
     "name": "DjangoQ",
     "workers": 4,        
     "recycle": 500,
     "timeout": 60,
-    "retry": 120,
+    # El broker reentrega una tarea sin confirmar a los 'retry' segundos: debe superar el
+    # timeout más largo (EXCEL_IMPORT_TIMEOUT) para no repetir una tarea que sigue en curso
+    "retry": EXCEL_IMPORT_TIMEOUT + 60,
     "queue_limit": 50,
     "bulk": 10,
     "orm": "default",
 }
 
-load_dotenv()
+# Envío de alertas: un resumen por destinatario en vez de un correo por alerta. Cada resumen
+# reúne las alertas de un barrido (cada pocos minutos), no las del día
+ALERTAS_RESUMEN_POR_DESTINATARIO = os.getenv("ALERTAS_RESUMEN_POR_DESTINATARIO", "").lower() in ("1", "true", "si", "sí")
 
-EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
-EMAIL_HOST = os.getenv("SMTP_SERVER")
-EMAIL_PORT = 587
-EMAIL_USE_TLS = True
-EMAIL_HOST_USER = os.getenv("EMAIL")
-EMAIL_HOST_PASSWORD = os.getenv("PASSWORD_APP")
-DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
+# Tamaño máximo de los Excel subidos (se leen en streaming con openpyxl)
+EXCEL_MAX_UPLOAD_BYTES = 50 * 1024 * 1024
 
+# Staging de Excel subidos: filas parseadas en verificar_proyecto y reutilizadas en importar_proyecto.
+# El directorio debe ser solo de la aplicación (se crea con permisos 0700): guarda pickles
+EXCEL_STAGING_DIR = os.getenv("EXCEL_STAGING_DIR", os.path.join(BASE_DIR, 'staging'))
+EXCEL_STAGING_TTL = 60 * 60  # segundos
+EXCEL_STAGING_MAX_BYTES = 200 * 1024 * 1024
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:46
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='encargado',
+            index=models.Index(django.db.models.functions.text.Lower('correo_electronico'), name='encargado_correo_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='encargado',
+            index=models.Index(django.db.models.functions.text.Lower('nombre'), name='encargado_nombre_lower_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0002_encargado_indices_lower'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fecha',
+            index=models.Index(fields=['fecha_inicio', 'fecha_fin'], name='fecha_rango_idx'),
+        ),
+    ]
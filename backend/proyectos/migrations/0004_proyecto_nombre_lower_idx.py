@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:14
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0003_fecha_rango_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='proyecto',
+            index=models.Index(django.db.models.functions.text.Lower('nombre'), name='proyecto_nombre_lower_idx'),
+        ),
+    ]
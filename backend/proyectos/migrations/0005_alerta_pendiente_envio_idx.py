@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0004_proyecto_nombre_lower_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alerta',
+            index=models.Index(fields=['enviado', 'fecha_envio'], name='alerta_pendiente_envio_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0005_alerta_pendiente_envio_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alerta',
+            name='reclamada_en',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='alerta',
+            name='reclamo',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+    ]
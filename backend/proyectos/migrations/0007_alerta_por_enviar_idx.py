@@ -0,0 +1,17 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0006_alerta_reclamo'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='alerta',
+            index=models.Index(condition=models.Q(('enviado', False), ('reclamo__isnull', True)), fields=['fecha_envio'], name='alerta_por_enviar_idx'),
+        ),
+    ]
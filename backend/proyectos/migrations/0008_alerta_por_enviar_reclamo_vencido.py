@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0007_alerta_por_enviar_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='alerta',
+            name='alerta_por_enviar_idx',
+        ),
+        migrations.AddIndex(
+            model_name='alerta',
+            index=models.Index(condition=models.Q(('enviado', False)), fields=['fecha_envio'], name='alerta_por_enviar_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:38
+
+import django.db.models.functions.text
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+
+def fusionar_duplicados(apps, schema_editor):
+    """
+    Antes de las restricciones únicas: los encargados repetidos (mismo correo o, sin
+    correo, mismo nombre, sin distinguir mayúsculas) se fusionan en el más antiguo.
+    Se agrupan con Lower() en la base de datos, el mismo que usan las restricciones
+    (en SQLite solo pasa a minúsculas ASCII).
+    """
+    Encargado = apps.get_model('proyectos', 'Encargado')
+    Actividad_Encargado = apps.get_model('proyectos', 'Actividad_Encargado')
+
+    conservado = {}
+    duplicados = {}
+    encargados = Encargado.objects.annotate(
+        correo_lower=Lower('correo_electronico'), nombre_lower=Lower('nombre'),
+    ).order_by('id').values_list('id', 'correo_electronico', 'correo_lower', 'nombre_lower')
+    for encargado_id, correo, correo_lower, nombre_lower in encargados:
+        clave = ('correo', correo_lower) if correo != '' else ('nombre', nombre_lower)
+        if clave in conservado:
+            duplicados[encargado_id] = conservado[clave]
+        else:
+            conservado[clave] = encargado_id
+
+    for duplicado_id, conservado_id in duplicados.items():
+        # Las actividades que ya tienen al conservado no reciben una segunda asignación:
+        # se borra la del duplicado, y si estaba activa se reactiva la del conservado
+        repetidas = Actividad_Encargado.objects.filter(
+            encargado_id=duplicado_id,
+            actividad_id__in=Actividad_Encargado.objects.filter(encargado_id=conservado_id).values('actividad_id'),
+        )
+        Actividad_Encargado.objects.filter(
+            encargado_id=conservado_id,
+            actividad_id__in=list(repetidas.filter(estado=True).values_list('actividad_id', flat=True)),
+        ).update(estado=True)
+        repetidas.delete()
+        Actividad_Encargado.objects.filter(encargado_id=duplicado_id).update(encargado_id=conservado_id)
+    Encargado.objects.filter(id__in=duplicados).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0008_alerta_por_enviar_reclamo_vencido'),
+    ]
+
+    operations = [
+        migrations.RunPython(fusionar_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='encargado',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('correo_electronico'), condition=models.Q(('correo_electronico', ''), _negated=True), name='encargado_correo_lower_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='encargado',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('nombre'), condition=models.Q(('correo_electronico', '')), name='encargado_nombre_sin_correo_lower_uniq'),
+        ),
+    ]
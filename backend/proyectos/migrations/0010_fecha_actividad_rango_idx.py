@@ -0,0 +1,21 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0009_encargado_unico'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='fecha',
+            name='fecha_rango_idx',
+        ),
+        migrations.AddIndex(
+            model_name='fecha',
+            index=models.Index(fields=['actividad', 'fecha_inicio', 'fecha_fin'], name='fecha_actividad_rango_idx'),
+        ),
+    ]
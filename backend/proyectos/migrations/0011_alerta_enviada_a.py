@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('proyectos', '0010_fecha_actividad_rango_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='alerta',
+            name='enviada_a',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
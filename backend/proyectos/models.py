@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Lower
 
 # Create your models here.
 class Proyecto(models.Model):
@@ -10,6 +11,12 @@ class Proyecto(models.Model):
     ultima_modificacion = models.DateTimeField(auto_now=True)
     estado = models.BooleanField(default=True)
 
+    class Meta:
+        # Búsqueda por nombre en el listado: filtrar con Lower('nombre') para que se use
+        indexes = [
+            models.Index(Lower('nombre'), name='proyecto_nombre_lower_idx'),
+        ]
+
     def __str__(self):
         return self.nombre
     
@@ -95,6 +102,14 @@ class Fecha(models.Model):
     fecha_fin = models.DateField()
     estado = models.BooleanField(default=True)
 
+    class Meta:
+        # Consultas por ventana de fechas del gantt: actividad_id IN (las del proyecto)
+        # AND fecha_inicio <= hasta AND fecha_fin >= desde. La actividad va primero para
+        # recorrer solo los periodos del proyecto, no los de todos
+        indexes = [
+            models.Index(fields=['actividad', 'fecha_inicio', 'fecha_fin'], name='fecha_actividad_rango_idx'),
+        ]
+
     def __str__(self):
         return f"{self.actividad.nombre}: {self.fecha_inicio} - {self.fecha_fin}"
 
@@ -105,9 +120,27 @@ class Alerta(models.Model):
     fecha_creacion = models.DateTimeField(auto_now_add=True)
     fecha_envio = models.DateTimeField(db_index=True)
     enviado = models.BooleanField(default=True)
+    # Reclamo del lote de envío que la está procesando (ver alertas.tasks.enviar_lote):
+    # una alerta reclamada no la toma ningún otro lote, ni un reintento del mismo,
+    # hasta que el reclamo vence (ALERTAS_PLAZO_RECLAMO desde reclamada_en)
+    reclamo = models.UUIDField(null=True, blank=True)
+    reclamada_en = models.DateTimeField(null=True, blank=True)
+    # Direcciones (en minúsculas) que ya recibieron la alerta en un resumen: un lote
+    # cortado a medias no se las repite al reintentar
+    enviada_a = models.JSONField(default=list, blank=True)
 
     class Meta:
         ordering = ["fecha_envio"]
+        indexes = [
+            # Alertas pendientes por fecha de envío (próximas alertas)
+            models.Index(fields=['enviado', 'fecha_envio'], name='alerta_pendiente_envio_idx'),
+            # Solo las pendientes, para el barrido de envío (alertas.tasks): incluye las
+            # reclamadas, cuyo reclamo puede vencer. La consulta tiene que repetir enviado=False
+            models.Index(
+                fields=['fecha_envio'], condition=models.Q(enviado=False),
+                name='alerta_por_enviar_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"Alerta para {self.actividad.nombre}: {self.fecha_envio}"
@@ -121,6 +154,26 @@ class Encargado(models.Model):
     ultima_modificacion = models.DateTimeField(auto_now=True)
     estado = models.BooleanField(default=True)
 
+    class Meta:
+        # Índices funcionales para búsquedas sin distinguir mayúsculas:
+        # filtrar con annotate(Lower(...)) o Lower(...) para que se usen
+        indexes = [
+            models.Index(Lower('correo_electronico'), name='encargado_correo_lower_idx'),
+            models.Index(Lower('nombre'), name='encargado_nombre_lower_idx'),
+        ]
+        constraints = [
+            # Un encargado por correo y, entre los que no tienen correo, uno por nombre (sin
+            # distinguir mayúsculas): dos importaciones simultáneas no pueden duplicar a nadie
+            models.UniqueConstraint(
+                Lower('correo_electronico'), condition=~models.Q(correo_electronico=''),
+                name='encargado_correo_lower_uniq',
+            ),
+            models.UniqueConstraint(
+                Lower('nombre'), condition=models.Q(correo_electronico=''),
+                name='encargado_nombre_sin_correo_lower_uniq',
+            ),
+        ]
+
     def __str__(self):
         return self.nombre
     
@@ -1,3 +1,151 @@
-from django.test import TestCase
+from datetime import date, datetime, timezone
 
-# Create your tests here.
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import *
+from .views import POR_PAGINA
+
+
+def crear_proyecto(nombre, estados=()):
+    """Proyecto con una actividad normal y una de difusión por cada estado, y una alerta pendiente por actividad."""
+    proyecto = Proyecto.objects.create(nombre=nombre, fecha_inicio=date(2025, 3, 3))
+    linea = LineaTrabajo.objects.create(proyecto=proyecto, nombre="Línea 1")
+    for estado in estados:
+        for actividad in (
+            Actividad.objects.create(linea_trabajo=linea, nombre="Normal", estado=estado),
+            ActividadDifusion.objects.create(proyecto=proyecto, nombre="Difusión", estado=estado),
+        ):
+            Alerta.objects.create(actividad=actividad, fecha_envio=datetime(2025, 3, 3, tzinfo=timezone.utc), enviado=False)
+            Alerta.objects.create(actividad=actividad, fecha_envio=datetime(2025, 3, 1, tzinfo=timezone.utc))
+    return proyecto
+
+
+class ListadoProyectosTests(TestCase):
+    def test_conteos(self):
+        proyecto = crear_proyecto("Uno", ['PEN', 'PEN', 'COM'])
+        crear_proyecto("Dos", ['TER'])
+
+        respuesta = self.client.get(reverse('proyectos'))
+        primero = respuesta.context['proyectos'][0]
+        self.assertEqual(primero.id, proyecto.id)
+        self.assertEqual(dict(primero.resumen_estados), {
+            'Pendiente': 4, 'Listo para comenzar': 0, 'En progreso': 0, 'Completada': 2, 'Terminada': 0,
+        })
+        self.assertEqual(primero.alertas_pendientes, 6)
+
+    def test_consultas_constantes(self):
+        def consultas():
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get(reverse('proyectos'))
+            return len(ctx.captured_queries)
+
+        crear_proyecto("Uno", ['PEN', 'EPR'])
+        pocos = consultas()
+        for i in range(5):
+            crear_proyecto(f"Proyecto {i}", ['PEN', 'COM', 'TER'])
+        self.assertEqual(consultas(), pocos)
+
+    def test_get_no_escribe(self):
+        crear_proyecto("Uno", ['PEN'])
+        url = reverse('proyectos')
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)  # fija la cookie CSRF, que entra en el ETag
+            etag = self.client.get(url)['ETag']
+        escrituras = [q['sql'] for q in ctx.captured_queries if not q['sql'].lstrip().upper().startswith('SELECT')]
+        self.assertEqual(escrituras, [])
+        # Sin snapshots creados en la lectura, el validador no cambia entre peticiones
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_paginacion(self):
+        ids = [Proyecto.objects.create(nombre=f"P{i}", fecha_inicio=date(2025, 1, 1)).id for i in range(POR_PAGINA + 5)]
+        url = reverse('proyectos')
+
+        respuesta = self.client.get(url)
+        self.assertEqual([p.id for p in respuesta.context['proyectos']], ids[:POR_PAGINA])
+        self.assertIsNone(respuesta.context['anterior'])
+        self.assertEqual(respuesta.context['siguiente'], ids[POR_PAGINA - 1])
+
+        respuesta = self.client.get(url, {'despues': respuesta.context['siguiente']})
+        self.assertEqual([p.id for p in respuesta.context['proyectos']], ids[POR_PAGINA:])
+        self.assertIsNone(respuesta.context['siguiente'])
+
+        respuesta = self.client.get(url, {'antes': respuesta.context['anterior']})
+        self.assertEqual([p.id for p in respuesta.context['proyectos']], ids[:POR_PAGINA])
+        self.assertIsNone(respuesta.context['anterior'])
+
+    def test_busqueda(self):
+        for nombre in ("Proyecto Norte", "PROYECTO sur", "Otro proyecto"):
+            Proyecto.objects.create(nombre=nombre, fecha_inicio=date(2025, 1, 1))
+        nombres = lambda q: [p.nombre for p in self.client.get(reverse('proyectos'), {'q': q}).context['proyectos']]
+
+        # Por prefijo, sin distinguir mayúsculas
+        self.assertEqual(nombres("proyecto"), ["Proyecto Norte", "PROYECTO sur"])
+        self.assertEqual(nombres("Proyecto S"), ["PROYECTO sur"])
+        self.assertEqual(nombres("norte"), [])
+
+    def test_conteos_mueven_el_validador(self):
+        proyecto = crear_proyecto("Uno", ['PEN'])
+        url = reverse('proyectos')
+        self.client.get(url)  # fija la cookie CSRF, que entra en el ETag
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        actividad = Actividad.objects.get(linea_trabajo__proyecto=proyecto)
+        actividad.estado = 'COM'
+        actividad.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class FusionarEncargadosTests(TransactionTestCase):
+    """Migración 0009: fusión de encargados repetidos antes de las restricciones únicas."""
+    antes = [('proyectos', '0008_alerta_por_enviar_reclamo_vencido')]
+    despues = [('proyectos', '0009_encargado_unico')]
+
+    def migrar(self, destino):
+        executor = MigrationExecutor(connection)
+        executor.migrate(destino)
+        return executor.loader.project_state(destino).apps
+
+    def tearDown(self):
+        self.migrar(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_fusion(self):
+        apps = self.migrar(self.antes)
+        Proyecto = apps.get_model('proyectos', 'Proyecto')
+        LineaTrabajo = apps.get_model('proyectos', 'LineaTrabajo')
+        Actividad = apps.get_model('proyectos', 'Actividad')
+        Encargado = apps.get_model('proyectos', 'Encargado')
+        Actividad_Encargado = apps.get_model('proyectos', 'Actividad_Encargado')
+
+        linea = LineaTrabajo.objects.create(
+            proyecto=Proyecto.objects.create(nombre="Uno", fecha_inicio=date(2025, 1, 1)), nombre="Línea 1",
+        )
+        primera, segunda = (Actividad.objects.create(linea_trabajo=linea, nombre=n) for n in ("A", "B"))
+        ana = Encargado.objects.create(nombre="Ana", correo_electronico="ana@example.cl")
+        ana_repetida = Encargado.objects.create(nombre="Ana M.", correo_electronico="ANA@example.cl")
+        # Distintos para SQLite lower() (solo ASCII), aunque str.lower() los igualaría
+        alvaro = Encargado.objects.create(nombre="Álvaro", correo_electronico="álvaro@example.cl")
+        Encargado.objects.create(nombre="Álvaro", correo_electronico="ÁLVARO@example.cl")
+        Actividad_Encargado.objects.create(actividad=primera, encargado=ana, estado=False)
+        Actividad_Encargado.objects.create(actividad=primera, encargado=ana_repetida)
+        Actividad_Encargado.objects.create(actividad=segunda, encargado=ana_repetida)
+
+        apps = self.migrar(self.despues)
+        Encargado = apps.get_model('proyectos', 'Encargado')
+        Actividad_Encargado = apps.get_model('proyectos', 'Actividad_Encargado')
+
+        self.assertEqual(
+            sorted(Encargado.objects.values_list('correo_electronico', flat=True)),
+            ["ana@example.cl", "ÁLVARO@example.cl", "álvaro@example.cl"],
+        )
+        # Una asignación por actividad, con la de la actividad compartida reactivada
+        self.assertEqual(
+            sorted(Actividad_Encargado.objects.filter(encargado_id=ana.id).values_list('actividad__nombre', 'estado')),
+            [("A", True), ("B", True)],
+        )
+        self.assertEqual(Actividad_Encargado.objects.count(), 2)
+        self.assertTrue(Encargado.objects.filter(id=alvaro.id).exists())
@@ -1,14 +1,97 @@
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Lower
 from django.shortcuts import render, redirect
+from django.views.decorators.http import condition
+from vistas.condicional import etag_proyectos, ultima_modificacion_proyectos
 from .models import *
 
 # Create your views here.
 
+# Proyectos por página del listado
+POR_PAGINA = 20
+
+
+# =========================
+# Listado de proyectos
+# =========================
+def _contar(queryset, campo_proyecto):
+    """Subconsulta con la cantidad de filas de queryset del proyecto de la fila externa (0 si no hay)."""
+    subconsulta = queryset.filter(**{campo_proyecto: OuterRef('pk')}).order_by().values(campo_proyecto).annotate(
+        n=Count('pk')
+    ).values('n')
+    return Coalesce(Subquery(subconsulta, output_field=IntegerField()), Value(0))
+
+
+def _resumen_proyectos(queryset):
+    """
+    Anota cada proyecto con sus actividades por estado (n_PEN, n_COM...) y sus alertas
+    pendientes de envío, con subconsultas: todo en la misma consulta del listado.
+    """
+    resumen = {}
+    for estado in EstadoActividad.values:
+        resumen[f'n_{estado}'] = (
+            _contar(Actividad.objects.filter(estado=estado), 'linea_trabajo__proyecto')
+            + _contar(ActividadDifusion.objects.filter(estado=estado), 'proyecto')
+        )
+    pendientes = Alerta.objects.filter(enviado=False)
+    resumen['alertas_pendientes'] = (
+        _contar(pendientes, 'actividad__actividad__linea_trabajo__proyecto')
+        + _contar(pendientes, 'actividad__actividaddifusion__proyecto')
+    )
+    return queryset.annotate(**resumen)
+
+
+def _entero(valor):
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        return None
+
+
+def _pagina_proyectos(busqueda, despues=None, antes=None):
+    """
+    Una página del listado por keyset sobre el id: los proyectos después del id 'despues'
+    o, si se pide la página anterior, antes del id 'antes'. La búsqueda es por prefijo
+    del nombre sin distinguir mayúsculas, con el índice proyecto_nombre_lower_idx.
+    Devuelve (proyectos, hay_anterior, hay_siguiente).
+    """
+    queryset = Proyecto.objects.all()
+    if busqueda:
+        # Rango [busqueda, busqueda + U+10FFFF) sobre lower(nombre): usa el índice, a diferencia de LIKE
+        queryset = queryset.annotate(nombre_minusculas=Lower('nombre')).filter(
+            nombre_minusculas__gte=Lower(Value(busqueda)),
+            nombre_minusculas__lt=Lower(Value(busqueda + '\U0010ffff')),
+        )
+
+    if antes is not None:
+        proyectos = list(_resumen_proyectos(queryset.filter(id__lt=antes)).order_by('-id')[:POR_PAGINA + 1])
+        hay_anterior = len(proyectos) > POR_PAGINA
+        return proyectos[:POR_PAGINA][::-1], hay_anterior, True
+
+    if despues is not None:
+        queryset = queryset.filter(id__gt=despues)
+    proyectos = list(_resumen_proyectos(queryset).order_by('id')[:POR_PAGINA + 1])
+    return proyectos[:POR_PAGINA], despues is not None, len(proyectos) > POR_PAGINA
+
+
+@condition(etag_func=etag_proyectos, last_modified_func=ultima_modificacion_proyectos)
 def proyectos(request):
     if request.method == 'POST':
         print(request.POST)
-    proyectos = Proyecto.objects.all()
+    busqueda = request.GET.get('q', '').strip()
+    proyectos, hay_anterior, hay_siguiente = _pagina_proyectos(
+        busqueda, _entero(request.GET.get('despues')), _entero(request.GET.get('antes')),
+    )
+
+    for proyecto in proyectos:
+        proyecto.resumen_estados = [
+            (etiqueta, getattr(proyecto, f'n_{estado}')) for estado, etiqueta in EstadoActividad.choices
+        ]
     return render(request,'proyectos/proyectos.html',{
         'proyectos' : proyectos,
+        'busqueda': busqueda,
+        'anterior': proyectos[0].id if hay_anterior and proyectos else None,
+        'siguiente': proyectos[-1].id if hay_siguiente and proyectos else None,
         })
 
 
@@ -24,4 +107,4 @@ def eliminar_proyecto(request):
     return proyectos(request)
     
 def home(request):
-    return redirect('proyectos')  # Redirige a la vista de proyectos
\ No newline at end of file
+    return redirect('proyectos')  # Redirige a la vista de proyectos
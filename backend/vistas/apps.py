@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class VistasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'vistas'
+
+    def ready(self):
+        from .signals import conectar_senales
+
+        conectar_senales()
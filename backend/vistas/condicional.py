@@ -0,0 +1,85 @@
+import hashlib
+
+from django.contrib.messages import get_messages
+from django.db.models import Count, Max
+
+from proyectos.models import Proyecto
+from .models import SnapshotProyecto
+
+
+# =========================
+# Peticiones condicionales (ETag / Last-Modified) para las páginas
+# =========================
+# Para usar con django.views.decorators.http.condition. Las páginas de un proyecto
+# se validan con su SnapshotProyecto: la versión sube con cualquier escritura sobre
+# sus actividades, fechas, encargados, líneas o alertas (señales, y a mano en las
+# operaciones masivas), y ultima_modificacion queda en la hora de ese cambio.
+# Las funciones devuelven None cuando la página no puede responderse con 304.
+
+
+def _reutilizable(request):
+    """Una página con mensajes pendientes tiene que renderizarse para mostrarlos."""
+    return len(get_messages(request)) == 0
+
+
+def _huella_csrf(request):
+    """
+    Las páginas llevan el token CSRF: una copia guardada solo sirve con la misma
+    cookie. Se incluye un resumen de la cookie, no la cookie.
+    """
+    cookie = request.META.get('CSRF_COOKIE') or ''
+    return hashlib.sha256(cookie.encode('utf-8')).hexdigest()[:12]
+
+
+def _estado_proyecto(request, proyecto_id):
+    # etag_func y last_modified_func se llaman por separado: una sola consulta por petición
+    if not hasattr(request, '_estado_proyecto'):
+        request._estado_proyecto = SnapshotProyecto.objects.filter(
+            proyecto_id=proyecto_id
+        ).values_list('version', 'ultima_modificacion').first()
+    return request._estado_proyecto
+
+
+def etag_proyecto(request, proyecto_id, **kwargs):
+    estado = _estado_proyecto(request, proyecto_id)
+    if estado is None or not _reutilizable(request):
+        return None
+    return f"proyecto-{proyecto_id}-{estado[0]}-{_huella_csrf(request)}"
+
+
+def ultima_modificacion_proyecto(request, proyecto_id, **kwargs):
+    estado = _estado_proyecto(request, proyecto_id)
+    if estado is None or not _reutilizable(request):
+        return None
+    return estado[1]
+
+
+def _estado_proyectos(request):
+    # La cantidad cambia al eliminar; la última modificación, al crear o editar un
+    # proyecto o, por su snapshot, al cambiar las actividades o alertas que cuenta el listado
+    if not hasattr(request, '_estado_proyectos'):
+        estado = Proyecto.objects.aggregate(
+            cantidad=Count('id'),
+            ultima_modificacion=Max('ultima_modificacion'),
+            ultimo_cambio_datos=Max('snapshot__ultima_modificacion'),
+        )
+        estado['ultima_modificacion'] = max(
+            filter(None, (estado['ultima_modificacion'], estado.pop('ultimo_cambio_datos'))), default=None,
+        )
+        request._estado_proyectos = estado
+    return request._estado_proyectos
+
+
+def etag_proyectos(request, **kwargs):
+    estado = _estado_proyectos(request)
+    if estado['ultima_modificacion'] is None or not _reutilizable(request):
+        return None
+    marca = estado['ultima_modificacion'].timestamp()
+    return f"proyectos-{estado['cantidad']}-{marca}-{_huella_csrf(request)}"
+
+
+def ultima_modificacion_proyectos(request, **kwargs):
+    estado = _estado_proyectos(request)
+    if not _reutilizable(request):
+        return None
+    return estado['ultima_modificacion']
@@ -1,169 +1,169 @@
-from datetime import datetime, timedelta
+import json
 import math
 
+import numpy as np
+from django.core.cache import caches
+
+from .lectura import actividades_gantt
+
+# Alias de caché para los datos del gantt ya serializados (ver CACHES en settings)
+GANTT_CACHE = 'gantt'
+
+
+# =========================
+# Datos compactos para el gantt (renderizado en el navegador)
+# =========================
+def ordenar_actividades_gantt(actividades):
+    """Ordena por tipo (Normal primero, Difusión después), ID de línea de trabajo y fecha de inicio."""
+    actividades.sort(key=lambda x: (
+        x['orden_tipo'],  # 1 para Normal, 2 para Difusión
+        x['linea_trabajo_id'],  # ID de línea de trabajo numéricamente
+        x['primera_fecha'] or '9999-12-31'
+    ))
+    return actividades
+
+
+def gantt_compacto(actividades):
+    """
+    Datos del gantt en columnas paralelas, para que el navegador dibuje las barras.
+    Las fechas de los periodos van como días desde 'inicio' (el lunes de la primera
+    semana, con una semana de margen); las líneas de trabajo como índice en 'lineas'.
+    """
+    rangos = _rangos_actividades(actividades)
+    if not len(rangos['inicio']):
+        datos = _compactar(actividades, rangos, None)
+        datos.update(inicio=None, semanas=0, rango=None, total_filas=len(actividades), fila_desde=0)
+        return datos
 
-def calcular_gantt_data(actividades):
-    if not actividades:
-        return {
-            'columnas_semanales': [], 
-            'week_width': 100, 
-            'total_weeks': 0,
-            'total_width': 320,
-            'start_date': None,
-            'end_date': None
-        }
-    
-    # Recopilar todas las fechas del proyecto
-    todas_fechas = _extraer_fechas_actividades(actividades)
-    
-    if not todas_fechas:
-        return {
-            'columnas_semanales': [], 
-            'week_width': 100, 
-            'total_weeks': 0,
-            'total_width': 320,
-            'start_date': None,
-            'end_date': None
-        }
-    
     # Calcular rango de fechas ajustado a semanas completas
-    start_of_week, end_of_week, total_weeks = _calcular_rango_semanal(todas_fechas)
-    
-    # Configuración de dimensiones
-    week_width = 100  # Ancho estándar de columna semanal
-    
-    # Generar columnas semanales con metadatos
-    columnas_semanales = _generar_columnas_semanales(start_of_week, total_weeks, week_width)
-    
-    # Calcular posiciones de barras para cada actividad
-    _calcular_posiciones_actividades(actividades, start_of_week, week_width)
-    
+    inicio, fin, semanas = _calcular_rango_semanal(rangos['inicio'], rangos['fin'])
+    datos = _compactar(actividades, rangos, inicio)
+    datos.update(
+        inicio=inicio.item().isoformat(),
+        semanas=semanas,
+        rango=[inicio.item().isoformat(), fin.item().isoformat()],
+        total_filas=len(actividades),
+        fila_desde=0,
+    )
+    return datos
+
+
+def gantt_ventana(actividades, desde, hasta, rango, fila_desde=0, filas=None):
+    """
+    Como gantt_compacto, pero solo para una ventana: las semanas de desde (un lunes)
+    a hasta (un domingo) y las filas [fila_desde, fila_desde + filas) de las actividades
+    ya ordenadas. 'rango' es el de todo el proyecto (ver rango_gantt), para que el
+    navegador sepa si hay ventanas vecinas.
+    """
+    inicio = np.datetime64(desde, 'D')
+    fin = np.datetime64(hasta, 'D')
+
+    filas_ventana = actividades[fila_desde:None if filas is None else fila_desde + filas]
+    datos = _compactar(filas_ventana, _rangos_actividades(filas_ventana), inicio)
+    datos.update(
+        inicio=inicio.item().isoformat(),
+        semanas=int((fin - inicio).astype('int64')) // 7 + 1,
+        rango=rango,
+        total_filas=len(actividades),
+        fila_desde=fila_desde,
+    )
+    return datos
+
+
+def rango_gantt(primera, ultima):
+    """Rango completo del gantt de un proyecto (ver rango_fechas_proyecto), con su semana de margen."""
+    fechas = np.array([primera, ultima], dtype='datetime64[D]')
+    inicio, fin, _ = _calcular_rango_semanal(fechas, fechas)
+    return [inicio.item().isoformat(), fin.item().isoformat()]
+
+
+def gantt_json(proyecto_id, snapshot):
+    """
+    gantt_compacto del snapshot ya serializado, en caché por proyecto y versión de
+    sus datos (sube con cualquier cambio, ver vistas.snapshot). Sin versión no se guarda.
+    """
+    clave = f"gantt:{proyecto_id}:{snapshot['version']}"
+    cache = caches[GANTT_CACHE]
+
+    contenido = cache.get(clave) if snapshot['version'] is not None else None
+    if contenido is None:
+        datos = gantt_compacto(ordenar_actividades_gantt(actividades_gantt(snapshot)))
+        contenido = json.dumps(datos, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        if snapshot['version'] is not None:
+            cache.set(clave, contenido)
+    return contenido
+
+
+# =========================
+# Funciones auxiliares
+# =========================
+def _rangos_actividades(actividades):
+    """
+    Aplana los periodos con fecha de inicio y fin de todas las actividades: el índice
+    de su actividad, su número dentro de la actividad y sus fechas como datetime64[D].
+    """
+    indices, numeros, inicios, fines = [], [], [], []
+    for indice, actividad in enumerate(actividades):
+        for i, fecha_obj in enumerate(actividad['fechas'] or ()):
+            if fecha_obj['fecha_inicio'] and fecha_obj['fecha_fin']:
+                indices.append(indice)
+                numeros.append(fecha_obj.get('numero', i + 1))
+                inicios.append(fecha_obj['fecha_inicio'])
+                fines.append(fecha_obj['fecha_fin'])
+
     return {
-        'columnas_semanales': columnas_semanales,
-        'week_width': week_width,
-        'total_weeks': total_weeks,
-        'total_width': 320 + (total_weeks * week_width),
-        'start_date': start_of_week,
-        'end_date': end_of_week
+        'actividad': indices,
+        'numero': numeros,
+        'inicio': np.array(inicios, dtype='datetime64[D]'),
+        'fin': np.array(fines, dtype='datetime64[D]'),
     }
 
 
-def _extraer_fechas_actividades(actividades):
-    todas_fechas = []
-    
+def _compactar(actividades, rangos, inicio):
+    """Columnas de actividades y periodos; los días de cada periodo se cuentan desde inicio."""
+    lineas, indice_linea = [], {}
+    columnas = {
+        'id': [], 'nombre': [], 'linea': [], 'difusion': [], 'estado': [],
+        'primera': [], 'ultima': [], 'n_periodos': [],
+    }
     for actividad in actividades:
-        if actividad['fechas']:
-            for fecha_obj in actividad['fechas']:
-                if fecha_obj['fecha_inicio'] and fecha_obj['fecha_fin']:
-                    fecha_inicio = datetime.strptime(fecha_obj['fecha_inicio'], '%Y-%m-%d').date()
-                    fecha_fin = datetime.strptime(fecha_obj['fecha_fin'], '%Y-%m-%d').date()
-                    todas_fechas.extend([fecha_inicio, fecha_fin])
-    
-    return todas_fechas
-
-
-def _calcular_rango_semanal(fechas):
-    fecha_min = min(fechas)
-    fecha_max = max(fechas)
-    
-    days_to_monday = fecha_min.weekday()
-    start_of_week = fecha_min - timedelta(days=days_to_monday + 7)
-    
-    days_to_sunday = 6 - fecha_max.weekday()
-    end_of_week = fecha_max + timedelta(days=days_to_sunday + 7)
-    total_days = (end_of_week - start_of_week).days
-    total_weeks = math.ceil(total_days / 7)
-    
-    return start_of_week, end_of_week, total_weeks
+        linea = actividad['linea_trabajo']
+        if linea not in indice_linea:
+            indice_linea[linea] = len(lineas)
+            lineas.append(linea)
+        columnas['id'].append(actividad['id'])
+        columnas['nombre'].append(actividad['nombre'])
+        columnas['linea'].append(indice_linea[linea])
+        columnas['difusion'].append(actividad['tipo'] != 'Normal')
+        columnas['estado'].append(actividad['estado'])
+        columnas['primera'].append(actividad['primera_fecha'])
+        columnas['ultima'].append(actividad['ultima_fecha'])
+        columnas['n_periodos'].append(actividad['n_periodos'])
+
+    periodos = {'actividad': [], 'numero': [], 'inicio': [], 'fin': []}
+    if len(rangos['inicio']):
+        periodos = {
+            'actividad': rangos['actividad'],
+            'numero': rangos['numero'],
+            'inicio': (rangos['inicio'] - inicio).astype('int64').tolist(),
+            'fin': (rangos['fin'] - inicio).astype('int64').tolist(),
+        }
+    return {'lineas': lineas, 'actividades': columnas, 'periodos': periodos}
 
 
-def _generar_columnas_semanales(start_date, total_weeks, week_width):
+def _dia_semana(fechas):
+    """Día de la semana de fechas datetime64[D] (lunes = 0), como date.weekday()."""
+    # 1970-01-01 fue jueves
+    return (fechas.astype('int64') + 3) % 7
 
-    meses_es = {
-        1: 'Ene', 2: 'Feb', 3: 'Mar', 4: 'Abr', 5: 'May', 6: 'Jun',
-        7: 'Jul', 8: 'Ago', 9: 'Sep', 10: 'Oct', 11: 'Nov', 12: 'Dic'
-    }
-    
-    columnas_semanales = []
-    today = datetime.now().date()
-    
-    for week in range(total_weeks):
-        week_start = start_date + timedelta(days=week * 7)
-        week_end = week_start + timedelta(days=6)
-        
-
-        is_current_week = week_start <= today <= week_end
-        
-        columnas_semanales.append({
-            'week_index': week,
-            'week_start': week_start,
-            'week_end': week_end,
-            'left_px': week * week_width,
-            'width_px': week_width,
-            'is_current_week': is_current_week,
-            'month_name': meses_es[week_start.month],
-            'day_number': week_start.day
-        })
-    
-    return columnas_semanales
-
-
-def _calcular_posiciones_actividades(actividades, start_date, week_width):
-    for actividad in actividades:
-        actividad['periodos_calculados'] = []
-        
-        if not actividad['fechas']:
-            continue
-            
-        for i, fecha_obj in enumerate(actividad['fechas']):
-            if not (fecha_obj['fecha_inicio'] and fecha_obj['fecha_fin']):
-                continue
-                
-            # Parsear fechas
-            fecha_inicio = datetime.strptime(fecha_obj['fecha_inicio'], '%Y-%m-%d').date()
-            fecha_fin = datetime.strptime(fecha_obj['fecha_fin'], '%Y-%m-%d').date()
-            
-            duracion_dias = (fecha_fin - fecha_inicio).days + 1
-            dias_desde_inicio = (fecha_inicio - start_date).days
-            dias_hasta_fin = (fecha_fin - start_date).days
-            
-            # Calcular semanas que abarca la actividad
-            week_inicio = dias_desde_inicio // 7
-            week_fin = dias_hasta_fin // 7
-            semanas_ocupadas = week_fin - week_inicio + 1
-            
-            # Vista semanal: siempre ocupa semana completa donde inicia
-            left_px = week_inicio * week_width
-            width_px = semanas_ocupadas * week_width
-            
-            # Vista mensual: ancho proporcional a las semanas que ocupa
-            left_px_monthly = _escalar_posicion_mensual(left_px)
-            width_px_monthly = _calcular_ancho_mensual_real(semanas_ocupadas)
-            
-            actividad['periodos_calculados'].append({
-                'periodo': i + 1,
-                'fecha_inicio': fecha_obj['fecha_inicio'],
-                'fecha_fin': fecha_obj['fecha_fin'],
-                'left_px': left_px,
-                'width_px': width_px,
-                'left_px_monthly': left_px_monthly,
-                'width_px_monthly': width_px_monthly,
-                'duracion_dias': duracion_dias,
-                'ocupa_semana_completa': True
-            })
-
-
-def _escalar_posicion_mensual(left_px_semanal):
-    return int((left_px_semanal * 35) / 100)
-
-
-def _calcular_ancho_mensual(width_px_semanal):
-    width_escalado = int((width_px_semanal * 35) / 100)
-    return max(width_escalado, 25)
-
-
-def _calcular_ancho_mensual_real(semanas_ocupadas):
-    """Calcula el ancho real para vista mensual basado en semanas ocupadas"""
-    ancho_por_semana = 35  # 35px por semana en vista mensual
-    ancho_total = semanas_ocupadas * ancho_por_semana
-    return max(ancho_total, 25)  # Mínimo 25px
\ No newline at end of file
+
+def _calcular_rango_semanal(inicios, fines):
+    fecha_min = min(inicios.min(), fines.min())
+    fecha_max = max(inicios.max(), fines.max())
+
+    start_of_week = fecha_min - np.timedelta64(int(_dia_semana(fecha_min)) + 7, 'D')
+    end_of_week = fecha_max + np.timedelta64(6 - int(_dia_semana(fecha_max)) + 7, 'D')
+    total_days = int((end_of_week - start_of_week).astype('int64'))
+    total_weeks = math.ceil(total_days / 7)
+
+    return start_of_week, end_of_week, total_weeks
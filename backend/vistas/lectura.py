@@ -0,0 +1,199 @@
+from datetime import date, datetime, timedelta
+
+from django.db.models import Count, Max, Min, OuterRef, Q, Subquery
+
+from proyectos.models import Actividad, ActividadDifusion, EstadoActividad, Fecha
+from .snapshot import obtener_snapshot
+
+
+# =========================
+# Funciones auxiliares
+# =========================
+def _formatear_fechas(fechas, extender_un_dia=True):
+    """Rangos de fechas del snapshot (ISO); un rango de un día se extiende al día siguiente."""
+    fechas_lista = []
+    for inicio, fin in fechas:
+        if extender_un_dia and inicio == fin:
+            fin = (date.fromisoformat(fin) + timedelta(days=1)).isoformat()
+        fechas_lista.append({
+            "fecha_inicio": inicio,
+            "fecha_fin": fin
+        })
+    return fechas_lista
+
+
+def _estado_display(estado):
+    try:
+        return EstadoActividad(estado).label
+    except ValueError:
+        return estado
+
+
+# =========================
+# Modelo de lectura (desde el snapshot del proyecto)
+# =========================
+def actividades_proyecto(proyecto):
+    """
+    Actividades de un proyecto (normales y de difusión) como diccionarios listos
+    para las vistas de lista y tablero, con sus fechas activas, encargados y líneas.
+
+    Se arma desde el snapshot del proyecto: sin consultas por actividad, y ninguna
+    consulta a las tablas de actividades mientras el snapshot siga vigente.
+    """
+    todas_actividades = []
+    for actividad in obtener_snapshot(proyecto)['actividades']:
+        normal = actividad['tipo'] == 'Normal'
+        nombre_defecto = f"Actividad {actividad['id']}" if normal else f"Actividad Difusión {actividad['id']}"
+        todas_actividades.append({
+            'id': actividad['id'],
+            'nombre': actividad['nombre'] or nombre_defecto,
+            'fechas': _formatear_fechas(actividad['fechas']),
+            'tipo': actividad['tipo'],
+            'encargados': actividad['encargados'],
+            'estado': _estado_display(actividad['estado']),
+            'estado_valor': actividad['estado'],
+            'linea_trabajo': actividad['linea_trabajo'][1] if normal else actividad['lineas'],
+        })
+    return todas_actividades
+
+
+def _actividad_gantt(id, nombre, estado, linea_trabajo, fechas, primera_fecha, ultima_fecha, n_periodos):
+    """Diccionario de una actividad para el gantt; linea_trabajo es [id, nombre] o None si es de difusión."""
+    if linea_trabajo is not None:
+        return {
+            'id': id,
+            'nombre': nombre or f"Actividad {id}",
+            'fechas': fechas,
+            'tipo': 'Normal',
+            'estado': estado,
+            'linea_trabajo': linea_trabajo[1],
+            'linea_trabajo_id': linea_trabajo[0],  # ID para ordenamiento
+            'orden_tipo': 1,  # Prioridad para ordenamiento (Normal = 1)
+            'primera_fecha': primera_fecha,
+            'ultima_fecha': ultima_fecha,
+            'n_periodos': n_periodos,
+        }
+    return {
+        'id': id,
+        'nombre': nombre or f"Actividad Difusión {id}",
+        'fechas': fechas,
+        'tipo': 'Difusión',
+        'estado': estado,
+        'linea_trabajo': 'Difusión',  # Grupo para actividades de difusión
+        'linea_trabajo_id': 1000000,  # ID alto para que aparezca al final
+        'orden_tipo': 2,  # Prioridad para ordenamiento (Difusión = 2)
+        'primera_fecha': primera_fecha,
+        'ultima_fecha': ultima_fecha,
+        'n_periodos': n_periodos,
+    }
+
+
+def actividades_gantt(snapshot):
+    """Actividades para vista_gantt (sin ordenar ni separadores), desde un snapshot ya leído."""
+    todas_actividades = []
+    for actividad in snapshot['actividades']:
+        fechas = actividad['fechas']
+        todas_actividades.append(_actividad_gantt(
+            actividad['id'], actividad['nombre'], actividad['estado'],
+            actividad['linea_trabajo'] if actividad['tipo'] == 'Normal' else None,
+            _formatear_fechas(fechas, extender_un_dia=False),
+            primera_fecha=fechas[0][0] if fechas else None,
+            ultima_fecha=fechas[-1][1] if fechas else None,
+            n_periodos=len(fechas),
+        ))
+    return todas_actividades
+
+
+def actividades_alertas(proyecto):
+    """Actividades para el listado de alertas: encargados, fecha límite y alertas, desde el snapshot."""
+    actividades = []
+    for actividad in obtener_snapshot(proyecto)['actividades']:
+        fechas_fin = [fin for _, fin in actividad['fechas']]
+        actividades.append({
+            'id': actividad['id'],
+            'nombre': actividad['nombre'],
+            'encargados': actividad['encargados'],
+            'fecha_limite': date.fromisoformat(max(fechas_fin)) if fechas_fin else None,
+            'alertas': [
+                {'fecha_envio': datetime.fromisoformat(envio), 'enviado': enviado}
+                for envio, enviado in actividad['alertas']
+            ],
+        })
+    return actividades
+
+
+# =========================
+# Ventanas del gantt (consultas por rango de fechas)
+# =========================
+def _fechas_proyecto(proyecto):
+    return Fecha.objects.filter(estado=True).filter(
+        Q(actividad__actividad__linea_trabajo__proyecto=proyecto)
+        | Q(actividad__actividaddifusion__proyecto=proyecto)
+    )
+
+
+def rango_fechas_proyecto(proyecto):
+    """Primera y última fecha de los periodos activos del proyecto, o None si no tiene."""
+    rango = _fechas_proyecto(proyecto).aggregate(
+        min_inicio=Min('fecha_inicio'), min_fin=Min('fecha_fin'),
+        max_inicio=Max('fecha_inicio'), max_fin=Max('fecha_fin'),
+    )
+    if rango['min_inicio'] is None:
+        return None
+    return min(rango['min_inicio'], rango['min_fin']), max(rango['max_inicio'], rango['max_fin'])
+
+
+def actividades_gantt_ventana(proyecto, desde, hasta):
+    """
+    Actividades con algún periodo activo entre desde y hasta, como actividades_gantt
+    pero con solo esos periodos en 'fechas' (cada uno con su 'numero' entre todos los
+    periodos de la actividad). Lee solo los periodos de la ventana, con el índice
+    fecha_actividad_rango_idx: por cada actividad del proyecto, los que empiezan hasta 'hasta'.
+    """
+    del_proyecto = (
+        Q(actividad__in=Actividad.objects.filter(linea_trabajo__proyecto=proyecto).values('pk'))
+        | Q(actividad__in=ActividadDifusion.objects.filter(proyecto=proyecto).values('pk'))
+    )
+    periodos_activos = Fecha.objects.filter(actividad=OuterRef('actividad'), estado=True)
+    fechas = Fecha.objects.filter(
+        del_proyecto, estado=True, fecha_inicio__lte=hasta, fecha_fin__gte=desde,
+    ).annotate(
+        numero=Subquery(
+            periodos_activos.filter(id__lte=OuterRef('id')).values('actividad').annotate(n=Count('id')).values('n')
+        ),
+    ).order_by('id').values_list('actividad_id', 'numero', 'fecha_inicio', 'fecha_fin')
+
+    fechas_por_actividad = {}
+    for actividad_id, numero, inicio, fin in fechas:
+        fechas_por_actividad.setdefault(actividad_id, []).append({
+            'numero': numero,
+            'fecha_inicio': inicio.isoformat(),
+            'fecha_fin': fin.isoformat(),
+        })
+    if not fechas_por_actividad:
+        return []
+
+    periodos = Fecha.objects.filter(actividad=OuterRef('pk'), estado=True)
+    resumen = {
+        'primera_fecha': Subquery(periodos.order_by('id').values('fecha_inicio')[:1]),
+        'ultima_fecha': Subquery(periodos.order_by('-id').values('fecha_fin')[:1]),
+        'n_periodos': Subquery(periodos.values('actividad').annotate(n=Count('id')).values('n')),
+    }
+    campos = ['id', 'nombre', 'estado', 'primera_fecha', 'ultima_fecha', 'n_periodos']
+
+    actividades = []
+    normales = Actividad.objects.filter(id__in=fechas_por_actividad).annotate(**resumen).values(
+        *campos, 'linea_trabajo_id', 'linea_trabajo__nombre'
+    )
+    difusion = ActividadDifusion.objects.filter(id__in=fechas_por_actividad).annotate(**resumen).values(*campos)
+    for actividad in [*normales, *difusion]:
+        linea = actividad.get('linea_trabajo_id')
+        actividades.append(_actividad_gantt(
+            actividad['id'], actividad['nombre'], actividad['estado'],
+            [linea, actividad['linea_trabajo__nombre']] if linea is not None else None,
+            fechas_por_actividad[actividad['id']],
+            primera_fecha=actividad['primera_fecha'].isoformat(),
+            ultima_fecha=actividad['ultima_fecha'].isoformat(),
+            n_periodos=actividad['n_periodos'],
+        ))
+    return actividades
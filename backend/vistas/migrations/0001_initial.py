@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-18 16:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('proyectos', '0002_encargado_indices_lower'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotProyecto',
+            fields=[
+                ('id', models.AutoField(primary_key=True, serialize=False)),
+                ('datos', models.BinaryField(blank=True, null=True)),
+                ('version', models.PositiveIntegerField(default=1)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('ultima_modificacion', models.DateTimeField(auto_now=True)),
+                ('proyecto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='snapshot', to='proyectos.proyecto')),
+            ],
+        ),
+    ]
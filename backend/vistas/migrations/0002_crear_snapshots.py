@@ -0,0 +1,25 @@
+# Generated by Django 5.2.6 on 2026-10-18 17:41
+
+from django.db import migrations
+
+
+def crear_snapshots_faltantes(apps, schema_editor):
+    """Los snapshots se crean con cada proyecto; los proyectos anteriores reciben el suyo aquí."""
+    Proyecto = apps.get_model('proyectos', 'Proyecto')
+    SnapshotProyecto = apps.get_model('vistas', 'SnapshotProyecto')
+    SnapshotProyecto.objects.bulk_create(
+        [SnapshotProyecto(proyecto_id=proyecto_id) for proyecto_id in
+         Proyecto.objects.filter(snapshot__isnull=True).values_list('id', flat=True)],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vistas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_snapshots_faltantes, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,18 @@
 from django.db import models
+from proyectos.models import Proyecto
 
 # Create your models here.
+
+# Copia materializada de las actividades de un proyecto, leída por las vistas.
+# datos=None indica que hay que reconstruirla; version sube con cada cambio del proyecto
+# y ultima_modificacion queda en la hora de ese cambio (la reconstrucción no la toca).
+class SnapshotProyecto(models.Model):
+    id = models.AutoField(primary_key=True)
+    proyecto = models.OneToOneField(Proyecto, related_name='snapshot', on_delete=models.CASCADE)
+    datos = models.BinaryField(null=True, blank=True)
+    version = models.PositiveIntegerField(default=1)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    ultima_modificacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Snapshot de {self.proyecto} (v{self.version})"
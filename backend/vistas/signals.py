@@ -0,0 +1,82 @@
+from django.db.models import QuerySet
+from django.db.models.signals import post_save, pre_delete
+
+from proyectos.models import (
+    Actividad, ActividadBase, ActividadDifusion, ActividadDifusion_Linea, Actividad_Encargado,
+    Alerta, Encargado, Fecha, LineaTrabajo, Proyecto,
+)
+from .snapshot import crear_snapshots, invalidar_actividades, invalidar_encargado, invalidar_proyectos
+
+# Las eliminaciones se escuchan en pre_delete: en post_delete la actividad ya no
+# existe y no se puede saber a qué proyecto pertenecía.
+# Las operaciones masivas (bulk_create, update()) no emiten señales: quien las use
+# debe invalidar a mano (ver excel.reimportacion).
+
+
+def _borrado_en_cascada(sender, origin):
+    """
+    True si el objeto se elimina en cascada desde otro modelo (proyecto, línea,
+    actividad...). Ese otro modelo ya invalida el snapshot: evita una consulta por fila.
+    """
+    if origin is None:
+        return False
+    modelo = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return not issubclass(modelo, sender)
+
+
+def actividad_guardada(sender, instance, **kwargs):
+    invalidar_actividades([instance.pk])
+
+
+def actividad_eliminada(sender, instance, origin=None, **kwargs):
+    if not _borrado_en_cascada(sender, origin):
+        invalidar_actividades([instance.pk])
+
+
+def relacion_guardada(sender, instance, **kwargs):
+    invalidar_actividades([instance.actividad_id])
+
+
+def relacion_eliminada(sender, instance, origin=None, **kwargs):
+    if not _borrado_en_cascada(sender, origin):
+        invalidar_actividades([instance.actividad_id])
+
+
+def linea_guardada(sender, instance, created=False, **kwargs):
+    if not created:
+        invalidar_proyectos([instance.proyecto_id])
+
+
+def linea_eliminada(sender, instance, origin=None, **kwargs):
+    if not _borrado_en_cascada(sender, origin):
+        invalidar_proyectos([instance.proyecto_id])
+
+
+def proyecto_guardado(sender, instance, created=False, **kwargs):
+    if created:
+        # El snapshot existe desde que existe el proyecto: las lecturas nunca lo crean
+        crear_snapshots([instance.pk])
+    else:
+        invalidar_proyectos([instance.pk])
+
+
+def encargado_cambiado(sender, instance, created=False, **kwargs):
+    if not created:
+        invalidar_encargado(instance.pk)
+
+
+def conectar_senales():
+    # post_save de una subclase se emite con la subclase como sender
+    for modelo in (ActividadBase, Actividad, ActividadDifusion):
+        post_save.connect(actividad_guardada, sender=modelo, dispatch_uid=f'snapshot_save_{modelo.__name__}')
+        pre_delete.connect(actividad_eliminada, sender=modelo, dispatch_uid=f'snapshot_delete_{modelo.__name__}')
+
+    for modelo in (Fecha, Alerta, Actividad_Encargado, ActividadDifusion_Linea):
+        post_save.connect(relacion_guardada, sender=modelo, dispatch_uid=f'snapshot_save_{modelo.__name__}')
+        pre_delete.connect(relacion_eliminada, sender=modelo, dispatch_uid=f'snapshot_delete_{modelo.__name__}')
+
+    post_save.connect(linea_guardada, sender=LineaTrabajo, dispatch_uid='snapshot_save_LineaTrabajo')
+    pre_delete.connect(linea_eliminada, sender=LineaTrabajo, dispatch_uid='snapshot_delete_LineaTrabajo')
+    post_save.connect(proyecto_guardado, sender=Proyecto, dispatch_uid='snapshot_save_Proyecto')
+    post_save.connect(encargado_cambiado, sender=Encargado, dispatch_uid='snapshot_save_Encargado')
+    pre_delete.connect(encargado_cambiado, sender=Encargado, dispatch_uid='snapshot_delete_Encargado')
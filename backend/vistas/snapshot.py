@@ -0,0 +1,159 @@
+import json
+import zlib
+
+from django.db.models import F, Prefetch, Q
+from django.db.models.functions import Now
+
+from proyectos.models import (
+    Actividad, ActividadDifusion, ActividadDifusion_Linea, Actividad_Encargado, Alerta, Fecha,
+)
+from .models import SnapshotProyecto
+
+
+# =========================
+# Construcción
+# =========================
+def _prefetch_comunes():
+    return [
+        Prefetch(
+            'fechas',
+            queryset=Fecha.objects.filter(estado=True).order_by('id'),
+            to_attr='fechas_activas',
+        ),
+        Prefetch(
+            'actividad_encargados',
+            queryset=Actividad_Encargado.objects.filter(estado=True).select_related('encargado').order_by('id'),
+            to_attr='encargados_activos',
+        ),
+        Prefetch(
+            'alertas',
+            queryset=Alerta.objects.order_by('fecha_envio', 'id'),
+            to_attr='alertas_lista',
+        ),
+    ]
+
+
+def _actividad(actividad, tipo):
+    return {
+        'id': actividad.id,
+        'nombre': actividad.nombre,
+        'n_act': actividad.n_act,
+        'tipo': tipo,
+        'estado': actividad.estado,
+        'fechas': [[f.fecha_inicio.isoformat(), f.fecha_fin.isoformat()] for f in actividad.fechas_activas],
+        'encargados': [rel.encargado.nombre for rel in actividad.encargados_activos],
+        'alertas': [[a.fecha_envio.isoformat(), a.enviado] for a in actividad.alertas_lista],
+    }
+
+
+def construir_snapshot(proyecto):
+    """
+    Lee las actividades del proyecto con sus fechas activas, encargados, líneas y
+    alertas (una consulta por tabla) y devuelve la estructura que guarda el snapshot.
+    Las actividades quedan en orden de creación: primero las normales, luego las de difusión.
+    """
+    actividades = []
+
+    normales = Actividad.objects.filter(
+        linea_trabajo__proyecto=proyecto
+    ).select_related('linea_trabajo').prefetch_related(*_prefetch_comunes()).order_by('fecha_creacion', 'id')
+    for actividad in normales:
+        datos = _actividad(actividad, 'Normal')
+        datos['linea_trabajo'] = [actividad.linea_trabajo.id, actividad.linea_trabajo.nombre]
+        actividades.append(datos)
+
+    difusion = ActividadDifusion.objects.filter(
+        proyecto=proyecto
+    ).prefetch_related(
+        *_prefetch_comunes(),
+        Prefetch(
+            'actividad_lineas',
+            queryset=ActividadDifusion_Linea.objects.filter(estado=True).select_related('linea_trabajo').order_by('id'),
+            to_attr='lineas_activas',
+        ),
+    ).order_by('fecha_creacion', 'id')
+    for actividad in difusion:
+        datos = _actividad(actividad, 'Difusión')
+        datos['lineas'] = [rel.linea_trabajo.nombre for rel in actividad.lineas_activas]
+        actividades.append(datos)
+
+    return {'actividades': actividades}
+
+
+def _serializar(datos):
+    return zlib.compress(json.dumps(datos, separators=(',', ':'), ensure_ascii=False).encode('utf-8'))
+
+
+def _deserializar(datos):
+    return json.loads(zlib.decompress(bytes(datos)).decode('utf-8'))
+
+
+# =========================
+# Lectura
+# =========================
+def obtener_snapshot(proyecto):
+    """
+    Devuelve los datos del snapshot del proyecto, reconstruyéndolo si fue invalidado,
+    con su versión en 'version'. La reconstrucción se guarda solo si nadie invalidó
+    el snapshot mientras tanto. Sin fila de snapshot (se crea con el proyecto) los
+    datos se leen sin guardarlos y 'version' es None.
+    """
+    fila = SnapshotProyecto.objects.filter(proyecto=proyecto).values('datos', 'version').first()
+    if fila and fila['datos'] is not None:
+        datos = _deserializar(fila['datos'])
+        datos['version'] = fila['version']
+        return datos
+
+    # La versión se fija antes de leer: si algo cambia durante la lectura, no se guarda
+    datos = construir_snapshot(proyecto)
+    if fila:
+        SnapshotProyecto.objects.filter(proyecto=proyecto, version=fila['version']).update(datos=_serializar(datos))
+    datos['version'] = fila['version'] if fila else None
+    return datos
+
+
+def version_proyecto(proyecto_id):
+    """
+    Versión de los datos del proyecto; cambia cada vez que el snapshot se invalida.
+    None si el proyecto no tiene snapshot. Solo lee: no crea la fila.
+    """
+    return SnapshotProyecto.objects.filter(proyecto_id=proyecto_id).values_list('version', flat=True).first()
+
+
+# =========================
+# Alta
+# =========================
+def crear_snapshots(proyecto_ids):
+    """Crea los snapshots (vacíos) de proyectos nuevos; se llama al crear cada proyecto."""
+    # INSERT OR IGNORE: no falla si ya existe
+    SnapshotProyecto.objects.bulk_create(
+        [SnapshotProyecto(proyecto_id=proyecto_id) for proyecto_id in proyecto_ids], ignore_conflicts=True,
+    )
+
+
+# =========================
+# Invalidación
+# =========================
+def _invalidar(filtro):
+    # update() no actualiza los campos auto_now
+    SnapshotProyecto.objects.filter(filtro).update(datos=None, version=F('version') + 1, ultima_modificacion=Now())
+
+
+def invalidar_proyectos(proyecto_ids):
+    _invalidar(Q(proyecto_id__in=proyecto_ids))
+
+
+def invalidar_actividades(actividad_ids):
+    """Invalida los snapshots de los proyectos a los que pertenecen las actividades."""
+    _invalidar(
+        Q(proyecto__lineas_trabajo__actividades__id__in=actividad_ids)
+        | Q(proyecto__actividades_difusion__id__in=actividad_ids)
+    )
+
+
+def invalidar_encargado(encargado_id):
+    """Invalida los snapshots de los proyectos donde el encargado tiene actividades."""
+    _invalidar(
+        Q(proyecto__lineas_trabajo__actividades__actividad_encargados__encargado_id=encargado_id)
+        | Q(proyecto__actividades_difusion__actividad_encargados__encargado_id=encargado_id)
+    )
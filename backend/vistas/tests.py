@@ -1,3 +1,309 @@
-from django.test import TestCase
+import json
+from datetime import date, timedelta
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from proyectos.models import *
+from .models import SnapshotProyecto
+from .gantt import GANTT_CACHE, gantt_compacto, rango_gantt
+from .lectura import actividades_gantt_ventana, actividades_proyecto
+
+
+def crear_proyecto(n_actividades):
+    """Proyecto con n_actividades normales y n_actividades de difusión, cada una con fechas, encargados y líneas."""
+    proyecto = Proyecto.objects.create(nombre=f"Proyecto {n_actividades}", fecha_inicio=date(2025, 3, 3))
+    linea = LineaTrabajo.objects.create(proyecto=proyecto, nombre="Línea 1")
+    encargados = [
+        Encargado.objects.get_or_create(correo_electronico=f"p{i}@example.cl", defaults={'nombre': f"Persona {i}"})[0]
+        for i in range(2)
+    ]
+    for i in range(n_actividades):
+        normal = Actividad.objects.create(linea_trabajo=linea, nombre=f"Actividad {i}", n_act=i)
+        difusion = ActividadDifusion.objects.create(proyecto=proyecto, nombre=f"Difusión {i}", n_act=i)
+        ActividadDifusion_Linea.objects.create(actividad=difusion, linea_trabajo=linea)
+        for actividad in (normal, difusion):
+            inicio = date(2025, 3, 3) + timedelta(weeks=i)
+            Fecha.objects.create(actividad=actividad, fecha_inicio=inicio, fecha_fin=inicio + timedelta(days=6))
+            Fecha.objects.create(actividad=actividad, fecha_inicio=inicio, fecha_fin=inicio, estado=False)
+            for encargado in encargados:
+                Actividad_Encargado.objects.create(actividad=actividad, encargado=encargado)
+    return proyecto
+
+
+class ActividadesProyectoTests(TestCase):
+    def test_contenido(self):
+        proyecto = crear_proyecto(2)
+        actividades = actividades_proyecto(proyecto)
+
+        self.assertEqual([a['tipo'] for a in actividades], ['Normal', 'Normal', 'Difusión', 'Difusión'])
+        normal = actividades[0]
+        self.assertEqual(normal['fechas'], [{'fecha_inicio': '2025-03-03', 'fecha_fin': '2025-03-09'}])
+        self.assertEqual(normal['encargados'], ['Persona 0', 'Persona 1'])
+        self.assertEqual(normal['linea_trabajo'], 'Línea 1')
+        self.assertEqual(normal['estado'], 'Pendiente')
+        self.assertEqual(actividades[2]['linea_trabajo'], ['Línea 1'])
+
+    def test_consultas_constantes(self):
+        """Las vistas de lista y tablero usan las mismas consultas con 2 o 40 actividades."""
+        chico = crear_proyecto(2)
+        grande = crear_proyecto(40)
+
+        def consultas(nombre_url, proyecto):
+            with CaptureQueriesContext(connection) as ctx:
+                respuesta = self.client.get(reverse(nombre_url, args=[proyecto.id]))
+            self.assertEqual(respuesta.status_code, 200)
+            return len(ctx.captured_queries)
+
+        # Primera lectura: se construye el snapshot
+        self.assertEqual(consultas('lista_actividades', chico), consultas('lista_actividades', grande))
+
+        # Lecturas siguientes: solo validador (ETag), proyecto y snapshot
+        for nombre_url in ('lista_actividades', 'vista_tablero'):
+            self.assertEqual(consultas(nombre_url, chico), consultas(nombre_url, grande), nombre_url)
+            self.assertLessEqual(consultas(nombre_url, grande), 3, nombre_url)
+
+
+class SnapshotProyectoTests(TestCase):
+    def setUp(self):
+        self.proyecto = crear_proyecto(3)
+        actividades_proyecto(self.proyecto)
+
+    def test_lectura_desde_snapshot(self):
+        with self.assertNumQueries(1):
+            actividades = actividades_proyecto(self.proyecto)
+        self.assertEqual(len(actividades), 6)
+
+    def test_invalidacion_por_senales(self):
+        actividad = Actividad.objects.filter(linea_trabajo__proyecto=self.proyecto).first()
+
+        # Cambio de estado desde el tablero
+        self.client.post(reverse('actualizar_estado'), {'actividad_id': actividad.id, 'nuevo_estado': 'COM'})
+        self.assertEqual(actividades_proyecto(self.proyecto)[0]['estado_valor'], 'COM')
+
+        # Fecha desactivada
+        fecha = actividad.fechas.filter(estado=True).first()
+        fecha.estado = False
+        fecha.save()
+        self.assertEqual(actividades_proyecto(self.proyecto)[0]['fechas'], [])
+
+        # Encargado renombrado
+        encargado = Encargado.objects.get(nombre='Persona 0')
+        encargado.nombre = 'Otra Persona'
+        encargado.save()
+        self.assertIn('Otra Persona', actividades_proyecto(self.proyecto)[0]['encargados'])
+
+        # Actividad eliminada
+        actividad.delete()
+        self.assertEqual(len(actividades_proyecto(self.proyecto)), 5)
+
+    def test_otros_proyectos_no_se_invalidan(self):
+        otro = crear_proyecto(1)
+        actividades_proyecto(otro)
+        Fecha.objects.filter(actividad__actividad__linea_trabajo__proyecto=self.proyecto).first().save()
+        with self.assertNumQueries(1):
+            actividades_proyecto(otro)
+
+
+class GanttCompactoTests(TestCase):
+    def test_columnas(self):
+        resumen = {'primera_fecha': None, 'ultima_fecha': None, 'n_periodos': 0}
+        actividades = [
+            {'id': 1, 'nombre': 'A', 'tipo': 'Normal', 'estado': 'PEN', 'linea_trabajo': 'Línea 1',
+             'fechas': [{'fecha_inicio': '2025-03-05', 'fecha_fin': '2025-03-05'}], **resumen},
+            {'id': 2, 'nombre': 'B', 'tipo': 'Normal', 'estado': 'COM', 'linea_trabajo': 'Línea 1', 'fechas': [
+                {'fecha_inicio': None, 'fecha_fin': '2025-03-20'},
+                {'fecha_inicio': '2025-03-12', 'fecha_fin': '2025-03-24'},
+            ], **resumen},
+            {'id': 3, 'nombre': 'C', 'tipo': 'Difusión', 'estado': 'PEN', 'linea_trabajo': 'Difusión', 'fechas': [],
+             **resumen},
+        ]
+        datos = gantt_compacto(actividades)
+
+        # Una semana de margen a cada lado, de lunes a domingo
+        self.assertEqual(datos['inicio'], '2025-02-24')
+        self.assertEqual(datos['semanas'], 6)
+        self.assertEqual(datos['lineas'], ['Línea 1', 'Difusión'])
+        self.assertEqual(datos['actividades']['linea'], [0, 0, 1])
+        self.assertEqual(datos['actividades']['difusion'], [False, False, True])
+        self.assertEqual(datos['periodos'], {'actividad': [0, 1], 'numero': [1, 2], 'inicio': [9, 16], 'fin': [9, 28]})
+
+        # El rango de las ventanas (rango_gantt, desde los extremos en la base de datos) es el mismo
+        self.assertEqual(rango_gantt(date(2025, 3, 5), date(2025, 3, 24)), datos['rango'])
+
+    def test_sin_fechas(self):
+        datos = gantt_compacto([])
+        self.assertEqual((datos['inicio'], datos['semanas']), (None, 0))
+
+
+class ApiGanttTests(TestCase):
+    def setUp(self):
+        caches[GANTT_CACHE].clear()
+        self.proyecto = crear_proyecto(3)
+        self.url = reverse('api_gantt', args=[self.proyecto.id])
+
+    def tearDown(self):
+        caches[GANTT_CACHE].clear()
+
+    def test_datos(self):
+        respuesta = self.client.get(self.url)
+        self.assertEqual(respuesta.status_code, 200)
+        datos = respuesta.json()
+        self.assertEqual(datos['actividades']['nombre'][:3], ['Actividad 0', 'Actividad 1', 'Actividad 2'])
+        self.assertEqual(len(datos['periodos']['actividad']), 6)
+        self.assertEqual(datos['inicio'], '2025-02-24')
+        self.assertEqual(self.client.get(reverse('vista_gantt', args=[self.proyecto.id])).status_code, 200)
+
+    def test_etag(self):
+        with patch('vistas.gantt.gantt_compacto', wraps=gantt_compacto) as calculo:
+            etag = self.client.get(self.url)['ETag']
+
+            # Sin cambios: 304 sin leer el snapshot
+            with self.assertNumQueries(1):
+                respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(respuesta.status_code, 304)
+
+            # Otro cliente sin ETag: datos desde la caché
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+            self.assertEqual(calculo.call_count, 1)
+
+            # Un cambio en el proyecto sube la versión: nuevo ETag y nuevo cálculo
+            fecha = Fecha.objects.filter(actividad__actividad__linea_trabajo__proyecto=self.proyecto).first()
+            fecha.fecha_fin += timedelta(weeks=4)
+            fecha.save()
+            respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertNotEqual(respuesta['ETag'], etag)
+            self.assertEqual(calculo.call_count, 2)
+
+    def test_ventana(self):
+        # Solo la segunda semana: las actividades 1 (normal y de difusión)
+        datos = self.client.get(self.url, {'desde': '2025-03-12', 'hasta': '2025-03-12'}).json()
+        self.assertEqual((datos['inicio'], datos['semanas']), ('2025-03-10', 1))
+        self.assertEqual(datos['rango'], ['2025-02-24', '2025-03-30'])
+        self.assertEqual(datos['actividades']['nombre'], ['Actividad 1', 'Difusión 1'])
+        self.assertEqual(datos['periodos'], {'actividad': [0, 1], 'numero': [1, 1], 'inicio': [0, 0], 'fin': [6, 6]})
+        self.assertEqual(datos['total_filas'], 2)
+
+        # Rango de filas dentro de la ventana
+        datos = self.client.get(self.url, {'semanas': 3, 'fila_desde': 1, 'filas': 2}).json()
+        self.assertEqual(datos['inicio'], '2025-02-24')
+        self.assertEqual(datos['actividades']['nombre'], ['Actividad 1', 'Difusión 0'])
+        self.assertEqual(datos['total_filas'], 4)
+
+        self.assertEqual(self.client.get(self.url, {'desde': 'ayer'}).status_code, 400)
+
+    def test_sin_snapshot_no_escribe(self):
+        SnapshotProyecto.objects.filter(proyecto=self.proyecto).delete()
+        for parametros in ({}, {'semanas': 3}):
+            with CaptureQueriesContext(connection) as ctx:
+                respuesta = self.client.get(self.url, parametros)
+            self.assertEqual(respuesta.status_code, 200)
+            self.assertNotIn('ETag', respuesta)
+            self.assertEqual(len(respuesta.json()['actividades']['nombre']), 6 if not parametros else 4)
+            escrituras = [q['sql'] for q in ctx.captured_queries if not q['sql'].lstrip().upper().startswith('SELECT')]
+            self.assertEqual(escrituras, [])
+        self.assertFalse(SnapshotProyecto.objects.filter(proyecto=self.proyecto).exists())
+
+    def test_ventana_usa_el_indice(self):
+        crear_proyecto(2)
+        with CaptureQueriesContext(connection) as ctx:
+            actividades_gantt_ventana(self.proyecto, date(2025, 3, 10), date(2025, 3, 16))
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + ctx.captured_queries[0]['sql'])
+            plan = ' '.join(str(fila) for fila in cursor.fetchall())
+        self.assertIn('fecha_actividad_rango_idx (actividad_id=?', plan)
+
+
+class PeticionesCondicionalesTests(TestCase):
+    def setUp(self):
+        self.proyecto = crear_proyecto(2)
+        self.url = reverse('lista_actividades', args=[self.proyecto.id])
+        self.client.get(self.url)  # crea el snapshot y la cookie CSRF
+        self.respuesta = self.client.get(self.url)
+
+    def test_304_sin_cambios(self):
+        with self.assertNumQueries(1):
+            respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.respuesta['ETag'])
+        self.assertEqual(respuesta.status_code, 304)
+        respuesta = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=self.respuesta['Last-Modified'])
+        self.assertEqual(respuesta.status_code, 304)
+
+    def test_escritura_mueve_el_validador(self):
+        actividad = Actividad.objects.filter(linea_trabajo__proyecto=self.proyecto).first()
+        self.client.post(reverse('actualizar_estado'), {'actividad_id': actividad.id, 'nuevo_estado': 'COM'})
+        respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.respuesta['ETag'])
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], self.respuesta['ETag'])
+
+    def test_mensajes_pendientes(self):
+        # Los mensajes se muestran en la página: no se puede responder 304
+        with patch('vistas.condicional.get_messages', return_value=['Error']):
+            respuesta = self.client.get(self.url, HTTP_IF_NONE_MATCH=self.respuesta['ETag'])
+        self.assertEqual(respuesta.status_code, 200)
+
+    def test_lista_de_proyectos(self):
+        url = reverse('proyectos')
+        self.client.get(url)
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Proyecto.objects.create(nombre="Otro", fecha_inicio=date(2025, 1, 1))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+
+class ActualizarEstadosTests(TestCase):
+    def setUp(self):
+        self.proyecto = crear_proyecto(3)
+        self.otro = crear_proyecto(1)
+        self.ids = [a['id'] for a in actividades_proyecto(self.proyecto)]
+
+    def actualizar(self, cambios):
+        return self.client.post(reverse('actualizar_estados'), {'cambios': cambios}, content_type='application/json')
+
+    def test_resultados_por_actividad(self):
+        modificacion = Proyecto.objects.get(id=self.proyecto.id).ultima_modificacion
+        cambios = [
+            {'actividad_id': self.ids[0], 'nuevo_estado': 'COM'},
+            {'actividad_id': self.ids[3], 'nuevo_estado': 'EPR'},
+            {'actividad_id': self.ids[1], 'nuevo_estado': 'XXX'},
+            {'actividad_id': 999999, 'nuevo_estado': 'COM'},
+        ]
+        # Lectura de ids, UPDATE de actividades, de proyectos y de snapshots, regeneración
+        # de alertas (actividades, reglas, fechas y alertas) y el savepoint
+        with self.assertNumQueries(10):
+            datos = self.actualizar(cambios).json()
+
+        self.assertFalse(datos['success'])
+        self.assertEqual([r['success'] for r in datos['resultados']], [True, True, False, False])
+        self.assertEqual(datos['resultados'][2]['error'], 'Estado no válido')
+        self.assertEqual(datos['resultados'][3]['error'], 'Actividad no encontrada')
+
+        # Snapshot invalidado y proyecto marcado como modificado; el otro proyecto no se toca
+        estados = [a['estado_valor'] for a in actividades_proyecto(self.proyecto)]
+        self.assertEqual(estados, ['COM', 'PEN', 'PEN', 'EPR', 'PEN', 'PEN'])
+        self.assertGreater(Proyecto.objects.get(id=self.proyecto.id).ultima_modificacion, modificacion)
+        self.assertEqual(Proyecto.objects.get(id=self.otro.id).ultima_modificacion, self.otro.ultima_modificacion)
+
+    def test_peticion_invalida(self):
+        self.assertEqual(self.actualizar('COM').status_code, 400)
+        self.assertEqual(self.client.get(reverse('actualizar_estados')).status_code, 405)
+
+    def test_csrf_y_content_type(self):
+        url = reverse('actualizar_estados')
+        cuerpo = json.dumps({'cambios': [{'actividad_id': self.ids[0], 'nuevo_estado': 'COM'}]})
+        # Un formulario de otro sitio (text/plain) no puede cambiar estados
+        self.assertEqual(self.client.post(url, cuerpo, content_type='text/plain').status_code, 415)
+
+        cliente = Client(enforce_csrf_checks=True)
+        self.assertEqual(cliente.post(url, cuerpo, content_type='application/json').status_code, 403)
+        cliente.get(reverse('lista_actividades', args=[self.proyecto.id]))
+        respuesta = cliente.post(
+            url, cuerpo, content_type='application/json', HTTP_X_CSRFTOKEN=cliente.cookies['csrftoken'].value,
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(actividades_proyecto(self.proyecto)[0]['estado_valor'], 'COM')
@@ -4,8 +4,10 @@ from . import views
 
 urlpatterns = [
     path('vista_gantt/<int:proyecto_id>/', views.vista_gantt, name='vista_gantt'),
+    path('api/gantt/<int:proyecto_id>/', views.api_gantt, name='api_gantt'),
     path('lista_actividades/<int:proyecto_id>/', views.lista_actividades, name="lista_actividades"),
     path('vista_tablero/<int:proyecto_id>/', views.vista_tablero, name='vista_tablero'),
     #path("actualizar_estado/<int:actividad_id>/", views.actualizar_estado_actividad, name="actualizar_estado_actividad"),
     path("actualizar_estado/", views.actualizar_estado, name="actualizar_estado"),
+    path("actualizar_estados/", views.actualizar_estados, name="actualizar_estados"),
 ]
\ No newline at end of file
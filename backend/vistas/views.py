@@ -1,82 +1,28 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import patch_cache_control, quote_etag
 from django.views.decorators.csrf import csrf_exempt
-from proyectos.models import Proyecto, Actividad, ActividadDifusion, ActividadBase, LineaTrabajo, ActividadDifusion_Linea, Actividad_Encargado
-from datetime import datetime, timedelta
+from django.views.decorators.http import condition, require_safe
+from proyectos.models import Proyecto, Actividad, ActividadDifusion, ActividadBase, LineaTrabajo, ActividadDifusion_Linea, Actividad_Encargado, EstadoActividad
+from datetime import date, datetime, timedelta
+import json
 from django.contrib import messages
-from django.db import models
-from .gantt import calcular_gantt_data
+from alertas.reglas import regenerar_alertas
+from django.db import models, transaction
+from django.db.models import Case, Q, Value, When
+from django.db.models.functions import Now
+from .condicional import etag_proyecto, ultima_modificacion_proyecto
+from .gantt import gantt_compacto, gantt_json, gantt_ventana, ordenar_actividades_gantt, rango_gantt
+from .lectura import actividades_gantt_ventana, actividades_proyecto, rango_fechas_proyecto
+from .snapshot import invalidar_actividades, obtener_snapshot, version_proyecto
 
 
 
 def obtener_datos(request, proyecto_id):
     proyecto = get_object_or_404(Proyecto, id=proyecto_id)
     
-    actividades_normales = Actividad.objects.filter(
-        linea_trabajo__proyecto=proyecto
-    ).order_by('fecha_creacion')
-    
-    actividades_difusion = ActividadDifusion.objects.filter(
-        proyecto=proyecto
-    ).order_by('fecha_creacion')
-    
-    todas_actividades = []
-
-    # Actividades normales
-    for actividad in actividades_normales:
-        fechas_lista = []
-        for fecha in actividad.fechas.filter(estado=True):
-            inicio = fecha.fecha_inicio
-            fin = fecha.fecha_fin
-            if inicio and fin and inicio == fin:
-                fin += timedelta(days=1)
-            fechas_lista.append({
-                "fecha_inicio": inicio.strftime('%Y-%m-%d') if inicio else None,
-                "fecha_fin": fin.strftime('%Y-%m-%d') if fin else None
-            })
-        consulta_2 = Actividad_Encargado.objects.filter(actividad=actividad).select_related('encargado')
-        encargados = [rel.encargado.nombre for rel in consulta_2]
-        todas_actividades.append({
-            'id': actividad.id,
-            'nombre': actividad.nombre or f"Actividad {actividad.id}",
-            'fechas': fechas_lista,
-            'tipo': 'Normal',
-            'encargados': encargados,
-            'estado': actividad.get_estado_display() if hasattr(actividad, 'get_estado_display') else 'Sin estado',
-            'estado_valor': actividad.estado, 
-            'linea_trabajo': actividad.linea_trabajo.nombre if actividad.linea_trabajo else 'Sin línea',
-        })
-
-    # Actividades de difusión
-    for actividad in actividades_difusion:
-        fechas_lista = []
-        for fecha in actividad.fechas.filter(estado=True):
-            inicio = fecha.fecha_inicio
-            fin = fecha.fecha_fin
-            if inicio and fin and inicio == fin:
-                fin += timedelta(days=1)
-            fechas_lista.append({
-                "fecha_inicio": inicio.strftime('%Y-%m-%d') if inicio else None,
-                "fecha_fin": fin.strftime('%Y-%m-%d') if fin else None
-            })
-
-        consulta= ActividadDifusion_Linea.objects.filter(actividad=actividad).select_related('linea_trabajo')
-        lineas_trabajo = [rel.linea_trabajo.nombre for rel in consulta]
-
-        consulta_2 = Actividad_Encargado.objects.filter(actividad=actividad).select_related('encargado')
-        encargados = [rel.encargado.nombre for rel in consulta_2]
-
-
-        todas_actividades.append({
-            'id': actividad.id,
-            'nombre': actividad.nombre or f"Actividad Difusión {actividad.id}",
-            'fechas': fechas_lista,
-            'tipo': 'Difusión',
-            'encargados': encargados,
-            'estado': actividad.get_estado_display() if hasattr(actividad, 'get_estado_display') else 'Sin estado',
-            'estado_valor': actividad.estado, 
-            'linea_trabajo': lineas_trabajo,
-        })
+    # Modelo de lectura: se arma desde el snapshot del proyecto
+    todas_actividades = actividades_proyecto(proyecto)
 
     estados = [
         ('PEN', 'Pendiente'),
@@ -96,89 +42,93 @@ def obtener_datos(request, proyecto_id):
 
 
 
+@condition(etag_func=etag_proyecto, last_modified_func=ultima_modificacion_proyecto)
 def vista_gantt(request, proyecto_id):
     proyecto = get_object_or_404(Proyecto, id=proyecto_id)
 
-    # Obtener todas las actividades normales (a través de linea_trabajo) ordenadas por ID de línea de trabajo
-    actividades_normales = Actividad.objects.filter(
-        linea_trabajo__proyecto=proyecto
-    ).select_related('linea_trabajo').order_by('linea_trabajo__id', 'fecha_creacion')
-    
-    # Obtener todas las actividades de difusión (directamente relacionadas con proyecto)
-    actividades_difusion = ActividadDifusion.objects.filter(proyecto=proyecto).order_by('fecha_creacion')
-    
-    # Combinar todas las actividades en una lista
-    todas_actividades = []
-
-    for actividad in actividades_normales:
-        fechas = actividad.fechas.filter(estado=True)
-        
-        fechas_lista = []
-        for fecha in fechas:
-            fechas_lista.append({
-                "fecha_inicio": fecha.fecha_inicio.strftime('%Y-%m-%d') if fecha.fecha_inicio else None,
-                "fecha_fin": fecha.fecha_fin.strftime('%Y-%m-%d') if fecha.fecha_fin else None
-            })
-        
-        todas_actividades.append({
-            'id': actividad.id,
-            'nombre': actividad.nombre or f"Actividad {actividad.id}",
-            "fechas": fechas_lista,
-            'tipo': 'Normal',
-            'estado': actividad.estado,
-            'linea_trabajo': actividad.linea_trabajo.nombre if actividad.linea_trabajo else 'Sin línea',
-            'linea_trabajo_id': actividad.linea_trabajo.id if actividad.linea_trabajo else 999999,  # ID para ordenamiento
-            'orden_tipo': 1,  # Prioridad para ordenamiento (Normal = 1)
-        })
-    
-    for actividad in actividades_difusion:
-        fechas = actividad.fechas.filter(estado=True)
-        
-        fechas_lista = []
-        for fecha in fechas:
-            fechas_lista.append({
-                "fecha_inicio": fecha.fecha_inicio.strftime('%Y-%m-%d') if fecha.fecha_inicio else None,
-                "fecha_fin": fecha.fecha_fin.strftime('%Y-%m-%d') if fecha.fecha_fin else None
-            })
-        
-        todas_actividades.append({
-            'id': actividad.id,
-            'nombre': actividad.nombre or f"Actividad Difusión {actividad.id}",
-            'fechas': fechas_lista,
-            'tipo': 'Difusión',
-            'estado': actividad.estado,
-            'linea_trabajo': 'Difusión',  # Grupo para actividades de difusión
-            'linea_trabajo_id': 1000000,  # ID alto para que aparezca al final
-            'orden_tipo': 2,  # Prioridad para ordenamiento (Difusión = 2)
-        })
-
-    # Ordenar actividades por: 1) Tipo (Normal primero, Difusión después), 2) ID de línea de trabajo, 3) Fecha de inicio
-    todas_actividades.sort(key=lambda x: (
-        x['orden_tipo'],  # 1 para Normal, 2 para Difusión
-        x['linea_trabajo_id'],  # ID de línea de trabajo numéricamente
-        x['fechas'][0]['fecha_inicio'] if x['fechas'] and x['fechas'][0]['fecha_inicio'] else '9999-12-31'
-    ))
-    
-    # Agregar información sobre separadores de grupo
-    linea_trabajo_anterior = None
-    for i, actividad in enumerate(todas_actividades):
-        # Mostrar separador si es la primera actividad o si cambia la línea de trabajo
-        actividad['mostrar_separador'] = (i == 0 or actividad['linea_trabajo'] != linea_trabajo_anterior)
-        linea_trabajo_anterior = actividad['linea_trabajo']
-
-    # Calcular columnas semanales y posiciones
-    gantt_data = calcular_gantt_data(todas_actividades)
-    
+    # Las barras se dibujan en el navegador con los datos de api_gantt
     context = {
         'proyecto': proyecto,
-        'total_actividades': todas_actividades,
-        'gantt_data': gantt_data,
     }
 
     return render(request, 'vistas/vista_gantt.html', context)
 
 
+def _etag_gantt(request, proyecto_id):
+    version = version_proyecto(proyecto_id)
+    return f"gantt-{proyecto_id}-{version}" if version is not None else None
+
+
+PARAMETROS_VENTANA = ('desde', 'hasta', 'semanas', 'fila_desde', 'filas')
+
+
+def _ventana_solicitada(request, rango):
+    """
+    Ventana pedida en la URL del api del gantt, como (desde, hasta, fila_desde, filas),
+    ampliada a semanas completas. Sin desde se parte del inicio del gantt; sin hasta se
+    toman 'semanas' semanas o hasta el final. Lanza ValueError si algún parámetro no es válido.
+    """
+    desde = request.GET.get('desde')
+    desde = date.fromisoformat(desde) if desde else date.fromisoformat(rango[0])
+    if request.GET.get('hasta'):
+        hasta = date.fromisoformat(request.GET['hasta'])
+    elif request.GET.get('semanas'):
+        hasta = desde + timedelta(weeks=int(request.GET['semanas']), days=-1)
+    else:
+        hasta = date.fromisoformat(rango[1])
+
+    desde -= timedelta(days=desde.weekday())
+    hasta += timedelta(days=6 - hasta.weekday())
 
+    fila_desde = int(request.GET.get('fila_desde') or 0)
+    filas = int(request.GET['filas']) if request.GET.get('filas') else None
+    if hasta < desde or fila_desde < 0 or (filas is not None and filas < 1):
+        raise ValueError("Ventana vacía")
+    return desde, hasta, fila_desde, filas
+
+
+@require_safe
+@condition(etag_func=_etag_gantt)
+def api_gantt(request, proyecto_id):
+    """
+    Datos del gantt en JSON compacto (ver gantt_compacto). El ETag es la versión de
+    los datos del proyecto: si no cambió, condition responde 304 sin leer el snapshot.
+
+    Con desde/hasta/semanas/fila_desde/filas en la URL devuelve solo esa ventana
+    (ver gantt_ventana), consultando solo los periodos que se cruzan con ella.
+    """
+    proyecto = get_object_or_404(Proyecto, id=proyecto_id)
+
+    if any(parametro in request.GET for parametro in PARAMETROS_VENTANA):
+        # La versión se lee antes que los datos: si cambian entretanto, el ETag queda viejo y no se reutiliza
+        version = version_proyecto(proyecto.id)
+        rango = rango_fechas_proyecto(proyecto)
+        if rango is None:
+            contenido = gantt_compacto([])
+        else:
+            rango = rango_gantt(*rango)
+            try:
+                desde, hasta, fila_desde, filas = _ventana_solicitada(request, rango)
+            except ValueError:
+                return JsonResponse({'error': 'Parámetros de ventana inválidos'}, status=400)
+            actividades = ordenar_actividades_gantt(actividades_gantt_ventana(proyecto, desde, hasta))
+            contenido = gantt_ventana(actividades, desde, hasta, rango, fila_desde, filas)
+        contenido = json.dumps(contenido, separators=(',', ':'), ensure_ascii=False)
+    else:
+        snapshot = obtener_snapshot(proyecto)
+        version = snapshot['version']
+        contenido = gantt_json(proyecto.id, snapshot)
+
+    respuesta = HttpResponse(contenido, content_type='application/json')
+    # ETag de la versión leída (la del etag_func pudo cambiar entretanto). Sin snapshot
+    # no hay versión: los datos se sirven igual, sin validador, y la lectura no escribe
+    if version is not None:
+        respuesta['ETag'] = quote_etag(f"gantt-{proyecto.id}-{version}")
+    patch_cache_control(respuesta, private=True, no_cache=True)
+    return respuesta
+
+
+@condition(etag_func=etag_proyecto, last_modified_func=ultima_modificacion_proyecto)
 def lista_actividades(request, proyecto_id):
     
     context = obtener_datos(request, proyecto_id)
@@ -186,6 +136,7 @@ def lista_actividades(request, proyecto_id):
     return render(request, "vistas/vista_lista.html", context)
 
 
+@condition(etag_func=etag_proyecto, last_modified_func=ultima_modificacion_proyecto)
 def vista_tablero(request, proyecto_id):
 
     context = obtener_datos(request, proyecto_id)
@@ -194,19 +145,100 @@ def vista_tablero(request, proyecto_id):
 
 
 
+# Máximo de cambios por petición en actualizar_estados
+MAX_CAMBIOS_ESTADO = 500
+
+
+def _aplicar_estados(cambios):
+    """
+    Aplica los cambios {actividad_id: nuevo_estado} (estados ya validados) con un solo
+    UPDATE y marca una vez la modificación de los proyectos afectados. update() no emite
+    señales: el snapshot se invalida y las alertas se regeneran a mano. Devuelve los ids
+    de las actividades que existían.
+    """
+    with transaction.atomic():
+        existentes = list(ActividadBase.objects.filter(id__in=cambios).values_list('id', flat=True))
+        if not existentes:
+            return set()
+
+        por_estado = {}
+        for actividad_id in existentes:
+            por_estado.setdefault(cambios[actividad_id], []).append(actividad_id)
+        ActividadBase.objects.filter(id__in=existentes).update(
+            estado=Case(*[When(id__in=ids, then=Value(estado)) for estado, ids in por_estado.items()]),
+            ultima_modificacion=Now(),
+        )
+        Proyecto.objects.filter(
+            Q(lineas_trabajo__actividades__id__in=existentes) | Q(actividades_difusion__id__in=existentes)
+        ).update(ultima_modificacion=Now())
+        invalidar_actividades(existentes)
+        # Completadas o terminadas pierden sus alertas pendientes; las reabiertas las recuperan
+        regenerar_alertas(existentes)
+    return set(existentes)
+
+
 @csrf_exempt
 def actualizar_estado(request):
     if request.method == 'POST':
         actividad_id = request.POST.get('actividad_id')
         nuevo_estado = request.POST.get('nuevo_estado')
+        if nuevo_estado not in EstadoActividad.values:
+            return JsonResponse({'success': False, 'error': 'Estado no válido'})
         try:
-            actividad = ActividadBase.objects.get(id=actividad_id)
-            actividad.estado = nuevo_estado
-            actividad.save()
-            return JsonResponse({'success': True})
-        except ActividadBase.DoesNotExist:
+            actividad_id = int(actividad_id)
+        except (TypeError, ValueError):
+            return JsonResponse({'success': False, 'error': 'Actividad no encontrada'})
+        if not _aplicar_estados({actividad_id: nuevo_estado}):
             return JsonResponse({'success': False, 'error': 'Actividad no encontrada'})
+        return JsonResponse({'success': True})
     return JsonResponse({'success': False, 'error': 'Método no permitido'})        
-    
 
 
+def actualizar_estados(request):
+    """
+    Cambia el estado de varias actividades a la vez. Recibe un JSON
+    {"cambios": [{"actividad_id": 1, "nuevo_estado": "COM"}, ...]} y responde el
+    resultado de cada cambio, en el mismo orden. Si una actividad se repite, vale el último.
+    Exige el token CSRF (cabecera X-CSRFToken) y Content-Type application/json.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Método no permitido'}, status=405)
+    if request.content_type != 'application/json':
+        return JsonResponse({'success': False, 'error': 'Se espera application/json'}, status=415)
+    try:
+        cambios = json.loads(request.body)['cambios']
+        if not isinstance(cambios, list) or not all(isinstance(cambio, dict) for cambio in cambios):
+            raise ValueError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'success': False, 'error': 'JSON inválido'}, status=400)
+    if len(cambios) > MAX_CAMBIOS_ESTADO:
+        return JsonResponse(
+            {'success': False, 'error': f'Máximo {MAX_CAMBIOS_ESTADO} cambios por petición'}, status=400
+        )
+
+    resultados, validos = [], {}
+    for cambio in cambios:
+        actividad_id = cambio.get('actividad_id')
+        nuevo_estado = cambio.get('nuevo_estado')
+        resultado = {'actividad_id': actividad_id, 'success': False}
+        if not isinstance(actividad_id, int) or isinstance(actividad_id, bool):
+            resultado['error'] = 'Actividad no encontrada'
+        elif nuevo_estado not in EstadoActividad.values:
+            resultado['error'] = 'Estado no válido'
+        else:
+            validos[actividad_id] = nuevo_estado
+        resultados.append(resultado)
+
+    existentes = _aplicar_estados(validos) if validos else set()
+    for resultado in resultados:
+        if 'error' in resultado:
+            continue
+        if resultado['actividad_id'] in existentes:
+            resultado['success'] = True
+        else:
+            resultado['error'] = 'Actividad no encontrada'
+
+    return JsonResponse({
+        'success': all(resultado['success'] for resultado in resultados),
+        'resultados': resultados,
+    })